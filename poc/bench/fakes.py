@@ -0,0 +1,267 @@
+# fakes.py
+"""
+Local stand-ins for the Lunch Money API and Ollama, used by run_bench.py.
+
+FakeLunchMoney serves /transactions (date filtered, offset paginated),
+/transactions/<id>, /categories, /tags, /plaid_accounts, /assets, /budgets
+and /recurring_items from an in-memory ledger: synthetic (ledger.synthetic_ledger)
+or replayed from recorded API responses (load_fixtures). Reference
+endpoints send an ETag and answer If-None-Match with 304, like the real API.
+
+FakeOllama answers POST /api/chat (streamed NDJSON or not) from a script:
+the latest user question maps to a canned reply, which may contain a
+<tool_call>; a turn that carries a tool result gets a short summary.
+
+Both add a fixed per-request latency, count requests / bytes per route and
+run on a background ThreadingHTTPServer bound to 127.0.0.1:<free port>.
+"""
+import bisect
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+# -----------------------------
+# Ledger data
+# -----------------------------
+
+def load_fixtures(path: str) -> Dict[str, Any]:
+    """
+    Recorded API responses from a directory: <endpoint>.json for each of
+    transactions, categories, tags, plaid_accounts, assets, budgets,
+    recurring_items (raw responses; missing files count as empty).
+    """
+    data: Dict[str, Any] = {}
+    for key in ("transactions", "categories", "tags", "plaid_accounts", "assets", "budgets", "recurring_items"):
+        fname = os.path.join(path, f"{key}.json")
+        if not os.path.exists(fname):
+            data[key] = []
+            continue
+        with open(fname, encoding="utf-8") as f:
+            raw = json.load(f)
+        data[key] = raw.get(key, raw) if isinstance(raw, dict) else raw
+    data["transactions"].sort(key=lambda t: (t.get("date") or "", t.get("id") or 0))
+    return data
+
+# -----------------------------
+# HTTP plumbing
+# -----------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real services
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    fake: "_FakeServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: Any = None, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = b"" if body is None else json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(payload)
+        self.fake.sent(payload)
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # A client that hung up (e.g. stopped reading a stream at a complete tool call) is not an error
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+class _FakeServer:
+    handler: type = _Handler
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.requests: Counter = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._httpd: Optional[_HTTPServer] = None
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self.requests[route] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def sent(self, payload: bytes) -> None:
+        with self._lock:
+            self.bytes_sent += len(payload)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": dict(self.requests), "bytes": self.bytes_sent}
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_FakeServer":
+        handler = type(self.handler.__name__, (self.handler,), {"fake": self})
+        self._httpd = _HTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def __enter__(self) -> "_FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+def delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Requests per route and bytes sent between two snapshot()s."""
+    reqs = {k: v - before["requests"].get(k, 0) for k, v in after["requests"].items()}
+    return {"requests": {k: v for k, v in sorted(reqs.items()) if v}, "bytes": after["bytes"] - before["bytes"]}
+
+# -----------------------------
+# Lunch Money
+# -----------------------------
+
+class _LunchMoneyHandler(_Handler):
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        path = path[len("/v1"):] if path.startswith("/v1") else path
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = path.strip("/").split("/")
+        fake: FakeLunchMoney = self.fake  # type: ignore[assignment]
+
+        if parts == ["transactions"]:
+            fake.count("/transactions")
+            return self._send(200, fake.transactions(params))
+        if len(parts) == 2 and parts[0] == "transactions":
+            fake.count("/transactions/:id")
+            txn = fake.by_id.get(int(parts[1])) if parts[1].isdigit() else None
+            return self._send(200, txn) if txn else self._send(404, {"error": "Transaction not found"})
+        if parts[0] in ("categories", "tags", "plaid_accounts", "assets", "budgets", "recurring_items"):
+            route = "/" + parts[0] + ("/:id" if len(parts) > 1 else "")
+            fake.count(route)
+            body = fake.reference(parts)
+            if body is None:
+                return self._send(404, {"error": "Not found"})
+            etag = '"' + hashlib.blake2b(json.dumps(body, sort_keys=True).encode(), digest_size=8).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, headers={"ETag": etag})
+            return self._send(200, body, {"ETag": etag})
+        fake.count("unknown")
+        self._send(404, {"error": f"Unknown path {path}"})
+
+class FakeLunchMoney(_FakeServer):
+    handler = _LunchMoneyHandler
+
+    def __init__(self, data: Dict[str, Any], latency: float = 0.0) -> None:
+        super().__init__(latency)
+        self.data = data
+        self._txns: List[Dict[str, Any]] = data["transactions"]
+        self._dates = [t.get("date") or "" for t in self._txns]
+        self.by_id = {int(t["id"]): t for t in self._txns}
+
+    @property
+    def base_url(self) -> str:
+        return self.url + "/v1"
+
+    def transactions(self, params: Dict[str, str]) -> Dict[str, Any]:
+        lo = bisect.bisect_left(self._dates, params.get("start_date", ""))
+        hi = bisect.bisect_right(self._dates, params.get("end_date", "9999"))
+        rows = self._txns[lo:hi]
+        payee = (params.get("payee") or "").lower()
+        if payee:
+            rows = [t for t in rows if payee in (t.get("payee") or "").lower()]
+        if "category_id" in params:
+            cid = int(params["category_id"])
+            rows = [t for t in rows if cid in (t.get("category_id"), t.get("category_group_id"))]
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 1000))
+        page = rows[offset:offset + limit]
+        return {"transactions": page, "has_more": offset + limit < len(rows)}
+
+    def reference(self, parts: List[str]) -> Optional[Any]:
+        items = self.data.get(parts[0], [])
+        if len(parts) == 1:
+            return {parts[0]: items}
+        match = next((c for c in items if str(c.get("id")) == parts[1]), None)
+        return None if match is None else {**match, "children": []}
+
+# -----------------------------
+# Ollama
+# -----------------------------
+
+_TOOL_RESULT = re.compile(r"<tool_result>")
+
+class _OllamaHandler(_Handler):
+    def do_POST(self) -> None:
+        fake: FakeOllama = self.fake  # type: ignore[assignment]
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if urlsplit(self.path).path != "/api/chat":
+            fake.count("unknown")
+            return self._send(404, {"error": "not found"})
+        fake.count("/api/chat")
+        reply = fake.reply_for(body.get("messages") or [])
+        if (body.get("options") or {}).get("num_predict") == 1:
+            reply = reply[:1]
+        if not body.get("stream", True):
+            return self._send(200, {"model": body.get("model"), "message": {"role": "assistant", "content": reply}, "done": True})
+        self._stream(fake, body.get("model"), reply)
+
+    def _stream(self, fake: "FakeOllama", model: str, reply: str) -> None:
+        pieces = [reply[i:i + fake.chars_per_token] for i in range(0, len(reply), fake.chars_per_token)]
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for piece in pieces:
+                if fake.token_latency:
+                    time.sleep(fake.token_latency)
+                self._chunk({"model": model, "message": {"role": "assistant", "content": piece}, "done": False})
+            self._chunk({"model": model, "message": {"role": "assistant", "content": ""}, "done": True, "eval_count": len(pieces)})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stops reading once it has a complete tool call
+            self.close_connection = True
+
+    def _chunk(self, data: Dict[str, Any]) -> None:
+        line = json.dumps(data, separators=(",", ":")).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+        self.fake.sent(line)
+
+class FakeOllama(_FakeServer):
+    handler = _OllamaHandler
+
+    def __init__(self, script: Dict[str, str], latency: float = 0.0, token_latency: float = 0.0, chars_per_token: int = 4,
+        summary: str = "Here is what I found: your spending is in line with previous months.",
+        default: str = "I can help with questions about your transactions.",
+    ) -> None:
+        super().__init__(latency)
+        self.script = script
+        self.token_latency = token_latency
+        self.chars_per_token = max(1, chars_per_token)
+        self.summary = summary
+        self.default = default
+
+    def reply_for(self, messages: List[Dict[str, Any]]) -> str:
+        last = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        if _TOOL_RESULT.search(last):
+            return self.summary
+        return self.script.get(last.strip(), self.default)
@@ -0,0 +1,89 @@
+# import_time.py
+"""
+Cold-start import benchmark for the app's modules.
+
+Each run starts a fresh interpreter with `python -X importtime` and imports
+what app.py imports, so nothing is warm in sys.modules. Prints JSON with
+the wall time per run (median / p95 / min) and the heaviest modules by
+cumulative import time from the last run.
+
+    python bench/import_time.py                 # from poc/
+    python bench/import_time.py --runs 20 --top 25
+    python bench/import_time.py --modules lm tools
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# What app.py imports, third-party first (streamlit is skipped if not installed)
+APP_MODULES = [
+    "streamlit", "dotenv",
+    "answer_cache", "compact", "history", "lm", "router", "tools", "warmup", "prompts",
+]
+
+def _available(modules: List[str]) -> List[str]:
+    code = "import importlib.util, sys; print(' '.join(m for m in sys.argv[1:] if importlib.util.find_spec(m)))"
+    out = subprocess.run([sys.executable, "-c", code, *modules], cwd=SRC, capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+def _parse(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return rows
+
+def run(modules: List[str], runs: int, top: int) -> Dict[str, object]:
+    modules = _available(modules)
+    env = {**os.environ, "LM_WARMUP": "0"}
+    walls: List[float] = []
+    rows: List[Tuple[str, int, int]] = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+            cwd=SRC, env=env, capture_output=True, text=True,
+        )
+        walls.append((time.perf_counter() - t0) * 1000)
+        if proc.returncode != 0:
+            raise SystemExit(proc.stderr.strip().splitlines()[-1])
+        rows = _parse(proc.stderr)
+
+    walls.sort()
+    own = {m for m in modules}
+    return {
+        "python": sys.version.split()[0],
+        "modules": modules,
+        "runs": runs,
+        "wall_ms": {
+            "median": round(statistics.median(walls), 1),
+            "p95": round(walls[min(len(walls) - 1, int(0.95 * len(walls)))], 1),
+            "min": round(walls[0], 1),
+        },
+        "top_level_ms": {name.strip(): round(cum / 1000, 1) for name, _, cum in rows if name.strip() in own},
+        "heaviest_ms": [
+            {"module": name, "cumulative": round(cum / 1000, 1), "self": round(s / 1000, 1)}
+            for name, s, cum in sorted(rows, key=lambda r: r[2], reverse=True)[:top]
+        ],
+    }
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--modules", nargs="*", default=APP_MODULES)
+    args = ap.parse_args()
+    print(json.dumps(run(args.modules, args.runs, args.top), indent=2))
+
+if __name__ == "__main__":
+    main()
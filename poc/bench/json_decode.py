@@ -0,0 +1,99 @@
+# json_decode.py
+"""
+JSON backend benchmark for large /transactions responses.
+
+Builds one synthetic /transactions body (ledger.synthetic_ledger rows) and,
+for every installed fastjson backend, times (median of --runs):
+  decode        loads() of the whole body (stdlib is what r.json() did)
+  decode_core   decode_transactions() keeping only txn.FIELDS (LM_TXN_FIELDS=core);
+                msgspec skips the other fields while parsing
+  parse / parse_core   decode + parse_transactions(), i.e. all of get_transactions' CPU work
+  encode        dumps() of the rows (the store payloads / raw tool result)
+plus the tracemalloc peak of decode vs decode_core. Prints JSON with each
+backend's numbers and its speedup over stdlib.
+
+    python bench/json_decode.py                     # from poc/
+    python bench/json_decode.py --rows 50000 --runs 3
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from ledger import synthetic_ledger
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import fastjson  # noqa: E402
+from txn import FIELDS, parse_transactions  # noqa: E402
+
+def _median_ms(fn: Callable[[], Any], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(times), 2)
+
+def _peak_kib(fn: Callable[[], Any]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+def run(rows: int, runs: int, memory: bool) -> Dict[str, Any]:
+    txns = synthetic_ledger(rows, 365)["transactions"]
+    body = json.dumps({"transactions": txns, "has_more": False}).encode()
+    out: Dict[str, Any] = {
+        "config": {"rows": rows, "body_bytes": len(body), "runs": runs, "core_fields": len(FIELDS), "default": fastjson.BACKEND},
+        "backends": {},
+    }
+    for name in fastjson.available():
+        loads, dumps = fastjson.backend(name)
+        cases: Dict[str, Callable[[], Any]] = {
+            "decode": lambda: loads(body),
+            "decode_core": lambda: fastjson.decode_transactions(body, FIELDS, using=name),
+            "parse": lambda: parse_transactions(loads(body)["transactions"]),
+            "parse_core": lambda: parse_transactions(fastjson.decode_transactions(body, FIELDS, using=name)["transactions"]),
+            "encode": lambda: dumps(txns),
+        }
+        res: Dict[str, Any] = {f"{k}_ms": _median_ms(fn, runs) for k, fn in cases.items()}
+        res["decode_mb_s"] = round(len(body) / 1e6 / (res["decode_ms"] / 1000), 1)
+        if memory:
+            res["decode_peak_kib"] = _peak_kib(cases["decode"])
+            res["decode_core_peak_kib"] = _peak_kib(cases["decode_core"])
+        out["backends"][name] = res
+        print(f"[json] {name}: " + " ".join(f"{k}={v}" for k, v in res.items()), file=sys.stderr)
+
+    base = out["backends"]["stdlib"]
+    for res in out["backends"].values():
+        res["speedup_vs_stdlib"] = {
+            k[:-3]: round(base[k] / res[k], 2) for k in res if k.endswith("_ms") and res[k] > 0
+        }
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=20_000, help="transactions in the response body")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc passes")
+    ap.add_argument("--out", help="also write the JSON here")
+    opts = ap.parse_args()
+
+    text = json.dumps(run(opts.rows, opts.runs, not opts.no_memory), indent=2)
+    print(text)
+    if opts.out:
+        with open(opts.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# ledger.py
+"""
+Deterministic synthetic Lunch Money ledgers, for the fakes and the
+scaling suite.
+
+synthetic_ledger(n) returns n transaction dicts shaped like the API's
+(string amounts, category / group ids and names, tags, account ids) plus
+matching categories, tags, accounts and budgets. Signs follow what the
+tools aggregate: expenses negative, income positive. The mix:
+  - recurring:  rent on the 1st, utilities and subscriptions monthly,
+                payroll twice a month
+  - transfers:  monthly checking -> savings pairs (category "Transfers")
+  - splits:     ~3% of purchases split into 2-3 children sharing a parent_id
+                (the parent itself is hidden, as the API does)
+  - pending:    rows from the last 3 days are uncleared / is_pending
+  - tags:       ~8% of purchases carry one or two tags
+  - the rest:   day-to-day purchases, payees and amounts drawn per category
+Same (n, days, end, seed) -> same ledger.
+"""
+import datetime as dt
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+# name -> (group id, group name, typical amount, payees); income is positive
+CATEGORIES: Dict[str, Tuple[int, str, float, List[str]]] = {
+    "Groceries": (100, "Food", -60.0, ["Trader Joe's", "Whole Foods", "Safeway", "Costco", "Aldi"]),
+    "Restaurants": (100, "Food", -35.0, ["Chipotle", "Sweetgreen", "Shake Shack", "Local Thai", "Pizza Place", "Sushi Bar"]),
+    "Coffee": (100, "Food", -6.0, ["Starbucks", "Blue Bottle", "Peet's", "Corner Cafe"]),
+    "Rent": (200, "Home", -1800.0, ["Landlord LLC"]),
+    "Utilities": (200, "Home", -90.0, ["PG&E", "Comcast", "City Water"]),
+    "Transport": (300, "Travel & Transport", -25.0, ["Uber", "Lyft", "Clipper", "Shell", "Chevron"]),
+    "Travel": (300, "Travel & Transport", -400.0, ["Delta", "United", "Airbnb", "Marriott", "Hertz"]),
+    "Shopping": (400, "Lifestyle", -80.0, ["Amazon", "Target", "REI", "IKEA", "Uniqlo", "Best Buy"]),
+    "Subscriptions": (400, "Lifestyle", -15.0, ["Netflix", "Spotify", "iCloud"]),
+    "Health": (500, "Health", -70.0, ["CVS", "Walgreens", "One Medical", "Dentist"]),
+    "Transfers": (600, "Transfers", -500.0, ["Savings Transfer"]),
+    "Income": (700, "Income", 3200.0, ["ACME Payroll"]),
+}
+# Relative frequency of day-to-day purchases
+PURCHASE_WEIGHTS = {
+    "Groceries": 18, "Restaurants": 16, "Coffee": 20, "Transport": 14,
+    "Travel": 1, "Shopping": 12, "Health": 3,
+}
+TAGS = [
+    {"id": 1, "name": "reimbursable"},
+    {"id": 2, "name": "vacation"},
+    {"id": 3, "name": "gift"},
+    {"id": 4, "name": "business"},
+]
+ACCOUNTS = [
+    {"id": 11, "name": "Checking", "type": "depository"},
+    {"id": 12, "name": "Credit Card", "type": "credit"},
+    {"id": 13, "name": "Savings", "type": "depository"},
+]
+PENDING_DAYS = 3
+
+def _categories() -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": i + 1,
+            "name": name,
+            "group_id": group,
+            "group_name": group_name,
+            "is_income": amount > 0,
+            "exclude_from_totals": name == "Transfers",
+            "exclude_from_budget": name in ("Transfers", "Income"),
+        }
+        for i, (name, (group, group_name, amount, _)) in enumerate(CATEGORIES.items())
+    ]
+
+def _recurring(start: dt.date, end: dt.date) -> List[Tuple[dt.date, str, str, float, int]]:
+    """(date, category, payee, amount, account id) for every recurring row in [start, end]."""
+    rows = []
+    month = start.replace(day=1)
+    while month <= end:
+        items = [
+            (1, "Rent", "Landlord LLC", -1800.0, 11),
+            (5, "Utilities", "PG&E", -85.0, 12),
+            (12, "Utilities", "Comcast", -70.0, 12),
+            (20, "Utilities", "City Water", -40.0, 11),
+            (3, "Subscriptions", "Netflix", -15.49, 12),
+            (9, "Subscriptions", "Spotify", -10.99, 12),
+            (14, "Subscriptions", "iCloud", -2.99, 12),
+            (1, "Income", "ACME Payroll", 3200.0, 11),
+            (15, "Income", "ACME Payroll", 3200.0, 11),
+        ]
+        for day, cat, payee, amount, account in items:
+            d = month.replace(day=day)
+            if start <= d <= end:
+                rows.append((d, cat, payee, amount, account))
+        # Savings transfer: out of checking, into savings
+        d = month.replace(day=16)
+        if start <= d <= end:
+            rows.append((d, "Transfers", "Savings Transfer", -500.0, 11))
+            rows.append((d, "Transfers", "Savings Transfer", 500.0, 13))
+        month = (month + dt.timedelta(days=32)).replace(day=1)
+    return rows
+
+def synthetic_ledger(n_transactions: int, days: int = 730, end: Optional[dt.date] = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Ledger of exactly n_transactions spread over the `days` days up to `end`
+    (default today): recurring rows first (truncated if n is smaller), the
+    rest purchases. Also returns categories, tags, plaid_accounts, assets,
+    budgets and recurring_items, shaped like their endpoints' responses.
+    """
+    rng = random.Random(seed)
+    end = end or dt.date.today()
+    start = end - dt.timedelta(days=days - 1)
+    categories = _categories()
+    by_name = {c["name"]: c for c in categories}
+    account_names = {a["id"]: a["name"] for a in ACCOUNTS}
+
+    def txn(d: dt.date, cat_name: str, payee: str, amount: float, account: int, **extra: Any) -> Dict[str, Any]:
+        cat = by_name[cat_name]
+        pending = (end - d).days < PENDING_DAYS
+        return {
+            "id": 0,
+            "date": d.isoformat(),
+            "payee": payee,
+            "original_name": payee.upper(),
+            "amount": f"{amount:.4f}",
+            "currency": "usd",
+            "to_base": amount,
+            "category_id": cat["id"],
+            "category_name": cat["name"],
+            "category_group_id": cat["group_id"],
+            "category_group_name": cat["group_name"],
+            "is_income": cat["is_income"],
+            "exclude_from_totals": cat["exclude_from_totals"],
+            "exclude_from_budget": cat["exclude_from_budget"],
+            "status": "uncleared" if pending else "cleared",
+            "is_pending": pending,
+            "notes": None,
+            "tags": [],
+            "plaid_account_id": account,
+            "plaid_account_name": account_names[account],
+            "asset_id": None,
+            "group_id": None,
+            "parent_id": None,
+            "has_children": False,
+            "is_group": False,
+            **extra,
+        }
+
+    txns: List[Dict[str, Any]] = [txn(*row) for row in _recurring(start, end)][:n_transactions]
+
+    names = list(PURCHASE_WEIGHTS)
+    weights = list(PURCHASE_WEIGHTS.values())
+    next_parent = 9_000_000
+    while len(txns) < n_transactions:
+        cat_name = rng.choices(names, weights)[0]
+        _, _, typical, payees = CATEGORIES[cat_name]
+        d = start + dt.timedelta(days=rng.randrange(days))
+        amount = round(typical * rng.lognormvariate(0, 0.5), 2)
+        account = 12 if rng.random() < 0.7 else 11
+        payee = rng.choice(payees)
+        if rng.random() < 0.03 and n_transactions - len(txns) >= 2:
+            # Split: children of one (hidden) parent, across categories
+            next_parent += 1
+            parts = min(rng.choice((2, 3)), n_transactions - len(txns))
+            for k in range(parts):
+                child_cat = cat_name if k == 0 else rng.choice(names)
+                txns.append(txn(d, child_cat, payee, round(amount / parts, 2), account, parent_id=next_parent))
+            continue
+        row = txn(d, cat_name, payee, amount, account)
+        if rng.random() < 0.08:
+            row["tags"] = rng.sample(TAGS, rng.choice((1, 1, 2)))
+        txns.append(row)
+
+    txns.sort(key=lambda t: (t["date"], t["payee"], t["amount"]))
+    for i, t in enumerate(txns):
+        t["id"] = 100_000 + i
+    budgets = [
+        {"category_id": c["id"], "category_name": c["name"], "budget_amount": round(abs(CATEGORIES[c["name"]][2]) * 8, 2)}
+        for c in categories if not c["exclude_from_budget"]
+    ]
+    return {
+        "transactions": txns,
+        "categories": categories,
+        "tags": TAGS,
+        "plaid_accounts": ACCOUNTS,
+        "assets": [],
+        "budgets": budgets,
+        "recurring_items": [],
+    }
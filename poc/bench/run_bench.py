@@ -0,0 +1,300 @@
+# run_bench.py
+"""
+Offline latency / throughput benchmark for tools.py and the chat loop.
+
+Starts FakeLunchMoney and FakeOllama (fakes.py) on localhost, points the
+app at them (LUNCHMONEY_BASE_URL, OLLAMA_URL, a throwaway store and
+response cache), then measures:
+  - tools: every TOOLS entry, cold (empty store + reference cache before
+    each run) and warm (state kept), with sample args for the ledger
+  - chat:  chat.chat_with_tools over scripted scenarios (no tool, one
+    tool, a batched call, a router pre-routed question)
+Prints JSON with p50 / p95 latency, HTTP requests and bytes per run, and
+peak traced memory per entry. With --baseline, each p50 is also compared
+to a previous run's output; --max-regression makes that a failing check.
+
+    python bench/run_bench.py                               # from poc/
+    python bench/run_bench.py --transactions 20000 --latency-ms 40 --runs 5
+    python bench/run_bench.py --fixtures recorded/ --out bench.json
+    python bench/run_bench.py --baseline bench.json --max-regression 1.25
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fakes import FakeLunchMoney, FakeOllama, delta, load_fixtures
+from ledger import synthetic_ledger
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+try:
+    import resource  # not on Windows
+except ImportError:
+    resource = None
+
+# -----------------------------
+# Stats
+# -----------------------------
+
+def _percentile(sorted_ms: List[float], q: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))]
+
+def _summary(times: List[float], traffic: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ms = sorted(t * 1000 for t in times)
+    requests: Dict[str, float] = {}
+    for d in traffic:
+        for route, n in d["requests"].items():
+            requests[route] = requests.get(route, 0) + n
+    runs = len(times)
+    return {
+        "runs": runs,
+        "p50_ms": round(statistics.median(ms), 2),
+        "p95_ms": round(_percentile(ms, 0.95), 2),
+        "min_ms": round(ms[0], 2),
+        "mean_ms": round(statistics.fmean(ms), 2),
+        "requests_per_run": {k: round(v / runs, 2) for k, v in sorted(requests.items())},
+        "bytes_per_run": round(sum(d["bytes"] for d in traffic) / runs),
+    }
+
+# -----------------------------
+# Scenario data
+# -----------------------------
+
+def _months_back(today: dt.date, n: int) -> str:
+    y, m = today.year, today.month - n
+    while m <= 0:
+        y, m = y - 1, m + 12
+    return f"{y:04d}-{m:02d}"
+
+def tool_args(data: Dict[str, Any], today: dt.date) -> Dict[str, Dict[str, Any]]:
+    """Sample args per tool: the last 3 months of the ledger, ids that exist in it."""
+    start = (today.replace(day=1) - dt.timedelta(days=62)).replace(day=1).isoformat()
+    end = today.isoformat()
+    txns = data["transactions"]
+    txn = txns[len(txns) // 2] if txns else {"id": 1, "payee": ""}
+    category = (data["categories"] or [{"id": 1}])[0]
+    payee = (txn.get("payee") or "").split(" ")[0]
+    return {
+        "get_transactions": {"start_date": start, "end_date": end},
+        "search_transactions": {"start_date": start, "end_date": end, "payee": payee},
+        "get_single_transaction": {"id": txn["id"]},
+        "get_transaction_group": {"transaction_id": txn["id"]},
+        "get_categories": {},
+        "get_category": {"category_id": category["id"]},
+        "get_tags": {},
+        "get_plaid_accounts": {},
+        "sum_by_category": {"start_date": start, "end_date": end},
+        "month_over_month": {"start_month": _months_back(today, 5), "months": 6},
+        "top_merchants": {"start_date": start, "end_date": end, "n": 10},
+        "monthly_cashflow": {"start_month": _months_back(today, 5), "months": 6},
+        "compare_yoy": {"month": _months_back(today, 1)},
+    }
+
+def _tool_call(calls: Any) -> str:
+    return "<tool_call>" + json.dumps(calls) + "</tool_call>"
+
+def chat_scenarios(args_by_tool: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """name, question, the scripted model reply to it, and whether the router picks the tool instead."""
+    return [
+        {"name": "no_tool", "question": "What can you do?", "reply": "I can summarize your Lunch Money transactions.", "route": False},
+        {"name": "one_tool", "question": "Where did my money go recently?",
+         "reply": "Let me check. " + _tool_call({"tool": "sum_by_category", "args": args_by_tool["sum_by_category"]}), "route": False},
+        {"name": "batched", "question": "Give me an overview: categories, top merchants and cashflow.",
+         "reply": _tool_call([
+             {"tool": "sum_by_category", "args": args_by_tool["sum_by_category"]},
+             {"tool": "top_merchants", "args": args_by_tool["top_merchants"]},
+             {"tool": "monthly_cashflow", "args": args_by_tool["monthly_cashflow"]},
+         ]), "route": False},
+        {"name": "routed", "question": "spending by category last month", "reply": "", "route": True},
+    ]
+
+# -----------------------------
+# Runner
+# -----------------------------
+
+class Bench:
+    def __init__(self, lunchmoney: FakeLunchMoney, ollama: FakeOllama, runs: int, trace_memory: bool) -> None:
+        self.lunchmoney = lunchmoney
+        self.ollama = ollama
+        self.runs = runs
+        self.trace_memory = trace_memory
+
+    def _snapshot(self) -> Dict[str, Any]:
+        lm, ol = self.lunchmoney.snapshot(), self.ollama.snapshot()
+        return {
+            "requests": {**{"lunchmoney " + k: v for k, v in lm["requests"].items()}, **{"ollama " + k: v for k, v in ol["requests"].items()}},
+            "bytes": lm["bytes"] + ol["bytes"],
+        }
+
+    def measure(self, fn: Callable[[], Any], reset: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        times: List[float] = []
+        traffic: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        for _ in range(self.runs):
+            if reset is not None:
+                reset()
+            before = self._snapshot()
+            t0 = time.perf_counter()
+            out = fn()
+            times.append(time.perf_counter() - t0)
+            traffic.append(delta(before, self._snapshot()))
+            if isinstance(out, dict) and "error" in out:
+                errors.append(str(out["error"]))
+        stats = _summary(times, traffic)
+        if errors:
+            stats["errors"] = len(errors)
+            stats["first_error"] = errors[0][:200]
+        if self.trace_memory:
+            # Separate traced run: tracemalloc slows allocation-heavy code, so it isn't timed
+            if reset is not None:
+                reset()
+            tracemalloc.start()
+            try:
+                fn()
+                stats["peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            finally:
+                tracemalloc.stop()
+        return stats
+
+def _reset_state() -> None:
+    """Empty the transaction store and the reference response cache (cold run)."""
+    import lunchmoney
+    from store import get_store
+
+    store = get_store()
+    if store is not None:
+        store.clear()
+    lunchmoney.invalidate_reference_cache()
+
+def run(opts: argparse.Namespace) -> Dict[str, Any]:
+    today = dt.date.today()
+    data = load_fixtures(opts.fixtures) if opts.fixtures else synthetic_ledger(opts.transactions, opts.days, today, opts.seed)
+    args_by_tool = tool_args(data, today)
+    scenarios = chat_scenarios(args_by_tool)
+    workdir = tempfile.mkdtemp(prefix="lm-bench-")
+
+    lunchmoney_fake = FakeLunchMoney(data, latency=opts.latency_ms / 1000).start()
+    ollama_fake = FakeOllama(
+        {s["question"]: s["reply"] for s in scenarios},
+        latency=opts.model_latency_ms / 1000,
+        token_latency=opts.token_latency_ms / 1000,
+    ).start()
+    try:
+        # Before importing the app: modules read their config at import time
+        os.environ.update({
+            "LUNCHMONEY_BASE_URL": lunchmoney_fake.base_url,
+            "LUNCHMONEY_TOKEN": "bench",
+            "OLLAMA_URL": ollama_fake.url,
+            "LM_STORE_PATH": os.path.join(workdir, "lunchmoney.sqlite3"),
+            "LM_CACHE_PATH": os.path.join(workdir, "responses.sqlite3"),
+            "LM_RATE_LIMIT": str(opts.rate_limit),
+            "LM_WARMUP": "0",
+            "LM_MAX_RETRIES": "0",
+        })
+        sys.path.insert(0, SRC)
+        import chat
+        import tools
+        from prompts import SYSTEM_PROMPT
+        from router import route
+
+        bench = Bench(lunchmoney_fake, ollama_fake, opts.runs, not opts.no_memory)
+        selected = [n for n in tools.TOOLS if not opts.tools or n in opts.tools]
+
+        tool_results: Dict[str, Any] = {}
+        for name in selected:
+            call = {"tool": name, "args": args_by_tool.get(name, {})}
+            fn = lambda call=call: tools.run_tool({"tool": call["tool"], "args": dict(call["args"])})
+            tool_results[name] = {"cold": bench.measure(fn, _reset_state), "warm": bench.measure(fn)}
+
+        chat_results: Dict[str, Any] = {}
+        for sc in scenarios:
+            def turn(sc: Dict[str, Any] = sc) -> Dict[str, Any]:
+                messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": sc["question"]}]
+                routed = route(sc["question"], chat.default_dates(3)) if sc["route"] else None
+                final, steps, guard, *_ = chat.chat_with_tools(messages, 3, routed=routed)
+                return {"error": "guard tripped"} if guard else {"steps": steps}
+            chat_results[sc["name"]] = {"cold": bench.measure(turn, _reset_state), "warm": bench.measure(turn)}
+    finally:
+        lunchmoney_fake.stop()
+        ollama_fake.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result: Dict[str, Any] = {
+        "config": {
+            "python": sys.version.split()[0],
+            "ledger": opts.fixtures or f"synthetic(n={opts.transactions}, days={opts.days}, seed={opts.seed})",
+            "transactions": len(data["transactions"]),
+            "runs": opts.runs,
+            "latency_ms": opts.latency_ms,
+            "model_latency_ms": opts.model_latency_ms,
+            "token_latency_ms": opts.token_latency_ms,
+            "rate_limit": opts.rate_limit,
+        },
+        "tools": tool_results,
+        "chat": chat_results,
+    }
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["max_rss_kib"] = rss // 1024 if sys.platform == "darwin" else rss
+    return result
+
+# Sub-millisecond p50s (cache hits) are mostly timer noise; not compared
+MIN_COMPARE_MS = 1.0
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, float]:
+    """p50 ratio (current / baseline) for every section/name/mode present in both."""
+    ratios: Dict[str, float] = {}
+    for section in ("tools", "chat"):
+        for name, modes in result.get(section, {}).items():
+            for mode, stats in modes.items():
+                base = baseline.get(section, {}).get(name, {}).get(mode)
+                if base and base.get("p50_ms", 0) >= MIN_COMPARE_MS:
+                    ratios[f"{section}/{name}/{mode}"] = round(stats["p50_ms"] / base["p50_ms"], 3)
+    return ratios
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--transactions", type=int, default=5000, help="synthetic ledger size")
+    ap.add_argument("--days", type=int, default=730, help="synthetic ledger span (days up to today)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--fixtures", help="directory of recorded responses (transactions.json, categories.json, ...)")
+    ap.add_argument("--latency-ms", type=float, default=20.0, help="added to every Lunch Money request")
+    ap.add_argument("--model-latency-ms", type=float, default=50.0, help="added to every Ollama request")
+    ap.add_argument("--token-latency-ms", type=float, default=2.0, help="per streamed token")
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="LM_RATE_LIMIT for the run (0 = off)")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--tools", nargs="*", help="only these tools")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--out", help="also write the JSON here")
+    ap.add_argument("--baseline", help="previous --out file to compare p50s against")
+    ap.add_argument("--max-regression", type=float, help="with --baseline: exit 1 if any p50 ratio exceeds this")
+    opts = ap.parse_args()
+
+    result = run(opts)
+    failed: List[Tuple[str, float]] = []
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as f:
+            ratios = compare(result, json.load(f))
+        result["vs_baseline"] = ratios
+        if opts.max_regression:
+            failed = [(k, r) for k, r in ratios.items() if r > opts.max_regression]
+            result["regressions"] = dict(failed)
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if opts.out:
+        with open(opts.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+# scaling.py
+"""
+Scaling suite for the analytics tools: time and memory from 1k to 1M rows.
+
+For every ledger size (ledger.synthetic_ledger over --days days):
+  frame  in-memory path (what LM_STORE=0 runs), over all n rows: parse
+         (API dicts -> txn.Transaction), then sum_by_category (_aggregate),
+         top_merchants (_top_merchants_frame), category_health
+         (_category_health_frame) over the parsed rows
+  store  SQLite path: ingest (put_range of the whole ledger), then the tool
+         executors over the whole span (sum_by_category, top_merchants via
+         the rollups) and category_health for the last full month, with
+         budgets served by FakeLunchMoney
+Prints JSON (median ms and tracemalloc peak KiB per size, plus the log-log
+slope of each over the larger sizes), a text chart on stderr and, with
+--plot and matplotlib installed, a PNG. Exits 1 when a check fails:
+  - complexity: with --max-slope, a time or memory slope above it (1.0 =
+    linear); only checked when the fit spans sizes at least 10x apart and
+    every size is the median of 3+ runs, otherwise the slope is just printed
+  - regression: with --baseline, a time or memory ratio above --max-regression
+
+    python bench/scaling.py                                 # from poc/
+    python bench/scaling.py --sizes 1000 10000 100000 --out scaling.json
+    python bench/scaling.py --max-slope 1.3                 # complexity gate
+    python bench/scaling.py --baseline scaling.json --max-regression 1.5
+"""
+import argparse
+import datetime as dt
+import gc
+import json
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fakes import FakeLunchMoney
+from ledger import synthetic_ledger
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+except Exception:
+    plt = None
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Slopes are fitted over sizes >= this; below it fixed costs dominate
+SLOPE_MIN_ROWS = 10_000
+# --max-slope is only enforced when the fitted sizes span this ratio, each timed this many times
+SLOPE_MIN_SPAN = 10
+SLOPE_MIN_RUNS = 3
+# Timings / peaks this small are noise, not signal, for slopes and ratios
+MIN_MS = 1.0
+MIN_KIB = 64.0
+
+# -----------------------------
+# Measurement
+# -----------------------------
+
+def _time(fn: Callable[[], Any], runs: int, reset: Optional[Callable[[], None]] = None) -> float:
+    """Median wall time in ms."""
+    times = []
+    for _ in range(runs):
+        if reset is not None:
+            reset()
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+def _peak_kib(fn: Callable[[], Any], reset: Optional[Callable[[], None]] = None) -> float:
+    """Peak traced allocation while fn runs (numpy buffers included)."""
+    if reset is not None:
+        reset()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def slope(points: List[Tuple[int, float]], floor: float) -> Optional[float]:
+    """Least-squares slope of log(value) over log(rows) for rows >= SLOPE_MIN_ROWS (None if < 2 usable points)."""
+    pts = [(math.log(n), math.log(max(v, floor))) for n, v in points if n >= SLOPE_MIN_ROWS]
+    if len(pts) < 2:
+        return None
+    mx = statistics.fmean(x for x, _ in pts)
+    my = statistics.fmean(y for _, y in pts)
+    var = sum((x - mx) ** 2 for x, _ in pts)
+    return round(sum((x - mx) * (y - my) for x, y in pts) / var, 3)
+
+# -----------------------------
+# Suite
+# -----------------------------
+
+def slope_gated(sizes: List[int], runs: int, single_run_from: int) -> bool:
+    """Whether slopes over these sizes are steady enough to fail on (see SLOPE_MIN_SPAN / SLOPE_MIN_RUNS)."""
+    fit = sorted(n for n in sizes if n >= SLOPE_MIN_ROWS)
+    if len(fit) < 2 or fit[-1] / fit[0] < SLOPE_MIN_SPAN:
+        return False
+    # The largest sizes are timed once by design: long enough that one run is steady
+    return runs >= SLOPE_MIN_RUNS or fit[0] >= single_run_from
+
+def _last_full_month(today: dt.date) -> str:
+    return (today.replace(day=1) - dt.timedelta(days=1)).strftime("%Y-%m")
+
+def cases(tools: Any, txn: Any, store: Any, txns: List[Dict[str, Any]], budget: Dict[str, Any], start: str, end: str, month: str,
+) -> Dict[str, Dict[str, Tuple[Callable[[], Any], Optional[Callable[[], None]]]]]:
+    """section -> name -> (fn, reset before each run or None)."""
+    span = {"start_date": start, "end_date": end}
+    records = txn.parse_transactions(txns)
+
+    def ingest() -> None:
+        store.put_range(start, end, txns)
+
+    return {
+        "frame": {
+            "parse": (lambda: txn.parse_transactions(txns), None),
+            "sum_by_category": (lambda: tools._category_rows(tools._aggregate(records)["*"].by_category), None),
+            "top_merchants": (lambda: tools._top_merchants_frame(records, {"n": 10}), None),
+            "category_health": (lambda: tools._category_health_frame(budget, records, {"month": month}), None),
+        },
+        "store": {
+            # Each ingest run starts from an empty store and leaves all n rows for the queries below
+            "ingest": (ingest, store.clear),
+            "sum_by_category": (lambda: tools.exec_sum_by_category(dict(span)), None),
+            "top_merchants": (lambda: tools.exec_top_merchants({**span, "n": 10}), None),
+            "category_health": (lambda: tools.exec_category_health({"month": month}), None),
+        },
+    }
+
+def run(opts: argparse.Namespace) -> Dict[str, Any]:
+    today = dt.date.today()
+    workdir = tempfile.mkdtemp(prefix="lm-scaling-")
+    reference = synthetic_ledger(0, opts.days, today, opts.seed)
+    budget = {"budgets": reference["budgets"]}
+    # Only budgets should ever be requested; transactions come from the pre-filled store
+    fake = FakeLunchMoney({**reference, "transactions": []}).start()
+    os.environ.update({
+        "LUNCHMONEY_BASE_URL": fake.base_url,
+        "LUNCHMONEY_TOKEN": "bench",
+        "LM_STORE": "1",
+        "LM_STORE_PATH": os.path.join(workdir, "lunchmoney.sqlite3"),
+        "LM_CACHE_PATH": os.path.join(workdir, "responses.sqlite3"),
+        "LM_STORE_TTL": str(10 ** 9),
+        "LM_RATE_LIMIT": "0",
+        "LM_TRACE": "off",
+    })
+    sys.path.insert(0, SRC)
+    import tools
+    import txn
+    from store import get_store
+
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    try:
+        store = get_store()
+        start = (today - dt.timedelta(days=opts.days - 1)).isoformat()
+        end = today.isoformat()
+        month = _last_full_month(today)
+        for n in sorted(opts.sizes):
+            t0 = time.perf_counter()
+            txns = synthetic_ledger(n, opts.days, today, opts.seed)["transactions"]
+            print(f"[scaling] {n:>9,} rows generated in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+            store.clear()
+            runs = opts.runs if n < opts.single_run_from else 1
+            for section, named in cases(tools, txn, store, txns, budget, start, end, month).items():
+                for name, (fn, reset) in named.items():
+                    entry = results.setdefault(section, {}).setdefault(name, {"rows": [], "ms": [], "peak_kib": []})
+                    entry["rows"].append(n)
+                    entry["ms"].append(round(_time(fn, runs, reset), 2))
+                    if not opts.no_memory:
+                        entry["peak_kib"].append(round(_peak_kib(fn, reset), 1))
+                    print(f"[scaling] {n:>9,} {section}/{name}: {entry['ms'][-1]:.1f} ms", file=sys.stderr)
+            del txns
+            gc.collect()
+    finally:
+        fake.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for named in results.values():
+        for entry in named.values():
+            entry["time_slope"] = slope(list(zip(entry["rows"], entry["ms"])), MIN_MS)
+            entry["memory_slope"] = slope(list(zip(entry["rows"], entry["peak_kib"])), MIN_KIB) if entry["peak_kib"] else None
+    return {
+        "config": {
+            "python": sys.version.split()[0],
+            "sizes": sorted(opts.sizes),
+            "days": opts.days,
+            "seed": opts.seed,
+            "runs": opts.runs,
+            "slope_min_rows": SLOPE_MIN_ROWS,
+            "slope_gated": slope_gated(opts.sizes, opts.runs, opts.single_run_from),
+        },
+        "http_requests": fake.snapshot()["requests"],
+        "results": results,
+    }
+
+# -----------------------------
+# Checks and output
+# -----------------------------
+
+def check(result: Dict[str, Any], max_slope: Optional[float], baseline: Optional[Dict[str, Any]], max_regression: Optional[float]) -> List[str]:
+    failures = []
+    gate_slopes = max_slope is not None and result["config"].get("slope_gated", False)
+    for section, named in result["results"].items():
+        for name, e in named.items():
+            key = f"{section}/{name}"
+            for metric in ("time_slope", "memory_slope"):
+                if gate_slopes and e.get(metric) is not None and e[metric] > max_slope:
+                    failures.append(f"{key}: {metric} {e[metric]} > {max_slope}")
+            base = (baseline or {}).get("results", {}).get(section, {}).get(name)
+            if not base or not max_regression:
+                continue
+            for metric, floor in (("ms", MIN_MS), ("peak_kib", MIN_KIB)):
+                prev = dict(zip(base["rows"], base.get(metric) or []))
+                for n, v in zip(e["rows"], e.get(metric) or []):
+                    if n in prev and prev[n] >= floor and v / prev[n] > max_regression:
+                        failures.append(f"{key} @ {n:,} rows: {metric} {v} vs {prev[n]} (x{v / prev[n]:.2f})")
+    return failures
+
+def chart(result: Dict[str, Any]) -> str:
+    """Time and memory per size as a text table, one row per tool."""
+    sizes = result["config"]["sizes"]
+    head = f"{'tool':<24}" + "".join(f"{n:>12,}" for n in sizes) + f"{'slope':>8}"
+    lines = []
+    for metric, title, slope_key in (("ms", "time (median ms)", "time_slope"), ("peak_kib", "memory (peak KiB)", "memory_slope")):
+        lines += [f"-- {title} --", head]
+        for section, named in result["results"].items():
+            for name, e in named.items():
+                values = dict(zip(e["rows"], e.get(metric) or []))
+                cells = "".join(f"{values[n]:>12,.1f}" if n in values else f"{'-':>12}" for n in sizes)
+                s = e.get(slope_key)
+                lines.append(f"{section + '/' + name:<24}{cells}{'-' if s is None else s:>8}")
+    return "\n".join(lines)
+
+def plot(result: Dict[str, Any], path: str) -> None:
+    fig, (ax_t, ax_m) = plt.subplots(1, 2, figsize=(12, 5))
+    for section, named in result["results"].items():
+        for name, e in named.items():
+            ax_t.plot(e["rows"], e["ms"], marker="o", label=f"{section}/{name}")
+            if e["peak_kib"]:
+                ax_m.plot(e["rows"], e["peak_kib"], marker="o", label=f"{section}/{name}")
+    for ax, label in ((ax_t, "median ms"), (ax_m, "peak KiB")):
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("rows")
+        ax.set_ylabel(label)
+        ax.grid(True, which="both", alpha=0.3)
+    ax_t.legend(fontsize=7)
+    fig.tight_layout()
+    fig.savefig(path)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--days", type=int, default=3 * 365, help="ledger span (days up to today)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--runs", type=int, default=3, help="timed runs per measurement (median)")
+    ap.add_argument("--single-run-from", type=int, default=500_000, help="sizes from here on are timed once")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc passes")
+    ap.add_argument("--max-slope", type=float, help="fail above this log-log slope (time or memory); off by default")
+    ap.add_argument("--baseline", help="previous --out file")
+    ap.add_argument("--max-regression", type=float, default=1.5, help="with --baseline: fail above this ratio")
+    ap.add_argument("--out", help="also write the JSON here")
+    ap.add_argument("--plot", help="PNG path for a log-log chart (needs matplotlib)")
+    opts = ap.parse_args()
+
+    result = run(opts)
+    baseline = None
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    failures = check(result, opts.max_slope, baseline, opts.max_regression if baseline else None)
+    result["failures"] = failures
+    if opts.max_slope is not None and not result["config"]["slope_gated"]:
+        print(
+            f"[scaling] --max-slope not checked: needs sizes >= {SLOPE_MIN_ROWS:,} spanning {SLOPE_MIN_SPAN}x "
+            f"and --runs >= {SLOPE_MIN_RUNS}", file=sys.stderr,
+        )
+
+    print(chart(result), file=sys.stderr)
+    if opts.plot:
+        if plt is None:
+            print("[scaling] matplotlib not installed; no plot", file=sys.stderr)
+        else:
+            plot(result, opts.plot)
+    text = json.dumps(result, indent=2)
+    print(text)
+    if opts.out:
+        with open(opts.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if failures:
+        print("[scaling] FAILED:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
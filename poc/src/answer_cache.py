@@ -0,0 +1,224 @@
+# answer_cache.py
+"""
+Answer cache for repeated finance questions.
+
+A final reply is stored together with the tool calls (fully resolved args)
+that produced it. Lookup is by the normalized question first, then by
+similarity: questions are embedded (hashed word + character-trigram
+vectors by default, or an Ollama embedding model via LM_ANSWER_EMBED_MODEL)
+and the closest entry above LM_ANSWER_SIMILARITY wins, but only if the two
+questions carry the same "slots" (numbers, months, periods, merchant and
+category words...), so "groceries last month" never answers "restaurants
+this month". Both steps only look at entries made after the same earlier
+user turns (`history`), so a follow-up like "what about last month?" is
+never answered from another conversation.
+
+An entry is served only if:
+  - it was made today with the same default window (relative dates resolve
+    the same way),
+  - the store's data_version is unchanged (no transaction was added, edited
+    or removed since), and
+  - every date range its tools read (as each tool resolves its own args,
+    see tools.tool_ranges) is still fully synced, i.e. the store would not
+    have to go back to Lunch Money for it.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from lm import ollama_client
+from store import get_store
+from tools import tool_ranges
+
+ANSWER_CACHE_ENABLED = os.getenv("LM_ANSWER_CACHE", "1").lower() not in ("0", "false", "no", "off")
+ANSWER_CACHE_MAXSIZE = int(os.getenv("LM_ANSWER_CACHE_MAXSIZE", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("LM_ANSWER_CACHE_TTL", "86400"))
+SIMILARITY = float(os.getenv("LM_ANSWER_SIMILARITY", "0.5"))
+EMBED_MODEL = os.getenv("LM_ANSWER_EMBED_MODEL", "")
+
+_DIM = 512
+
+# Phrasing words: free to differ between two questions that mean the same thing.
+# Every other token (numbers, months, this/last, payees, categories...) is a slot and must match.
+_GENERIC = frozenset("""
+a an the and or of for to in on at by from with about over per my me i we our us you your it its is are was were
+be been do does did have has had can could would should will please show tell give list get find see display
+what whats which who how much many where when total totals sum amount amounts spend spent spending spendings
+expense expenses cost costs paid pay money purchases purchase so far
+""".split())
+# Synonyms folded together before slots are compared
+_SYNONYMS = {
+    **dict.fromkeys(("merchants", "payee", "payees", "vendor", "vendors", "store", "stores", "shops"), "merchant"),
+    **dict.fromkeys(("categories", "categorized", "bucket", "buckets"), "category"),
+    **dict.fromkeys(("biggest", "largest", "most", "highest"), "top"),
+    **dict.fromkeys(("versus", "vs", "against", "comparison"), "compare"),
+    **dict.fromkeys(("previous", "prior", "past"), "last"),
+    **dict.fromkeys(("current",), "this"),
+    **dict.fromkeys(("months", "monthly"), "month"),
+    **dict.fromkeys(("years", "yearly", "annual"), "year"),
+    **dict.fromkeys(("transaction", "transactions", "payments", "payment", "charges"), "charge"),
+}
+
+def normalize(question: str) -> str:
+    text = question.lower().replace("’", "'")
+    text = re.sub(r"[^\w\s-]", " ", text)
+    return " ".join(text.split())
+
+def _slots(normalized: str) -> frozenset:
+    return frozenset(_SYNONYMS.get(w, w) for w in normalized.split() if w not in _GENERIC)
+
+def _hash_embed(normalized: str) -> np.ndarray:
+    vec = np.zeros(_DIM, dtype=np.float32)
+    words = [_SYNONYMS.get(w, w) for w in normalized.split()]
+    grams = words + [w[i:i + 3] for w in (f" {x} " for x in words) for i in range(len(w) - 2)]
+    for g in grams:
+        h = int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest(), "little")
+        vec[h % _DIM] += 1.0 if h & 1 << 31 else -1.0
+    return vec
+
+def _embed(normalized: str) -> np.ndarray:
+    vec = None
+    client = ollama_client() if EMBED_MODEL else None
+    if client is not None:
+        try:
+            vec = np.asarray(client.embed(model=EMBED_MODEL, input=normalized)["embeddings"][0], dtype=np.float32)
+        except Exception:
+            vec = None
+    if vec is None:
+        vec = _hash_embed(normalized)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    history: str
+    tools: List[Dict[str, Any]]
+    context: str
+    data_version: Optional[str]
+    created_at: float = field(default_factory=time.time)
+    vector: Optional[np.ndarray] = field(default=None, repr=False)
+
+    def _ranges_synced(self) -> bool:
+        store = get_store()
+        if store is None:
+            return True
+        for call in self.tools:
+            for start, end in tool_ranges(call):
+                if store.missing_ranges(start, end):
+                    return False
+        return True
+
+    def valid(self, context: str, data_version: Optional[str], now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return (
+            self.context == context
+            and self.data_version == data_version
+            and now - self.created_at < ANSWER_CACHE_TTL
+            and self._ranges_synced()
+        )
+
+def _data_version() -> Optional[str]:
+    store = get_store()
+    return store.data_version() if store is not None else None
+
+def _context(extra: str) -> str:
+    return f"{date.today().isoformat()}|{extra}"
+
+def _history(history: Optional[List[str]]) -> str:
+    """Digest of the earlier user turns a question follows ("" for a fresh chat)."""
+    if not history:
+        return ""
+    return hashlib.blake2b("\n".join(map(normalize, history)).encode(), digest_size=8).hexdigest()
+
+def _key(question: str, history: str) -> str:
+    return f"{history}|{question}" if history else question
+
+class AnswerCache:
+    def __init__(self, maxsize: int = ANSWER_CACHE_MAXSIZE, similarity: float = SIMILARITY):
+        self.maxsize = maxsize
+        self.similarity = similarity
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+
+    def lookup(
+        self, question: str, context: str = "", tools: Optional[List[Dict[str, Any]]] = None,
+        history: Optional[List[str]] = None,
+    ) -> Optional[CachedAnswer]:
+        """
+        Cached answer for question, or None. context is anything else the answer
+        depends on (e.g. the default months-back window); tools, when the caller
+        already knows the resolved tool calls, must match the entry's exactly;
+        history is the chat's earlier user turns, which must match too.
+        """
+        question, hist = normalize(question), _history(history)
+        ctx, version = _context(context), _data_version()
+        with self._lock:
+            entry = self._entries.get(_key(question, hist))
+            if entry is None:
+                entry = self._nearest(question, hist)
+            if entry is None:
+                return None
+            if not entry.valid(ctx, version) or (tools is not None and _canonical(tools) != _canonical(entry.tools)):
+                return None
+            self._entries.move_to_end(_key(entry.question, entry.history))
+            return entry
+
+    def _nearest(self, key: str, history: str) -> Optional[CachedAnswer]:
+        slots = _slots(key)
+        candidates = [e for e in self._entries.values() if e.history == history and _slots(e.question) == slots]
+        if not candidates:
+            return None
+        vec = _embed(key)
+        scores = [float(vec @ e.vector) if e.vector is not None and e.vector.shape == vec.shape else -1.0 for e in candidates]
+        best = int(np.argmax(scores))
+        return candidates[best] if scores[best] >= self.similarity else None
+
+    def put(
+        self, question: str, answer: str, tools: List[Dict[str, Any]], context: str = "",
+        history: Optional[List[str]] = None,
+    ) -> None:
+        question, hist = normalize(question), _history(history)
+        entry = CachedAnswer(
+            question, answer, hist, json.loads(_canonical(tools)), _context(context), _data_version(),
+            vector=_embed(question),
+        )
+        key = _key(question, hist)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+def _canonical(tools: List[Dict[str, Any]]) -> str:
+    return json.dumps(
+        [{"tool": t.get("tool"), "args": t.get("args") or {}} for t in tools],
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str,
+    )
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide answer cache, or None when disabled via LM_ANSWER_CACHE=0."""
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+        return _cache
@@ -3,20 +3,29 @@ from __future__ import annotations
 import re
 import os
 import json
-import datetime as dt
-from typing import List, Dict, Any, Tuple
+from typing import Any, Dict, List
 
 import streamlit as st
 from dotenv import load_dotenv
 
-from lm import chat, extract_tool_call
-from tools import run_tool
-from prompts import SYSTEM_PROMPT
-
 #=============================
 #  SETTINGS
 #=============================
-load_dotenv()
+# Once per process, and before the local imports below: they read their env vars at import time
+@st.cache_resource
+def _load_env() -> bool:
+    return load_dotenv()
+
+_load_env()
+
+from answer_cache import get_answer_cache  # noqa: E402
+from chat import chat_with_tools, default_dates  # noqa: E402
+from history import HistoryWindow  # noqa: E402
+from lunchmoney import refresh_transactions  # noqa: E402
+from router import ROUTER_MODE, route  # noqa: E402
+from tracing import TRACE_MODE, collect, format_breakdown, span  # noqa: E402
+from warmup import start_warmup  # noqa: E402
+from prompts import SYSTEM_PROMPT  # noqa: E402
 
 st.set_page_config(page_title="LM PoC", page_icon="💬")
 st.title("💬 Local Finance Chat (Ollama + Lunch Money)")
@@ -62,66 +71,33 @@ with st.sidebar:
     model = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
     st.write(f"**Model:** {model}")
     st.caption("Change via OLLAMA_MODEL env var.")
-
-def _default_dates(n_months: int) -> tuple[str, str]:
-    today = dt.date.today()
-    first_of_this_month = today.replace(day=1)
-    start_month = first_of_this_month
-    for _ in range(n_months):
-        start_month = (start_month - dt.timedelta(days=1)).replace(day=1)
-    start = start_month
-    end = today
-    return start.isoformat(), end.isoformat()
+    show_timings = st.checkbox("Show timing breakdown", value=TRACE_MODE != "off", help="Per-turn spans: model, Lunch Money HTTP, tools, compaction.")
+    if st.button("Refresh transactions", help="Re-fetch from Lunch Money on the next question instead of using the local store."):
+        refresh_transactions()
+        st.toast("Transactions will be re-fetched on the next question.")
 
 # -----------------------------
-# Tool loop (up to max_steps)
+# Warmup: model, reference data and the default window load in the background
 # -----------------------------
-def _chat_with_tools(messages: List[Dict[str, str]], months_back_default: int, max_steps: int = 2
-) -> Tuple[str | None, int, bool, Dict[str, Any] | None, Dict[str, Any] | None, Dict[str, Any] | None]:
-    """
-    Returns: (final_reply, steps, guard_tripped, last_tool_dict, last_tool_args, last_tool_result)
-    """
-    steps = 0
-    last_tool = None
-    last_args = None
-    last_result = None
-
-    while steps <= max_steps:
-        # 1) Model turn
-        resp = chat(messages)  # {"role":"assistant","content":"... maybe <tool_call>{...}</tool_call>"}
-        messages.append(resp)
-
-        # 2) Tool requested?
-        tool = extract_tool_call(resp.get("content", "") or "")
-        if tool is None:
-            return resp.get("content", ""), steps, False, last_tool, last_args, last_result
-
-        # Guard: stop if we’d exceed steps
-        if steps == max_steps:
-            return None, steps, True, last_tool, last_args, last_result
-
-        # 3) Run tool
-        args = tool.setdefault("args", {})
-        if not ("start_date" in args and "end_date" in args):
-            s, e = _default_dates(months_back_default)
-            args.setdefault("start_date", s)
-            args.setdefault("end_date", e)
-
-        last_tool = tool
-        last_args = args
-        last_result = run_tool(tool)
-
-        # 4) Feed tool result as a new user message so the model can summarize
-        tool_result_msg = {
-            "role": "user",
-            "content": "Tool result for " + str(tool.get("tool")) +
-                       ":\n<tool_result>" + json.dumps(last_result, ensure_ascii=False) + "</tool_result>"
-        }
-        messages.append(tool_result_msg)
-        steps += 1
-
-    # Shouldn’t reach here; treat as guard
-    return None, steps, True, last_tool, last_args, last_result
+warmup = start_warmup(SYSTEM_PROMPT, default_dates(months_back))
+_STEP_ICONS = {"pending": "⏳", "running": "⏳", "done": "✅", "error": "⚠️"}
+
+def _warmup_status() -> None:
+    if warmup.ready:
+        st.caption("✅ Ready")
+    for step in warmup.status():
+        line = f"{_STEP_ICONS[step.state]} {step.name}"
+        if step.finished:
+            line += f" ({step.seconds:.1f}s)"
+        if step.error:
+            line += f": {step.error}"
+        st.caption(line)
+
+if warmup is not None:
+    with st.sidebar:
+        st.markdown("### Warmup")
+        # Poll while steps are still running; static once everything is done
+        st.fragment(run_every=None if warmup.ready else 1)(_warmup_status)()
 
 # -----------------------------
 # State + UI
@@ -130,6 +106,8 @@ if "messages" not in st.session_state:
     st.session_state.messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
     ]
+if "history_window" not in st.session_state:
+    st.session_state.history_window = HistoryWindow()
 
 # Render chat history (exclude system)
 for m in st.session_state.messages:
@@ -152,36 +130,76 @@ if prompt:
         reply_placeholder.markdown("⏳ **Loading…**")
         status = st.status("🤔 Thinking…", expanded=False)
 
-    try:
-        # IMPORTANT: pass the whole message history into the tool loop.
-        # The loop APPENDS the assistant's tool request BEFORE running tools,
-        # then FEEDS tool result back to the model and asks again.
-        status.update(label="🤖 Talking to the model…", state="running")
-        final, steps, guard, last_tool, last_args, last_result = _chat_with_tools(
-            messages=st.session_state.messages,
-            months_back_default=months_back,
-            max_steps=2,
-        )
-
-        if final is not None:
-            with assistant_bubble:
-                reply_placeholder.markdown(_sanitize_reply(final))
-            status.update(label="✅ Done", state="complete")
-        else:
+    # Spans of this turn (model, Lunch Money, tools, compaction) for the timing breakdown
+    with collect() as turn_spans:
+        with span("router.route") as sp:
+            routed = route(prompt, default_dates(months_back)) if ROUTER_MODE != "off" else None
+            sp.set(routed=routed["tool"] if routed else None)
+        answers = get_answer_cache()
+        cache_context = f"months_back={months_back}"
+        # Earlier user turns: follow-ups ("what about last month?") only hit entries from the same conversation
+        earlier = [m["content"] for m in st.session_state.messages[:-1] if m["role"] == "user"]
+        with span("answer_cache.lookup") as sp:
+            cached = answers.lookup(prompt, cache_context, [routed] if routed else None, earlier) if answers else None
+            sp.set(hit=cached is not None)
+
+        if cached is not None:
             with assistant_bubble:
-                reply_placeholder.markdown("⚠️ I needed more tool steps than allowed (max 2). Try narrowing the request.")
-            status.update(label="⚠️ Max steps reached", state="error")
-
-            # Optional debug
-            with st.expander("Debug: last tool call & result"):
-                st.code(json.dumps(last_tool or {}, indent=2), language="json")
-                st.code(json.dumps(last_result or {}, indent=2), language="json")
+                reply_placeholder.markdown(_sanitize_reply(cached.answer))
+            st.session_state.messages.append({"role": "assistant", "content": cached.answer})
+            status.update(label="⚡ Answered from cache", state="complete")
 
-    except Exception as e:
+        else:
+            try:
+                # IMPORTANT: pass the whole message history into the tool loop.
+                # The loop APPENDS the assistant's tool request BEFORE running tools,
+                # then FEEDS tool result back to the model and asks again.
+                status.update(label="🤖 Talking to the model…", state="running")
+
+                def _render_partial(text: str) -> None:
+                    if text.strip():
+                        reply_placeholder.markdown(_sanitize_reply(text) + " ▌")
+
+                calls: List[Dict[str, Any]] = []
+                final, steps, guard, last_tool, last_args, last_result = chat_with_tools(
+                    messages=st.session_state.messages,
+                    months_back_default=months_back,
+                    max_steps=2,
+                    on_text=_render_partial,
+                    window=st.session_state.history_window,
+                    calls=calls,
+                    routed=routed,
+                    templated=ROUTER_MODE == "template",
+                )
+
+                if final is not None:
+                    with assistant_bubble:
+                        reply_placeholder.markdown(_sanitize_reply(final))
+                    status.update(label="✅ Done", state="complete")
+                    # Only data-backed answers are worth caching (and can be invalidated)
+                    results = last_result if isinstance(last_result, list) else [last_result]
+                    if answers and calls and not any(isinstance(r, dict) and "error" in r for r in results):
+                        answers.put(prompt, final, calls, cache_context, earlier)
+                else:
+                    with assistant_bubble:
+                        reply_placeholder.markdown("⚠️ I needed more tool steps than allowed (max 2). Try narrowing the request.")
+                    status.update(label="⚠️ Max steps reached", state="error")
+
+                    # Optional debug
+                    with st.expander("Debug: last tool call & result"):
+                        st.code(json.dumps(last_tool or {}, indent=2), language="json")
+                        st.code(json.dumps(last_result or {}, indent=2), language="json")
+
+            except Exception as e:
+                with assistant_bubble:
+                    reply_placeholder.markdown("❌ **Error while generating a response.**")
+                    st.error(str(e))
+                try:
+                    status.update(label="❌ Failed", state="error")
+                except Exception:
+                    pass
+
+    if show_timings and turn_spans:
         with assistant_bubble:
-            reply_placeholder.markdown("❌ **Error while generating a response.**")
-            st.error(str(e))
-        try:
-            status.update(label="❌ Failed", state="error")
-        except Exception:
-            pass
+            with st.expander("Debug: timing breakdown"):
+                st.code(format_breakdown(turn_spans), language="text")
@@ -0,0 +1,134 @@
+# cache.py
+"""
+TTL + LRU response cache for Lunch Money reference endpoints.
+
+Entries keep the response's ETag / Last-Modified so an expired entry can be
+revalidated with a conditional request instead of re-downloaded. An
+in-memory LRU sits in front of a small SQLite table so the cache survives
+Streamlit reruns and process restarts. Keys are prefixed with a namespace
+(the Lunch Money account, see store.account_key()) so one file never serves
+another account's responses.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+CACHE_PATH = os.getenv(
+    "LM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lm_cache", "responses.sqlite3"),
+)
+CACHE_MAXSIZE = int(os.getenv("LM_CACHE_MAXSIZE", "256"))
+# A hit refreshes the entry's on-disk used_at (its LRU position) at most this often
+TOUCH_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+"""
+
+@dataclass
+class Entry:
+    value: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def fresh(self, ttl: float, now: Optional[float] = None) -> bool:
+        return ((time.time() if now is None else now) - self.fetched_at) < ttl
+
+class ResponseCache:
+    def __init__(self, path: Optional[str] = CACHE_PATH, maxsize: int = CACHE_MAXSIZE, namespace: str = ""):
+        self.maxsize = maxsize
+        self.namespace = namespace
+        self._lock = threading.RLock()
+        self._mem: "OrderedDict[str, Entry]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}|{key}" if self.namespace else key
+
+    def get(self, key: str) -> Optional[Entry]:
+        """Entry for key (fresh or not), or None. Callers decide freshness per endpoint TTL."""
+        key = self._key(key)
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                self._mem.move_to_end(key)
+                self._touch(key)
+                return entry
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT value, etag, last_modified, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = Entry(json.loads(row[0]), row[1], row[2], row[3])
+            self._remember(key, entry)
+            self._touch(key)
+            return entry
+
+    def put(self, key: str, entry: Entry) -> None:
+        key = self._key(key)
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is None:
+                return
+            now = time.time()
+            self._touched[key] = now
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, etag, last_modified, fetched_at, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, json.dumps(entry.value, ensure_ascii=False), entry.etag, entry.last_modified, entry.fetched_at, now),
+                )
+                # Same LRU bound on disk
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key NOT IN (SELECT key FROM responses ORDER BY used_at DESC LIMIT ?)",
+                    (self.maxsize,),
+                )
+
+    def invalidate(self, prefix: Optional[str] = None) -> None:
+        """Drop every entry of this namespace, or only keys starting with prefix (e.g. "/categories")."""
+        prefix = self._key(prefix or "") if self.namespace or prefix else None
+        with self._lock:
+            for key in [k for k in self._mem if prefix is None or k.startswith(prefix)]:
+                del self._mem[key]
+            if self._conn is None:
+                return
+            with self._conn:
+                if prefix is None:
+                    self._conn.execute("DELETE FROM responses")
+                else:
+                    self._conn.execute("DELETE FROM responses WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def _touch(self, key: str) -> None:
+        """Move key up the on-disk LRU (what put() evicts by), throttled to one write per TOUCH_SECONDS."""
+        now = time.time()
+        if self._conn is None or now - self._touched.get(key, 0.0) < TOUCH_SECONDS:
+            return
+        self._touched[key] = now
+        with self._conn:
+            self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+
+    def _remember(self, key: str, entry: Entry) -> None:
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
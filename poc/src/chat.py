@@ -0,0 +1,146 @@
+# chat.py
+"""
+The tool loop behind the Streamlit chat (app.py) and the async API
+(server.py), kept free of UI code so it can also be driven headless, e.g. by
+bench/run_bench.py.
+"""
+from __future__ import annotations
+import datetime as dt
+import json
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+from compact import TOOL_RESULT_TOKENS, compact_result
+from fastjson import dumps
+from history import HistoryWindow
+from lm import TOOL_CLOSE, TOOL_OPEN, extract_tool_calls, stream_reply
+from router import render
+from tools import MAX_TOOL_CALLS, run_tools
+from tracing import span, traced
+
+def default_dates(n_months: int) -> tuple[str, str]:
+    today = dt.date.today()
+    first_of_this_month = today.replace(day=1)
+    start_month = first_of_this_month
+    for _ in range(n_months):
+        start_month = (start_month - dt.timedelta(days=1)).replace(day=1)
+    start = start_month
+    end = today
+    return start.isoformat(), end.isoformat()
+
+# -----------------------------
+# Tool loop (up to max_steps)
+# -----------------------------
+# tool_loop() is the loop itself, written as a generator so the sync app and the
+# async server share it: it yields what it needs done and is sent back the answer
+#   ("model", messages)  -> the assistant message for that model turn
+#   ("tools", batch)     -> the results, one per call, in call order
+#   ("text", reply)      -> None; a reply that no model turn streamed (router template)
+# and returns (final_reply, steps, guard_tripped, last_tool_dict, last_tool_args, last_tool_result).
+ToolLoop = Generator[Tuple[str, Any], Any, Tuple[Optional[str], int, bool, Any, Any, Any]]
+
+def tool_loop(messages: List[Dict[str, str]], months_back_default: int, max_steps: int = 2,
+    window: Optional[HistoryWindow] = None, calls: Optional[List[Dict[str, Any]]] = None,
+    routed: Optional[Dict[str, Any]] = None, templated: bool = False,
+) -> ToolLoop:
+    steps = 0
+    last_tool = None
+    last_args = None
+    last_result = None
+
+    while steps <= max_steps:
+        # 1) Model turn, unless the router already chose the tool (recorded as if the model had asked)
+        pre_routed = routed is not None and steps == 0
+        if pre_routed:
+            resp = {"role": "assistant", "content": TOOL_OPEN + json.dumps(routed, ensure_ascii=False) + TOOL_CLOSE}
+        else:
+            with span("chat.model", step=steps):
+                resp = yield "model", window.view(messages) if window else messages  # {"role":"assistant","content":"... maybe <tool_call>{...}</tool_call>"}
+        messages.append(resp)
+
+        # 2) Tool(s) requested? One call, or a batch: <tool_call>[{...}, {...}]</tool_call>
+        batch = [routed] if pre_routed else extract_tool_calls(resp.get("content", "") or "")[:MAX_TOOL_CALLS]
+        if not batch:
+            return resp.get("content", ""), steps, False, last_tool, last_args, last_result
+
+        # Guard: stop if we’d exceed steps
+        if steps == max_steps:
+            return None, steps, True, last_tool, last_args, last_result
+
+        # 3) Run tool(s); a batch runs concurrently
+        for tool in batch:
+            args = tool.setdefault("args", {})
+            if not pre_routed and not ("start_date" in args and "end_date" in args):
+                s, e = default_dates(months_back_default)
+                args.setdefault("start_date", s)
+                args.setdefault("end_date", e)
+
+        if calls is not None:
+            calls.extend(batch)
+        with span("chat.tools", step=steps, calls=len(batch)):
+            results = yield "tools", batch
+        if len(batch) == 1:
+            last_tool, last_args, last_result = batch[0], batch[0]["args"], results[0]
+        else:
+            last_tool, last_args, last_result = batch, [t["args"] for t in batch], results
+
+        # 4) Feed the (compacted) tool result(s) back in ONE user message so the model can summarize
+        with span("chat.compact", step=steps) as sp:
+            names = ", ".join(str(t.get("tool")) for t in batch)
+            if len(batch) == 1:
+                label = "Tool result for " + names
+                model_result = compact_result(batch[0].get("tool"), results[0])
+            else:
+                label = "Tool results for " + names
+                budget = max(TOOL_RESULT_TOKENS // len(batch), 200)
+                model_result = [
+                    {"tool": t.get("tool"), "result": compact_result(t.get("tool"), r, budget)}
+                    for t, r in zip(batch, results)
+                ]
+            tool_result_msg = {
+                "role": "user",
+                "content": label + ":\n<tool_result>" + dumps(model_result) + "</tool_result>"
+            }
+            sp.set(chars=len(tool_result_msg["content"]))
+        messages.append(tool_result_msg)
+        steps += 1
+
+        if templated and routed is not None and steps == 1:
+            reply = render(routed, last_result)
+            if reply is not None:
+                yield "text", reply
+                messages.append({"role": "assistant", "content": reply})
+                return reply, steps, False, last_tool, last_args, last_result
+
+    # Shouldn’t reach here; treat as guard
+    return None, steps, True, last_tool, last_args, last_result
+
+@traced("chat.turn")
+def chat_with_tools(messages: List[Dict[str, str]], months_back_default: int, max_steps: int = 2,
+    on_text: Optional[Callable[[str], None]] = None, window: Optional[HistoryWindow] = None,
+    calls: Optional[List[Dict[str, Any]]] = None, routed: Optional[Dict[str, Any]] = None, templated: bool = False,
+) -> Tuple[str | None, int, bool, Any, Any, Any]:
+    """
+    on_text: called with the reply streamed so far on every model chunk (and with a templated reply).
+    window: token-budgeted view of `messages` sent to the model (the full transcript is still appended to).
+    calls: if given, every tool call run (with resolved args) is appended to it.
+    routed: tool call already picked by the router; replaces the model turn that would have asked for it.
+    templated: with routed, answer from router.render() instead of a model summary when a template exists.
+    Returns: (final_reply, steps, guard_tripped, last_tool_dict, last_tool_args, last_tool_result)
+    (for a batched step the last_* values are lists, one entry per call)
+    """
+    loop = tool_loop(messages, months_back_default, max_steps, window, calls, routed, templated)
+    answer: Any = None
+    while True:
+        try:
+            kind, payload = loop.send(answer)
+        except StopIteration as done:
+            return done.value
+        try:
+            if kind == "model":
+                answer = stream_reply(payload, on_text)
+            elif kind == "tools":
+                answer = run_tools(payload)
+            else:
+                answer = on_text(payload) if on_text is not None else None
+        except Exception as e:
+            loop.throw(e)  # closes the open span with the error, then re-raises
@@ -0,0 +1,148 @@
+# compact.py
+"""
+Shrink tool results before they are fed back to the model.
+
+Raw results can be huge (a get_transactions call returns every field of
+every transaction). Per tool, we keep only the fields the model needs,
+encode lists of objects as {"columns": [...], "rows": [[...], ...]} and,
+when that still exceeds the token budget, replace long lists with
+aggregates plus the top-N rows.
+"""
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastjson import dumps
+
+TOOL_RESULT_TOKENS = int(os.getenv("LM_TOOL_RESULT_TOKENS", "1500"))
+
+TXN_FIELDS = ("id", "date", "payee", "amount", "category_name", "tags")
+REFERENCE_FIELDS: Dict[str, Sequence[str]] = {
+    "categories": ("id", "name", "is_income", "exclude_from_totals", "is_group", "group_id"),
+    "category": ("id", "name", "description", "is_income", "exclude_from_totals", "is_group", "group_id", "children"),
+    "tags": ("id", "name"),
+    "assets": ("id", "name", "display_name", "type_name", "balance", "currency", "institution_name"),
+    "plaid_accounts": ("id", "name", "display_name", "type", "subtype", "balance", "currency", "institution_name"),
+}
+
+def estimate_tokens(obj: Any) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(dumps(obj)) // 4 + 1
+
+def _project(row: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    out = {f: row.get(f) for f in fields if row.get(f) not in (None, "", [])}
+    if "amount" in out:
+        out["amount"] = round(float(out["amount"] or 0), 2)
+    if "tags" in out:
+        out["tags"] = [t.get("name") for t in out["tags"] if isinstance(t, dict)]
+    return out
+
+def _table(rows: List[Dict[str, Any]], columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    if columns is None:
+        columns = list(dict.fromkeys(k for r in rows for k in r))
+    return {"columns": list(columns), "rows": [[r.get(c) for c in columns] for r in rows]}
+
+def _fit(build: Callable[[int], Any], n_max: int, budget: int) -> Any:
+    """build(n) for the largest n (halving from n_max) that fits the budget."""
+    n = n_max
+    while True:
+        out = build(n)
+        if n == 0 or estimate_tokens(out) <= budget:
+            return out
+        n //= 2
+
+def fit_rows(rows: List[Dict[str, Any]], budget: int, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Tabular rows, truncated (keeping order) to fit the budget."""
+    if columns is None:
+        columns = list(dict.fromkeys(k for r in rows for k in r))
+
+    def build(n: int) -> Dict[str, Any]:
+        out = _table(rows[:n], columns)
+        if n < len(rows):
+            out["omitted"] = len(rows) - n
+        return out
+
+    return _fit(build, len(rows), budget)
+
+def compact_transactions(txns: List[Dict[str, Any]], budget: int) -> Dict[str, Any]:
+    rows = [_project(t, TXN_FIELDS) for t in txns]
+    full = _table(rows, TXN_FIELDS)
+    if estimate_tokens(full) <= budget:
+        return full
+
+    by_cat: Dict[str, float] = {}
+    for r in rows:
+        cat = r.get("category_name") or "Uncategorized"
+        by_cat[cat] = by_cat.get(cat, 0.0) + r.get("amount", 0.0)
+    dates = [r["date"] for r in rows if r.get("date")]
+    summary = {
+        "count": len(rows),
+        "total": round(sum(r.get("amount", 0.0) for r in rows), 2),
+        "first_date": min(dates) if dates else None,
+        "last_date": max(dates) if dates else None,
+        "by_category": [
+            {"category": k, "total": round(v, 2)}
+            for k, v in sorted(by_cat.items(), key=lambda kv: abs(kv[1]), reverse=True)[:10]
+        ],
+    }
+    largest = sorted(rows, key=lambda r: abs(r.get("amount", 0.0)), reverse=True)
+
+    def build(n: int) -> Dict[str, Any]:
+        return {**summary, "largest": _table(largest[:n], TXN_FIELDS), "omitted": len(rows) - n}
+
+    return _fit(build, len(rows), budget)
+
+# -----------------------------
+# Per-tool compactors
+# -----------------------------
+
+def _compact_generic(result: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for k, v in result.items():
+        if isinstance(v, list) and v and all(isinstance(x, dict) for x in v):
+            out[k] = fit_rows(v, budget)
+        else:
+            out[k] = v
+    return out
+
+def _compact_transaction_list(result: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    return {**result, "transactions": compact_transactions(result.get("transactions") or [], budget)}
+
+def _compact_single_transaction(result: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    txn = result.get("transaction") or {}
+    keep = TXN_FIELDS + ("notes", "status", "is_pending", "currency", "original_name", "plaid_account_id", "asset_id")
+    return {"transaction": _project(txn, keep)}
+
+def _compact_transaction_group(result: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    return {
+        "anchor": _project(result.get("anchor") or {}, TXN_FIELDS),
+        "siblings": compact_transactions(result.get("siblings") or [], budget),
+    }
+
+def _compact_reference(key: str) -> Callable[[Dict[str, Any], int], Dict[str, Any]]:
+    def run(result: Dict[str, Any], budget: int) -> Dict[str, Any]:
+        value = result.get(key)
+        fields = REFERENCE_FIELDS[key]
+        if isinstance(value, list):
+            return {key: fit_rows([_project(x, fields) for x in value if isinstance(x, dict)], budget, fields)}
+        if isinstance(value, dict):
+            return {key: _project(value, fields)}
+        return result
+    return run
+
+COMPACTORS: Dict[str, Callable[[Dict[str, Any], int], Dict[str, Any]]] = {
+    "get_transactions": _compact_transaction_list,
+    "search_transactions": _compact_transaction_list,
+    "get_single_transaction": _compact_single_transaction,
+    "get_transaction_group": _compact_transaction_group,
+    "get_categories": _compact_reference("categories"),
+    "get_category": _compact_reference("category"),
+    "get_tags": _compact_reference("tags"),
+    "get_assets": _compact_reference("assets"),
+    "get_plaid_accounts": _compact_reference("plaid_accounts"),
+}
+
+def compact_result(tool: Optional[str], result: Any, budget: int = TOOL_RESULT_TOKENS) -> Any:
+    """Model-facing version of a run_tool result, aiming to stay under `budget` tokens."""
+    if not isinstance(result, dict) or "error" in result:
+        return result
+    return COMPACTORS.get(tool or "", _compact_generic)(result, budget)
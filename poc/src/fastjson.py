@@ -0,0 +1,114 @@
+# fastjson.py
+"""
+Pluggable JSON backend for the hot paths: API response bodies, store
+payloads and tool results fed back to the model.
+
+LM_JSON picks the backend:
+  auto     orjson if installed, else msgspec, else the stdlib (default)
+  orjson / msgspec / stdlib
+Whatever the backend, loads() accepts str or bytes and dumps() returns the
+compact, non-ASCII-escaped str that json.dumps(ensure_ascii=False,
+separators=(",", ":")) gives (numpy scalars included).
+
+decode_transactions(body, fields) decodes a /transactions response keeping
+only `fields` of each row. With msgspec the parser decodes straight into a
+struct of just those fields and skips the rest of the bytes, so unused
+fields are never materialized; other backends decode everything and
+project page by page (smaller rows downstream, no faster decoding).
+"""
+import importlib.util
+import json
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Loads = Callable[[Any], Any]
+Dumps = Callable[..., str]
+
+def _scalar(o: Any, default: Optional[Callable[[Any], Any]]) -> Any:
+    # numpy scalars (np.float64 from the frame aggregations) and friends
+    if hasattr(o, "item"):
+        return o.item()
+    if default is not None:
+        return default(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def _stdlib() -> Tuple[Loads, Dumps]:
+    def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=lambda o: _scalar(o, default))
+    return json.loads, dumps
+
+def _orjson() -> Tuple[Loads, Dumps]:
+    import orjson
+    opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+        return orjson.dumps(obj, default=lambda o: _scalar(o, default), option=opts).decode()
+    return orjson.loads, dumps
+
+def _msgspec() -> Tuple[Loads, Dumps]:
+    import msgspec
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+        return msgspec.json.encode(obj, enc_hook=lambda o: _scalar(o, default)).decode()
+    return decoder.decode, dumps
+
+# Preference order for "auto"; only the backend in use is imported
+_BACKENDS: Dict[str, Callable[[], Tuple[Loads, Dumps]]] = {"orjson": _orjson, "msgspec": _msgspec, "stdlib": _stdlib}
+
+def available() -> List[str]:
+    return [name for name in _BACKENDS if name == "stdlib" or importlib.util.find_spec(name) is not None]
+
+@lru_cache(maxsize=None)
+def backend(name: str) -> Tuple[Loads, Dumps]:
+    """(loads, dumps) for one backend; ImportError if it isn't installed."""
+    return _BACKENDS[name]()
+
+def _pick(name: str) -> str:
+    if name in _BACKENDS and name in available():
+        return name
+    # auto, or a backend that isn't installed
+    return available()[0]
+
+BACKEND = _pick(os.getenv("LM_JSON", "auto").lower())
+loads, dumps = backend(BACKEND)
+
+# -----------------------------
+# Transactions with field selection
+# -----------------------------
+
+@lru_cache(maxsize=8)
+def _page_decoder(fields: Tuple[str, ...]) -> Any:
+    """msgspec decoder for {"transactions": [<fields>...], "has_more": bool}; absent fields stay UNSET."""
+    import msgspec
+    row = msgspec.defstruct("TransactionFields", [(f, Any, msgspec.UNSET) for f in fields])
+    page = msgspec.defstruct("TransactionPage", [
+        ("transactions", List[row], []),
+        ("has_more", Optional[bool], None),
+    ])
+    return msgspec.json.Decoder(page)
+
+def _project(rows: List[Dict[str, Any]], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    return [{k: t[k] for k in fields if k in t} for t in rows]
+
+def decode_transactions(body: bytes, fields: Sequence[str], using: str = BACKEND) -> Any:
+    """
+    A /transactions body ({"transactions": [...], "has_more": ...} or a bare
+    list) with each row cut down to `fields` (in that order; fields a row
+    lacks stay absent), decoded with the `using` backend.
+    """
+    fields = tuple(fields)
+    if using == "msgspec":
+        import msgspec
+        try:
+            page = _page_decoder(fields).decode(body)
+        except msgspec.ValidationError:
+            pass  # unexpected shape (e.g. a bare list): project below
+        else:
+            # to_builtins leaves UNSET (absent) fields out
+            return {"transactions": msgspec.to_builtins(page.transactions), "has_more": page.has_more}
+    data = backend(using)[0](body)
+    if isinstance(data, dict):
+        return {**data, "transactions": _project(data.get("transactions") or [], fields)}
+    return _project(data, fields)
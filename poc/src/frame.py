@@ -0,0 +1,75 @@
+# frame.py
+"""
+Columnar view of a get_transactions result (txn.Transaction rows) for
+vectorized analytics.
+
+  amount       float64
+  date         datetime64[D]
+  category     int32 codes into `categories` (category_name, "Uncategorized" if missing)
+  category_id  int64 (-1 if missing)
+  payee        int32 codes into `payees` ("(no payee)" if missing)
+  tag_row/tag  one entry per (transaction, tag) pair: row index + int32 code into `tags`
+  is_transfer  bool (raw API flag)
+
+Group-bys are np.bincount over the int codes.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from txn import Transaction
+
+_NAT = np.iinfo(np.int64).min
+
+def _encode(values: List[Optional[str]], default: str) -> Tuple[np.ndarray, List[str]]:
+    """Dictionary-encode strings; returns (codes, names) with names[code] == value."""
+    index: Dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(v or default, len(index)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(index)
+
+class TxnFrame:
+    def __init__(self, txns: List[Transaction]):
+        n = len(txns)
+        self.n = n
+        # Amounts and dates were parsed once into the Transaction; this is only copying
+        self.amount = np.fromiter((t.amount for t in txns), dtype=np.float64, count=n)
+        self.date = np.fromiter((_NAT if t.day is None else t.day for t in txns), dtype=np.int64, count=n).view("datetime64[D]")
+        self.category, self.categories = _encode([t.category_name for t in txns], "Uncategorized")
+        self.category_id = np.fromiter(
+            (-1 if t.category_id is None else int(t.category_id) for t in txns), dtype=np.int64, count=n,
+        )
+        self.payee, self.payees = _encode([t.payee for t in txns], "(no payee)")
+        self.is_transfer = np.fromiter((bool(t.is_transfer) for t in txns), dtype=bool, count=n)
+
+        pairs = [(i, tag.get("name") or str(tag.get("id"))) for i, t in enumerate(txns) if t.tags for tag in t.tags]
+        self.tag_row = np.fromiter((i for i, _ in pairs), dtype=np.int64, count=len(pairs))
+        self.tag, self.tags = _encode([name for _, name in pairs], "")
+
+    def __len__(self) -> int:
+        return self.n
+
+    def month_index(self, months: List[str]) -> np.ndarray:
+        """Per-row position of the row's calendar month in `months` (sorted YYYY-MM), -1 if absent."""
+        if not months:
+            return np.full(self.n, -1, dtype=np.int64)
+        labels = np.array(months, dtype="datetime64[M]")
+        row_months = self.date.astype("datetime64[M]")
+        idx = np.searchsorted(labels, row_months)
+        clipped = np.minimum(idx, len(labels) - 1)
+        return np.where((idx < len(labels)) & (labels[clipped] == row_months), idx, -1)
+
+def code_of(names: List[str], value: str) -> int:
+    """Code for value in one of the frame's dictionaries (e.g. frame.categories), or -1."""
+    try:
+        return names.index(value)
+    except ValueError:
+        return -1
+
+def group_sum(codes: np.ndarray, weights: np.ndarray, n_groups: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(sums, counts) per code in [0, n_groups)."""
+    if mask is not None:
+        codes, weights = codes[mask], weights[mask]
+    return (
+        np.bincount(codes, weights=weights, minlength=n_groups),
+        np.bincount(codes, minlength=n_groups),
+    )
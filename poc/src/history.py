@@ -0,0 +1,72 @@
+# history.py
+"""
+Token-budgeted view of the chat history for the model.
+
+st.session_state.messages stays the full, append-only transcript. What the
+model sees is derived from it with two persistent cut points, both only
+ever moving forward:
+  - stub_before: tool results before this index are replaced by a short stub
+  - cut: messages before this index are dropped (the system prompt never is)
+Because the cut points only move when the budget is exceeded, and then
+overshoot to a low-water mark, the prompt prefix stays byte-identical from
+one turn to the next and Ollama can reuse its cached KV state for it.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+
+HISTORY_TOKENS = int(os.getenv("LM_HISTORY_TOKENS", "6000"))
+# After an eviction, trim down to this fraction of the budget so the next few turns don't evict again
+LOW_WATER = float(os.getenv("LM_HISTORY_LOW_WATER", "0.6"))
+
+Message = Dict[str, str]
+
+_RESULT_RE = re.compile(r"<tool_result>.*?</tool_result>", re.DOTALL)
+_STUB = '<tool_result>{"omitted":"older tool result dropped to save context; call the tool again if needed"}</tool_result>'
+
+def _tokens(m: Message) -> int:
+    # ~4 characters per token, plus per-message overhead
+    return len(m.get("content") or "") // 4 + 4
+
+def is_tool_result(m: Message) -> bool:
+    return m.get("role") == "user" and "<tool_result>" in (m.get("content") or "")
+
+@dataclass
+class HistoryWindow:
+    budget: int = HISTORY_TOKENS
+    low_water: float = LOW_WATER
+    stub_before: int = 1
+    cut: int = 1
+
+    def _render(self, messages: List[Message]) -> List[Message]:
+        out = [messages[0]]
+        for i in range(self.cut, len(messages)):
+            m = messages[i]
+            if i < self.stub_before and is_tool_result(m):
+                m = {"role": m["role"], "content": _RESULT_RE.sub(_STUB, m["content"])}
+            out.append(m)
+        return out
+
+    def view(self, messages: List[Message]) -> List[Message]:
+        """Messages to send to the model; messages[0] must be the system prompt."""
+        view = self._render(messages)
+        if sum(_tokens(m) for m in view) <= self.budget:
+            return view
+
+        # 1) Stub every tool result except the latest one
+        last_result = max((i for i, m in enumerate(messages) if is_tool_result(m)), default=0)
+        self.stub_before = max(self.stub_before, last_result)
+        view = self._render(messages)
+        if sum(_tokens(m) for m in view) <= self.budget:
+            return view
+
+        # 2) Drop the oldest exchanges, always cutting at a real user prompt, never past the latest one
+        prompts = [i for i, m in enumerate(messages) if i >= self.cut and m.get("role") == "user" and not is_tool_result(m)]
+        target = self.budget * self.low_water
+        k = 0
+        while sum(_tokens(m) for m in view) > target and k + 1 < len(prompts):
+            k += 1
+            self.cut = prompts[k]
+            view = self._render(messages)
+        return view
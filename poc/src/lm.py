@@ -1,41 +1,335 @@
 # lm.py
 import os
 import json
-import re
-from typing import List, Dict, Any
-
-try:
-    import ollama as py_ollama
-except Exception:
-    py_ollama = None
+import asyncio
+import time
+import weakref
+from contextlib import aclosing
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
 
 import requests
 
+from tracing import current_span, span
+
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 TEMP = float(os.getenv("OLLAMA_TEMPERATURE", "0.2"))
+# Keep the model (and its prompt cache) resident between turns
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
 Message = Dict[str, str]
 
+TOOL_OPEN = "<tool_call>"
+TOOL_CLOSE = "</tool_call>"
+
+@lru_cache(maxsize=1)
+def ollama_client():
+    """
+    ollama.Client for OLLAMA_URL, imported on first use (the package pulls in
+    pydantic + httpx, which the app's cold start shouldn't pay for) and reused
+    so its connection pool survives across turns. None if not installed.
+    """
+    try:
+        import ollama
+    except Exception:
+        return None
+    return ollama.Client(host=OLLAMA_URL)
+
+def _options() -> Dict[str, Any]:
+    # Stop right after a tool call; nothing generated past it is ever used
+    return {"temperature": TEMP, "stop": [TOOL_CLOSE]}
+
+# Timing / token counts Ollama reports on a finished response (durations in ns)
+_STATS = ("eval_count", "eval_duration", "prompt_eval_count", "prompt_eval_duration", "load_duration", "total_duration")
+
+def _record_stats(data: Any) -> None:
+    """Copy Ollama's final-response stats onto the current span."""
+    current_span().set(**{f"ollama.{k}": data.get(k) for k in _STATS if data.get(k) is not None})
+
 def chat(messages: List[Message]) -> Dict[str, Any]:
-    if py_ollama is not None:
-        resp = py_ollama.chat(model=OLLAMA_MODEL, messages=messages, options={"temperature": TEMP})
-        return resp.get("message", {"role": "assistant", "content": resp.get("response", "")})
+    with span("lm.chat", model=OLLAMA_MODEL, messages=len(messages)) as s:
+        client = ollama_client()
+        if client is not None:
+            resp = client.chat(model=OLLAMA_MODEL, messages=messages, options=_options(), keep_alive=KEEP_ALIVE)
+            msg = resp.get("message") or {"role": "assistant", "content": resp.get("response", "")}
+            _record_stats(resp)
+        else:
+            r = requests.post(
+                f"{OLLAMA_URL}/api/chat",
+                json={"model": OLLAMA_MODEL, "messages": messages, "options": _options(), "keep_alive": KEEP_ALIVE},
+                timeout=120,
+            )
+            r.raise_for_status()
+            s.set(response_bytes=len(r.content))
+            data = r.json()
+            msg = data.get("message") or {"role": "assistant", "content": data.get("response", "")}
+            _record_stats(data)
+        return {"role": msg.get("role") or "assistant", "content": _close_tool_call(msg.get("content") or "")}
+
+def preload(messages: Optional[List[Message]] = None) -> None:
+    """
+    Load the model and keep it resident for KEEP_ALIVE. Given the system
+    prompt, Ollama also evaluates it, so the first real turn reuses that
+    prefix from its prompt cache.
+    """
+    options = {**_options(), "num_predict": 1}
+    client = ollama_client()
+    if client is not None:
+        client.chat(model=OLLAMA_MODEL, messages=messages or [], options=options, keep_alive=KEEP_ALIVE)
+        return
     r = requests.post(
         f"{OLLAMA_URL}/api/chat",
-        json={"model": OLLAMA_MODEL, "messages": messages, "options": {"temperature": TEMP}},
-        timeout=120,
+        json={"model": OLLAMA_MODEL, "messages": messages or [], "options": options, "keep_alive": KEEP_ALIVE, "stream": False},
+        timeout=300,
     )
     r.raise_for_status()
-    data = r.json()
-    msg = data.get("message") or {"role": "assistant", "content": data.get("response", "")}
-    return msg
 
-def extract_tool_call(text: str):
-    m = re.search(r"<tool_call>\s*(\{.*?\})\s*</tool_call>", text, flags=re.DOTALL)
-    if not m:
+class ToolCallParser:
+    """
+    Incremental scanner for the first <tool_call>{...} block in a (streamed)
+    reply. feed() chunks as they arrive (the tag and the JSON may be split
+    anywhere); once the JSON value's brackets balance (string/escape aware)
+    and it parses, the call is stored and `done` is set, so the caller can
+    stop generation without waiting for the closing tag. If what follows the
+    tag is not a JSON call, `plain` is set instead and the reply is just text.
+    The block holds one call object or a JSON array of calls (a batch).
+    """
+    def __init__(self) -> None:
+        self.text = ""
+        self.done = False
+        self.plain = False
+        self.call: Optional[Any] = None   # dict, or list of dicts for a batch
+        self.end = -1          # index just past the JSON value once done
+        self._tag = -1         # index of the opening tag once seen
+        self._start = -1       # index of the value's opening bracket
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+
+    @property
+    def complete(self) -> bool:
+        """
+        Nothing more to wait for: the call parsed, or the closing tag arrived
+        while the block was still unclassified (malformed JSON). A reply already
+        classified as plain text streams on even if it mentions the closing tag.
+        """
+        if self.done:
+            return True
+        return self._tag >= 0 and not self.plain and self.text.find(TOOL_CLOSE, self._tag) >= 0
+
+    @property
+    def calls(self) -> List[Dict[str, Any]]:
+        """The parsed call(s) as a list; empty until done or if the block is not valid JSON."""
+        if isinstance(self.call, dict):
+            return [self.call]
+        if isinstance(self.call, list):
+            return [c for c in self.call if isinstance(c, dict)]
+        return []
+
+    def feed(self, piece: str) -> Optional[Any]:
+        search_from = max(0, len(self.text) - len(TOOL_OPEN) + 1)
+        self.text += piece
+        if self.done or self.plain:
+            return self.call
+        if self._tag < 0:
+            self._tag = self.text.find(TOOL_OPEN, search_from)
+            if self._tag < 0:
+                return None
+        if self._start < 0:
+            body = self.text[self._tag + len(TOOL_OPEN):]
+            stripped = body.lstrip()
+            if not stripped:
+                return None
+            if stripped[0] not in "{[":
+                self.plain = True  # not a JSON tool call
+                return None
+            self._start = self._pos = len(self.text) - len(stripped)
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            self._pos += 1
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.call = json.loads(text[self._start:self._pos])
+                    except json.JSONDecodeError:
+                        self.plain = True
+                        return None
+                    self.done = True
+                    self.end = self._pos
+                    return self.call
         return None
-    try:
-        return json.loads(m.group(1))
-    except json.JSONDecodeError:
-        return None
\ No newline at end of file
+
+def _close_tool_call(text: str) -> str:
+    """Canonical form for history: cut after the tool call JSON and re-append the (stop-sequence-eaten) closing tag."""
+    p = ToolCallParser()
+    p.feed(text)
+    if p.call is None:
+        return text
+    return text[:p.end] + TOOL_CLOSE
+
+def extract_tool_calls(text: str) -> List[Dict[str, Any]]:
+    """Every call in the reply's tool_call block (one, or a batch)."""
+    p = ToolCallParser()
+    p.feed(text)
+    return p.calls
+
+def extract_tool_call(text: str):
+    calls = extract_tool_calls(text)
+    return calls[0] if calls else None
+
+# -----------------------------
+# Streaming
+# -----------------------------
+
+def chat_stream(messages: List[Message]) -> Iterator[str]:
+    """Yield content deltas as Ollama generates them (stream=True)."""
+    client = ollama_client()
+    if client is not None:
+        for chunk in client.chat(model=OLLAMA_MODEL, messages=messages, options=_options(), stream=True, keep_alive=KEEP_ALIVE):
+            piece = (chunk.get("message") or {}).get("content") or chunk.get("response") or ""
+            if chunk.get("done"):
+                _record_stats(chunk)
+            if piece:
+                yield piece
+        return
+    with requests.post(
+        f"{OLLAMA_URL}/api/chat",
+        json={"model": OLLAMA_MODEL, "messages": messages, "options": _options(), "stream": True, "keep_alive": KEEP_ALIVE},
+        timeout=120,
+        stream=True,
+    ) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            current_span().add("response_bytes", len(line))
+            data = json.loads(line)
+            piece = (data.get("message") or {}).get("content") or data.get("response") or ""
+            if data.get("done"):
+                _record_stats(data)
+            if piece:
+                yield piece
+            if data.get("done"):
+                break
+
+def visible_text(text: str) -> str:
+    """The part of a partial reply that is safe to show: everything before a (possibly half-emitted) tool_call tag."""
+    idx = text.find(TOOL_OPEN)
+    if idx >= 0:
+        return text[:idx]
+    for k in range(min(len(TOOL_OPEN) - 1, len(text)), 0, -1):
+        if text.endswith(TOOL_OPEN[:k]):
+            return text[:-k]
+    return text
+
+def stream_reply(messages: List[Message], on_text: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    One streamed assistant turn. on_text receives the visible reply so far
+    after every chunk. Generation is cut off (the stream is closed) as soon
+    as a complete tool-call JSON object has been parsed (a tag followed by
+    anything else streams on as plain text, closing tags included); Ollama
+    also stops on the closing tag server-side. on_text gets the final text
+    once more after the stream ends. Returns a message dict like chat().
+    """
+    parser = ToolCallParser()
+    with span("lm.stream_reply", model=OLLAMA_MODEL, messages=len(messages)) as s:
+        t0 = time.perf_counter()
+        stream = chat_stream(messages)
+        try:
+            for piece in stream:
+                if not parser.text:
+                    s.set(first_token_ms=round((time.perf_counter() - t0) * 1000, 1))
+                s.add("chunks")
+                parser.feed(piece)
+                if parser.complete:
+                    s.set(stopped_at_tool_call=True)
+                    break
+                if on_text is not None and (parser.plain or TOOL_OPEN not in parser.text):
+                    on_text(parser.text if parser.plain else visible_text(parser.text))
+        finally:
+            stream.close()
+        s.set(chars=len(parser.text))
+    if on_text is not None:
+        on_text(parser.text if parser.plain else visible_text(parser.text))
+    content = parser.text
+    if parser.call is not None:
+        content = content[:parser.end] + TOOL_CLOSE
+    return {"role": "assistant", "content": content}
+
+# -----------------------------
+# Async (server.py): one httpx client per event loop, so many chats share a connection pool
+# -----------------------------
+
+_aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+def _aclient():
+    import httpx  # only the async service needs it
+
+    loop = asyncio.get_running_loop()
+    client = _aclients.get(loop)
+    if client is None:
+        client = _aclients[loop] = httpx.AsyncClient(base_url=OLLAMA_URL, timeout=httpx.Timeout(120, connect=10))
+    return client
+
+async def aclose() -> None:
+    """Close the Ollama client bound to the running loop."""
+    client = _aclients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+async def achat_stream(messages: List[Message]) -> AsyncIterator[str]:
+    """Async chat_stream: content deltas from Ollama's NDJSON stream."""
+    body = {"model": OLLAMA_MODEL, "messages": messages, "options": _options(), "stream": True, "keep_alive": KEEP_ALIVE}
+    async with _aclient().stream("POST", "/api/chat", json=body) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+            current_span().add("response_bytes", len(line))
+            data = json.loads(line)
+            piece = (data.get("message") or {}).get("content") or data.get("response") or ""
+            if data.get("done"):
+                _record_stats(data)
+            if piece:
+                yield piece
+            if data.get("done"):
+                break
+
+async def astream_reply(messages: List[Message], on_text: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Async stream_reply: same early stop on a complete tool call, same normalized result."""
+    parser = ToolCallParser()
+    with span("lm.stream_reply", model=OLLAMA_MODEL, messages=len(messages)) as s:
+        t0 = time.perf_counter()
+        async with aclosing(achat_stream(messages)) as stream:
+            async for piece in stream:
+                if not parser.text:
+                    s.set(first_token_ms=round((time.perf_counter() - t0) * 1000, 1))
+                s.add("chunks")
+                parser.feed(piece)
+                if parser.complete:
+                    s.set(stopped_at_tool_call=True)
+                    break
+                if on_text is not None and (parser.plain or TOOL_OPEN not in parser.text):
+                    on_text(parser.text if parser.plain else visible_text(parser.text))
+        s.set(chars=len(parser.text))
+    if on_text is not None:
+        on_text(parser.text if parser.plain else visible_text(parser.text))
+    content = parser.text
+    if parser.call is not None:
+        content = content[:parser.end] + TOOL_CLOSE
+    return {"role": "assistant", "content": content}
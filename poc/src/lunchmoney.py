@@ -1,11 +1,41 @@
 # lunchmoney.py
+import contextvars
 import os
-from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 
-BASE = "https://dev.lunchmoney.app/v1"
+from cache import Entry, ResponseCache
+from fastjson import decode_transactions, loads
+from ratelimit import Claim, get_limiter
+from singleflight import SingleFlight, flight_key
+from store import TransactionStore, account_key, get_store
+from tracing import current_span, span
+from txn import TXN_FIELDS, Transaction, parse_transactions, to_dicts
+
+BASE = os.getenv("LUNCHMONEY_BASE_URL", "https://dev.lunchmoney.app/v1")
 TOKEN = os.getenv("LUNCHMONEY_TOKEN")
+PAGE_SIZE = int(os.getenv("LM_PAGE_SIZE", "500"))
+PAGE_WORKERS = int(os.getenv("LM_PAGE_WORKERS", "4"))
+POOL_SIZE = int(os.getenv("LM_POOL_SIZE", "10"))
+MAX_RETRIES = int(os.getenv("LM_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("LM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LM_BACKOFF_MAX", "30"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Seconds a cached reference response is served without revalidation
+REFERENCE_TTLS: Dict[str, float] = {
+    "/categories": float(os.getenv("LM_CACHE_TTL_CATEGORIES", "3600")),
+    "/tags": float(os.getenv("LM_CACHE_TTL_TAGS", "3600")),
+    "/assets": float(os.getenv("LM_CACHE_TTL_ASSETS", "900")),
+    "/plaid_accounts": float(os.getenv("LM_CACHE_TTL_PLAID_ACCOUNTS", "900")),
+}
 
 class LMError(Exception):
     pass
@@ -15,16 +45,225 @@ def _headers() -> Dict[str, str]:
         raise LMError("Missing LUNCHMONEY_TOKEN")
     return {"Authorization": f"Bearer {TOKEN}", "Accept": "application/json"}
 
-def _get(path: str, params: Optional[Dict[str, Any]] = None, timeout: int = 60) -> Any:
-    r = requests.get(f"{BASE}{path}", headers=_headers(), params=params or {}, timeout=timeout)
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    """Shared keep-alive session so repeated calls reuse pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers.update({"Accept-Encoding": "gzip, deflate"})
+            _session = s
+        return _session
+
+def _retry_after(r: requests.Response) -> Optional[float]:
+    """Seconds to wait per the Retry-After header (delta-seconds or HTTP-date), if present."""
+    value = r.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def _backoff(attempt: int) -> float:
+    # "Full jitter" exponential backoff
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def _request(path: str, params: Optional[Dict[str, Any]] = None, timeout: int = 60, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    """
+    GET with retries: connection errors, timeouts, 429 and 5xx are retried up
+    to LM_MAX_RETRIES times with jittered exponential backoff, honouring
+    Retry-After when the server sends one. Every attempt first takes a slot
+    from the shared rate limiter (ratelimit.py).
+    """
+    session = _get_session()
+    limiter = get_limiter()
+    s = current_span()
+    for attempt in range(MAX_RETRIES + 1):
+        s.add("ratelimit_wait_ms", round(limiter.acquire() * 1000, 1))
+        try:
+            r = session.get(f"{BASE}{path}", headers={**_headers(), **(headers or {})}, params=params or {}, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        s.set(attempts=attempt + 1, http_status=r.status_code, response_bytes=len(r.content))
+        limiter.observe(r.status_code, _retry_after(r) if r.status_code == 429 else None)
+        if r.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+            delay = _retry_after(r)
+            time.sleep(min(BACKOFF_MAX, delay if delay is not None else _backoff(attempt)))
+            continue
+        return r
+
+def _decode_transactions(body: bytes) -> Any:
+    """A /transactions body, cut down to TXN_FIELDS when set."""
+    return loads(body) if TXN_FIELDS is None else decode_transactions(body, TXN_FIELDS)
+
+# Identical concurrent GETs (same path + params) share one request and its parsed JSON
+_flight = SingleFlight()
+
+def _promote(claim: Claim) -> None:
+    claim.promote()
+
+def _coalesced(key: Any, fn: Callable[[], Any]) -> Any:
+    """
+    _flight.do with the request sent under a rate-limit Claim: an interactive
+    caller joining a background caller's request promotes its queued slot
+    rather than waiting behind the background queue.
+    """
+    claim = Claim()
+
+    def lead() -> Any:
+        with claim:
+            return fn()
+    return _flight.do(key, lead, tag=claim, on_join=_promote)
+
+def _get(path: str, params: Optional[Dict[str, Any]] = None, timeout: int = 60, decode: Callable[[bytes], Any] = loads) -> Any:
+    # coalesced: served by another caller's identical in-flight request
+    with span("lunchmoney.get", path=path, offset=(params or {}).get("offset"), coalesced=True):
+        return _coalesced(flight_key(path, params), lambda: _get_uncoalesced(path, params, timeout, decode))
+
+def _get_uncoalesced(path: str, params: Optional[Dict[str, Any]], timeout: int, decode: Callable[[bytes], Any]) -> Any:
+    current_span().set(coalesced=False)
+    r = _request(path, params=params, timeout=timeout)
+    r.raise_for_status()
+    return decode(r.content)
+
+# -----------------------------
+# Reference data cache
+# -----------------------------
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+def _get_cache() -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            # Keyed per account: responses for another base URL / token are never served
+            _cache = ResponseCache(namespace=account_key(BASE, TOKEN))
+        return _cache
+
+def _reference_ttl(path: str) -> float:
+    # "/categories/12" shares the "/categories" TTL
+    return REFERENCE_TTLS.get("/" + path.strip("/").split("/")[0], 0.0)
+
+def _conditional_headers(entry: Optional[Entry]) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    if entry is not None and entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry is not None and entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+def _cached_get(path: str) -> Any:
+    """
+    _get for slow-changing reference endpoints: served from the response
+    cache within the endpoint's TTL, then revalidated with
+    If-None-Match / If-Modified-Since when the server gave us validators.
+    """
+    with span("lunchmoney.cached_get", path=path, cache="hit") as s:
+        entry = _get_cache().get(path)
+        if entry is not None and entry.fresh(_reference_ttl(path)):
+            return entry.value
+        s.set(cache="coalesced")
+        # Callers that find the entry stale at the same time share one revalidation
+        return _coalesced(("cached",) + flight_key(path), lambda: _revalidate(path, entry))
+
+def _revalidate(path: str, entry: Optional[Entry]) -> Any:
+    cache = _get_cache()
+    now = time.time()
+    current_span().set(cache="miss")
+    r = _request(path, headers=_conditional_headers(entry))
+    if r.status_code == 304 and entry is not None:
+        current_span().set(cache="revalidated")
+        cache.put(path, Entry(entry.value, entry.etag, entry.last_modified, now))
+        return entry.value
     r.raise_for_status()
-    return r.json()
+    value = loads(r.content)
+    cache.put(path, Entry(value, r.headers.get("ETag"), r.headers.get("Last-Modified"), now))
+    return value
+
+def invalidate_reference_cache(path_prefix: Optional[str] = None) -> None:
+    """Forget cached reference data (all of it, or e.g. "/categories")."""
+    _get_cache().invalidate(path_prefix)
 
 # -----------------------------
 # Core: Transactions (READ ONLY)
 # -----------------------------
 
-def get_transactions(
+def _fetch_page(params: Dict[str, Any], offset: int, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """One page of /transactions; returns (transactions, has_more)."""
+    data = _get("/transactions", params={**params, "offset": offset, "limit": limit}, decode=_decode_transactions)
+    txns = data.get("transactions", data) if isinstance(data, dict) else data
+    has_more = data.get("has_more") if isinstance(data, dict) else None
+    return txns, (len(txns) >= limit) if has_more is None else bool(has_more)
+
+def _wave_size(workers: int, page_size: int, fetched: int, max_rows: Optional[int]) -> int:
+    """Pages to request in the next wave: `workers`, but no more than max_rows still needs."""
+    if not max_rows:
+        return max(1, workers)
+    return max(1, min(workers, -(-(max_rows - fetched) // page_size)))
+
+def _iter_pages(
+    params: Dict[str, Any], page_size: int = PAGE_SIZE, workers: int = PAGE_WORKERS, max_rows: Optional[int] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Offset-paginate /transactions, yielding pages in offset order (the API's).
+    The first page is fetched alone (most ranges fit in one); after that,
+    up to `workers` consecutive offsets are fetched concurrently per wave
+    until a short page / has_more=false shows the end was reached, or
+    max_rows rows have been yielded.
+    """
+    page, has_more = _fetch_page(params, 0, page_size)
+    yield page
+    offset, fetched = page_size, len(page)
+    if not has_more or workers <= 1:
+        while has_more and not (max_rows and fetched >= max_rows):
+            page, has_more = _fetch_page(params, offset, page_size)
+            offset += page_size
+            fetched += len(page)
+            yield page
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while has_more and not (max_rows and fetched >= max_rows):
+            # Each page carries the caller's context (rate-limit priority class)
+            futures = [
+                pool.submit(contextvars.copy_context().run, _fetch_page, params, offset + i * page_size, page_size)
+                for i in range(_wave_size(workers, page_size, fetched, max_rows))
+            ]
+            offset += len(futures) * page_size
+            # Submission order, not completion order: rows stay in the API's order
+            for fut in futures:
+                page, more = fut.result()
+                has_more = has_more and more
+                fetched += len(page)
+                if page:
+                    yield page
+
+def _fetch_transactions(params: Dict[str, Any], max_rows: Optional[int] = None) -> List[Dict[str, Any]]:
+    """All transactions matching params (every page, in API order), optionally the first max_rows."""
+    page_size = min(PAGE_SIZE, max_rows) if max_rows else PAGE_SIZE
+    out: List[Dict[str, Any]] = []
+    for page in _iter_pages(params, page_size=page_size, max_rows=max_rows):
+        out.extend(page)
+    return out[:max_rows] if max_rows else out
+
+def _transaction_params(
     start_date: str,
     end_date: str,
     status: Optional[str] = None,
@@ -36,13 +275,10 @@ def get_transactions(
     amount_min: Optional[float] = None,
     amount_max: Optional[float] = None,
     is_pending: Optional[bool] = None,
-    limit: int = 500,
-) -> List[Dict[str, Any]]:
-    """Mirror 'Get all transactions' with common filters."""
+) -> Dict[str, Any]:
     params: Dict[str, Any] = {
         "start_date": start_date,
         "end_date": end_date,
-        "limit": limit,
     }
     if status is not None: params["status"] = status
     if tag_ids: params["tag_id"] = ",".join(str(t) for t in tag_ids)
@@ -53,11 +289,111 @@ def get_transactions(
     if amount_min is not None: params["amount_min"] = amount_min
     if amount_max is not None: params["amount_max"] = amount_max
     if is_pending is not None: params["is_pending"] = str(bool(is_pending)).lower()
+    return params
+
+def _matches(
+    t: Transaction,
+    status: Optional[str],
+    tag_ids: Optional[List[int]],
+    category_id: Optional[int],
+    plaid_account_id: Optional[int],
+    asset_id: Optional[int],
+    payee: Optional[str],
+    amount_min: Optional[float],
+    amount_max: Optional[float],
+    is_pending: Optional[bool],
+) -> bool:
+    """Local equivalent of the API's server-side filters (used when reading from the store)."""
+    if status is not None and t.status != status:
+        return False
+    if tag_ids:
+        wanted = {int(x) for x in tag_ids}
+        if not any(tag.get("id") in wanted for tag in (t.tags or ())):
+            return False
+    if category_id is not None and int(category_id) not in (t.category_id, t.category_group_id):
+        return False
+    if plaid_account_id is not None and t.plaid_account_id != int(plaid_account_id):
+        return False
+    if asset_id is not None and t.asset_id != int(asset_id):
+        return False
+    if payee and payee.lower() not in (t.payee or "").lower():
+        return False
+    if amount_min is not None and t.amount < amount_min:
+        return False
+    if amount_max is not None and t.amount > amount_max:
+        return False
+    if is_pending is not None and bool(t.is_pending) != bool(is_pending):
+        return False
+    return True
+
+def sync_transactions(start_date: str, end_date: str) -> Optional[TransactionStore]:
+    """Bring [start_date, end_date] up to date in the local store; returns it, or None when LM_STORE=0."""
+    store = get_store()
+    if store is not None:
+        with span("lunchmoney.sync", start_date=start_date, end_date=end_date) as sp:
+            fetched = store.sync(
+                start_date, end_date, lambda s, e: _fetch_transactions({"start_date": s, "end_date": e}), workers=PAGE_WORKERS,
+            )
+            sp.set(ranges_fetched=fetched, store_hit=fetched == 0)
+    return store
+
+def refresh_transactions(start_date: Optional[str] = None, end_date: Optional[str] = None) -> None:
+    """Make the next read of [start_date, end_date] (default: everything) go back to the API."""
+    store = get_store()
+    if store is not None:
+        store.expire(start_date, end_date)
+
+def get_transactions(
+    start_date: str,
+    end_date: str,
+    status: Optional[str] = None,
+    tag_ids: Optional[List[int]] = None,
+    category_id: Optional[int] = None,
+    plaid_account_id: Optional[int] = None,
+    asset_id: Optional[int] = None,
+    payee: Optional[str] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    is_pending: Optional[bool] = None,
+    limit: Optional[int] = None,
+) -> List[Transaction]:
+    """
+    Mirror 'Get all transactions' with common filters, parsed into compact
+    txn.Transaction records (to_dict() gives back the API row).
+    Every page is fetched (limit only caps the result, default: no cap).
+    Served from the local store (see store.py), which syncs only the
+    uncovered / stale parts of the range; set LM_STORE=0 to always hit the API.
+    """
+    store = sync_transactions(start_date, end_date)
+    if store is not None:
+        with span("store.read") as s:
+            txns = [
+                t for t in parse_transactions(store.read(start_date, end_date))
+                if _matches(t, status, tag_ids, category_id, plaid_account_id, asset_id, payee, amount_min, amount_max, is_pending)
+            ]
+            s.set(rows=len(txns))
+        return txns[:limit] if limit else txns
 
-    data = _get("/transactions", params=params)
-    return data.get("transactions", data)
+    params = _transaction_params(
+        start_date, end_date, status, tag_ids, category_id, plaid_account_id, asset_id, payee, amount_min, amount_max, is_pending,
+    )
+    return parse_transactions(_fetch_transactions(params, max_rows=limit))
 
-def search_transactions(**kwargs) -> List[Dict[str, Any]]:
+def iter_transaction_pages(
+    start_date: str,
+    end_date: str,
+    page_size: int = PAGE_SIZE,
+    workers: int = PAGE_WORKERS,
+    **filters: Any,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Streaming variant of get_transactions: yields raw API pages in offset
+    order as each wave lands. Always goes to the API.
+    """
+    params = _transaction_params(start_date, end_date, **filters)
+    yield from _iter_pages(params, page_size=page_size, workers=workers)
+
+def search_transactions(**kwargs) -> List[Transaction]:
     """
     Convenience wrapper around get_transactions with the same args,
     but supports partial payee/range searches.
@@ -96,16 +432,16 @@ def get_transaction_group(anchor_txn_id: int) -> Dict[str, Any]:
     # window ±7 days around anchor
     start = (d - timedelta(days=7)).isoformat()
     end = (d + timedelta(days=7)).isoformat()
-    window_txns = get_transactions(start, end, payee=payee, limit=500)
+    window_txns = get_transactions(start, end, payee=payee)
 
     # If group_id is present, prefer it; else match by (date, payee, amount sign)
     if group_id:
-        sibs = [t for t in window_txns if (t.get("group_id") == group_id or t.get("parent_id") == group_id)]
+        sibs = [t for t in window_txns if (t.group_id == group_id or t.parent_id == group_id)]
     else:
         # fallback heuristic: same date+payee; keep all except the anchor id
-        sibs = [t for t in window_txns if t.get("date") == anchor_date and t.get("payee") == payee and t.get("id") != anchor_txn_id]
+        sibs = [t for t in window_txns if t.date == anchor_date and t.payee == payee and t.id != anchor_txn_id]
 
-    out["siblings"] = sibs
+    out["siblings"] = to_dicts(sibs)
     return out
 
 # -----------------------------
@@ -119,11 +455,7 @@ def get_recurring_items(start_date: Optional[str] = None, end_date: Optional[str
     data = _get("/recurring_items", params=params)
     return data.get("recurring_items", data)
 
-def get_budget_summary(month: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
-    """
-    Budget summary for a month or date range.
-    If 'month' provided (YYYY-MM), derive start/end.
-    """
+def _budget_params(month: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
     params: Dict[str, Any] = {}
     if month:
         y, m = map(int, month.split("-"))
@@ -137,29 +469,35 @@ def get_budget_summary(month: Optional[str] = None, start_date: Optional[str] =
 
     if start_date: params["start_date"] = start_date
     if end_date: params["end_date"] = end_date
+    return params
 
-    return _get("/budgets", params=params)
+def get_budget_summary(month: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Budget summary for a month or date range.
+    If 'month' provided (YYYY-MM), derive start/end.
+    """
+    return _get("/budgets", params=_budget_params(month, start_date, end_date))
 
 # -----------------------------
 # Reference Data (READ)
 # -----------------------------
 
 def get_categories() -> List[Dict[str, Any]]:
-    data = _get("/categories")
+    data = _cached_get("/categories")
     return data.get("categories", data)
 
 def get_category(category_id: int) -> Dict[str, Any]:
-    data = _get(f"/categories/{category_id}")
+    data = _cached_get(f"/categories/{category_id}")
     return data.get("category", data)
 
 def get_tags() -> List[Dict[str, Any]]:
-    data = _get("/tags")
+    data = _cached_get("/tags")
     return data.get("tags", data)
 
 def get_assets() -> List[Dict[str, Any]]:
-    data = _get("/assets")
+    data = _cached_get("/assets")
     return data.get("assets", data)
 
 def get_plaid_accounts() -> List[Dict[str, Any]]:
-    data = _get("/plaid_accounts")
+    data = _cached_get("/plaid_accounts")
     return data.get("plaid_accounts", data)
@@ -0,0 +1,277 @@
+# lunchmoney_async.py
+"""
+asyncio counterpart of lunchmoney.py (READ ONLY), built on httpx.AsyncClient.
+
+Same functions, same return shapes, same local store and reference cache;
+every request goes through a per-event-loop client whose concurrency is
+bounded by LM_ASYNC_CONCURRENCY, so callers can simply asyncio.gather()
+independent fetches.
+"""
+import asyncio
+import os
+import time
+import weakref
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from cache import Entry
+from fastjson import loads
+from lunchmoney import (
+    BACKOFF_MAX,
+    BASE,
+    MAX_RETRIES,
+    PAGE_SIZE,
+    PAGE_WORKERS,
+    POOL_SIZE,
+    RETRY_STATUSES,
+    _backoff,
+    _budget_params,
+    _conditional_headers,
+    _decode_transactions,
+    _get_cache,
+    _headers,
+    _matches,
+    _promote,
+    _reference_ttl,
+    _retry_after,
+    _transaction_params,
+    _wave_size,
+)
+from ratelimit import Claim, get_limiter
+from singleflight import AsyncSingleFlight, flight_key
+from store import TransactionStore, get_store
+from tracing import current_span, span
+from txn import Transaction, parse_transactions, to_dicts
+
+CONCURRENCY = int(os.getenv("LM_ASYNC_CONCURRENCY", "8"))
+
+class _LoopState:
+    def __init__(self) -> None:
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+        self.sem = asyncio.Semaphore(CONCURRENCY)
+
+# AsyncClient and Semaphore are bound to the loop they were created on
+_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+def _state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    st = _states.get(loop)
+    if st is None:
+        st = _states[loop] = _LoopState()
+    return st
+
+async def aclose() -> None:
+    """Close the client bound to the running loop (call before the loop shuts down)."""
+    st = _states.pop(asyncio.get_running_loop(), None)
+    if st is not None:
+        await st.client.aclose()
+
+async def _request(path: str, params: Optional[Dict[str, Any]] = None, timeout: int = 60, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """Async GET with the same retry/backoff policy as lunchmoney._request."""
+    st = _state()
+    limiter = get_limiter()
+    s = current_span()
+    for attempt in range(MAX_RETRIES + 1):
+        s.add("ratelimit_wait_ms", round(await limiter.aacquire() * 1000, 1))
+        try:
+            async with st.sem:
+                r = await st.client.get(f"{BASE}{path}", headers={**_headers(), **(headers or {})}, params=params or {}, timeout=timeout)
+        except httpx.TransportError:  # includes timeouts
+            if attempt == MAX_RETRIES:
+                raise
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        s.set(attempts=attempt + 1, http_status=r.status_code, response_bytes=len(r.content))
+        limiter.observe(r.status_code, _retry_after(r) if r.status_code == 429 else None)
+        if r.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+            delay = _retry_after(r)
+            await asyncio.sleep(min(BACKOFF_MAX, delay if delay is not None else _backoff(attempt)))
+            continue
+        return r
+
+_flight = AsyncSingleFlight()
+
+async def _coalesced(key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Async lunchmoney._coalesced: joiners promote the shared request's queued slot."""
+    claim = Claim()
+
+    async def lead() -> Any:
+        with claim:
+            return await fn()
+    return await _flight.do(key, lead, tag=claim, on_join=_promote)
+
+async def _get(path: str, params: Optional[Dict[str, Any]] = None, timeout: int = 60, decode: Callable[[bytes], Any] = loads) -> Any:
+    with span("lunchmoney.get", path=path, offset=(params or {}).get("offset"), coalesced=True):
+        return await _coalesced(flight_key(path, params), lambda: _get_uncoalesced(path, params, timeout, decode))
+
+async def _get_uncoalesced(path: str, params: Optional[Dict[str, Any]], timeout: int, decode: Callable[[bytes], Any]) -> Any:
+    current_span().set(coalesced=False)
+    r = await _request(path, params=params, timeout=timeout)
+    r.raise_for_status()
+    return decode(r.content)
+
+async def _cached_get(path: str) -> Any:
+    """Async lunchmoney._cached_get (same response cache)."""
+    with span("lunchmoney.cached_get", path=path, cache="hit") as s:
+        entry = await asyncio.to_thread(_get_cache().get, path)
+        if entry is not None and entry.fresh(_reference_ttl(path)):
+            return entry.value
+        s.set(cache="coalesced")
+        return await _coalesced(("cached",) + flight_key(path), lambda: _revalidate(path, entry))
+
+async def _revalidate(path: str, entry: Optional[Entry]) -> Any:
+    cache = _get_cache()
+    now = time.time()
+    current_span().set(cache="miss")
+    r = await _request(path, headers=_conditional_headers(entry))
+    if r.status_code == 304 and entry is not None:
+        current_span().set(cache="revalidated")
+        await asyncio.to_thread(cache.put, path, Entry(entry.value, entry.etag, entry.last_modified, now))
+        return entry.value
+    r.raise_for_status()
+    value = loads(r.content)
+    await asyncio.to_thread(cache.put, path, Entry(value, r.headers.get("ETag"), r.headers.get("Last-Modified"), now))
+    return value
+
+# -----------------------------
+# Core: Transactions (READ ONLY)
+# -----------------------------
+
+async def _fetch_page(params: Dict[str, Any], offset: int, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    data = await _get("/transactions", params={**params, "offset": offset, "limit": limit}, decode=_decode_transactions)
+    txns = data.get("transactions", data) if isinstance(data, dict) else data
+    has_more = data.get("has_more") if isinstance(data, dict) else None
+    return txns, (len(txns) >= limit) if has_more is None else bool(has_more)
+
+async def _fetch_transactions(params: Dict[str, Any], max_rows: Optional[int] = None) -> List[Dict[str, Any]]:
+    """All pages for params in API order: first page alone, then up to PAGE_WORKERS offsets per wave."""
+    page_size = min(PAGE_SIZE, max_rows) if max_rows else PAGE_SIZE
+    out, has_more = await _fetch_page(params, 0, page_size)
+    offset = page_size
+    while has_more and not (max_rows and len(out) >= max_rows):
+        # gather() returns in submission order, so pages stay in offset order
+        wave = await asyncio.gather(*(
+            _fetch_page(params, offset + i * page_size, page_size)
+            for i in range(_wave_size(PAGE_WORKERS, page_size, len(out), max_rows))
+        ))
+        offset += len(wave) * page_size
+        for page, more in wave:
+            out.extend(page)
+            has_more = has_more and more
+    return out[:max_rows] if max_rows else out
+
+async def sync_transactions(start_date: str, end_date: str) -> Optional[TransactionStore]:
+    """Async lunchmoney.sync_transactions; up to PAGE_WORKERS missing ranges are fetched at once."""
+    store = get_store()
+    if store is not None:
+        with span("lunchmoney.sync", start_date=start_date, end_date=end_date) as sp:
+            fetched = await store.async_sync(
+                start_date, end_date, lambda s, e: _fetch_transactions({"start_date": s, "end_date": e}), workers=PAGE_WORKERS,
+            )
+            sp.set(ranges_fetched=fetched, store_hit=fetched == 0)
+    return store
+
+async def get_transactions(
+    start_date: str,
+    end_date: str,
+    status: Optional[str] = None,
+    tag_ids: Optional[List[int]] = None,
+    category_id: Optional[int] = None,
+    plaid_account_id: Optional[int] = None,
+    asset_id: Optional[int] = None,
+    payee: Optional[str] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    is_pending: Optional[bool] = None,
+    limit: Optional[int] = None,
+) -> List[Transaction]:
+    """Async lunchmoney.get_transactions."""
+    store = await sync_transactions(start_date, end_date)
+    if store is not None:
+        with span("store.read") as sp:
+            rows = await asyncio.to_thread(store.read, start_date, end_date)
+            txns = [
+                t for t in parse_transactions(rows)
+                if _matches(t, status, tag_ids, category_id, plaid_account_id, asset_id, payee, amount_min, amount_max, is_pending)
+            ]
+            sp.set(rows=len(txns))
+        return txns[:limit] if limit else txns
+
+    params = _transaction_params(
+        start_date, end_date, status, tag_ids, category_id, plaid_account_id, asset_id, payee, amount_min, amount_max, is_pending,
+    )
+    return parse_transactions(await _fetch_transactions(params, max_rows=limit))
+
+async def search_transactions(**kwargs) -> List[Transaction]:
+    return await get_transactions(**kwargs)
+
+async def get_single_transaction(txn_id: int) -> Dict[str, Any]:
+    data = await _get(f"/transactions/{txn_id}")
+    return data.get("transaction", data)
+
+async def get_transaction_group(anchor_txn_id: int) -> Dict[str, Any]:
+    """Async lunchmoney.get_transaction_group (same best-effort heuristic)."""
+    anchor = await get_single_transaction(anchor_txn_id)
+    group_id = anchor.get("group_id") or anchor.get("parent_id") or anchor.get("external_group_id")
+    anchor_date = anchor.get("date")
+    payee = anchor.get("payee")
+    out = {"anchor": anchor, "siblings": []}
+
+    if not anchor_date:
+        return out
+
+    try:
+        d = datetime.fromisoformat(anchor_date).date()
+    except Exception:
+        d = date.fromisoformat(anchor_date)
+
+    window_txns = await get_transactions((d - timedelta(days=7)).isoformat(), (d + timedelta(days=7)).isoformat(), payee=payee)
+    if group_id:
+        sibs = [t for t in window_txns if (t.group_id == group_id or t.parent_id == group_id)]
+    else:
+        sibs = [t for t in window_txns if t.date == anchor_date and t.payee == payee and t.id != anchor_txn_id]
+    out["siblings"] = to_dicts(sibs)
+    return out
+
+# -----------------------------
+# Recurring & Budgets (READ)
+# -----------------------------
+
+async def get_recurring_items(start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    params: Dict[str, Any] = {}
+    if start_date: params["start_date"] = start_date
+    if end_date: params["end_date"] = end_date
+    data = await _get("/recurring_items", params=params)
+    return data.get("recurring_items", data)
+
+async def get_budget_summary(month: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+    return await _get("/budgets", params=_budget_params(month, start_date, end_date))
+
+# -----------------------------
+# Reference Data (READ)
+# -----------------------------
+
+async def get_categories() -> List[Dict[str, Any]]:
+    data = await _cached_get("/categories")
+    return data.get("categories", data)
+
+async def get_category(category_id: int) -> Dict[str, Any]:
+    data = await _cached_get(f"/categories/{category_id}")
+    return data.get("category", data)
+
+async def get_tags() -> List[Dict[str, Any]]:
+    data = await _cached_get("/tags")
+    return data.get("tags", data)
+
+async def get_assets() -> List[Dict[str, Any]]:
+    data = await _cached_get("/assets")
+    return data.get("assets", data)
+
+async def get_plaid_accounts() -> List[Dict[str, Any]]:
+    data = await _cached_get("/plaid_accounts")
+    return data.get("plaid_accounts", data)
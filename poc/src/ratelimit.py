@@ -0,0 +1,239 @@
+# ratelimit.py
+"""
+Client-side rate limiter / scheduler shared by every Lunch Money request
+(lunchmoney._request and lunchmoney_async._request).
+
+A token bucket (LM_RATE_LIMIT requests/s, bursts of LM_RATE_BURST) hands
+out send slots strictly in priority order: interactive chat requests go
+ahead of background sync / prefetch, FIFO within a class. The caller's
+class comes from a context variable, so it follows asyncio tasks and is
+set with `with priority(BACKGROUND): ...`. A request sent on behalf of
+several callers (a coalesced GET) runs inside a Claim, so a more urgent
+caller joining it can promote its queued slot instead of waiting behind
+background work.
+
+Rates adapt AIMD-style: a 429 halves the effective rate and pauses every
+sender until Retry-After (if given) has passed; each successful response
+then recovers a little of the configured rate.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+RATE_LIMIT = float(os.getenv("LM_RATE_LIMIT", "5"))    # requests per second; 0 disables limiting
+RATE_BURST = float(os.getenv("LM_RATE_BURST", "10"))
+MIN_FACTOR = 0.05      # never slow down below 5% of the configured rate
+RECOVERY = 0.05        # fraction of the configured rate regained per successful response
+
+INTERACTIVE = 0
+BACKGROUND = 1
+_CLASS_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("lm_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Requests made inside the block (and tasks/threads started with its context) use this class."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> int:
+    return _priority.get()
+
+# [level, seq]; mutable so a queued ticket can be promoted in place
+Ticket = List[int]
+
+class Claim:
+    """
+    Slot requests made for one shared (coalesced) call. Inside `with claim:`
+    acquire() uses the claim's class and records its tickets; promote()
+    moves the queued ones, and any later retry, up to a more urgent class.
+    """
+    def __init__(self, level: Optional[int] = None):
+        self.level = current_priority() if level is None else level
+        self._lock = threading.Lock()
+        self._tickets: List[Tuple["RateLimiter", Ticket]] = []
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self) -> "Claim":
+        self._token = _claim.set(self)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        _claim.reset(self._token)
+
+    def _add(self, limiter: "RateLimiter", ticket: Ticket) -> None:
+        with self._lock:
+            self._tickets.append((limiter, ticket))
+
+    def promote(self, level: Optional[int] = None) -> None:
+        level = current_priority() if level is None else level
+        with self._lock:
+            if level >= self.level:
+                return
+            self.level = level
+            tickets = list(self._tickets)
+        for limiter, ticket in tickets:
+            limiter.promote(ticket, level)
+
+_claim: contextvars.ContextVar[Optional[Claim]] = contextvars.ContextVar("lm_claim", default=None)
+
+class RateLimiter:
+    def __init__(self, rate: float = RATE_LIMIT, burst: float = RATE_BURST):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._cond = threading.Condition(threading.Lock())
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._factor = 1.0
+        self._paused_until = 0.0
+        self._queue: List[Ticket] = []
+        self._seq = itertools.count()
+        # metrics
+        self.granted = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.max_depth = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _effective_rate(self) -> float:
+        return self.rate * self._factor
+
+    def _enqueue(self, level: Optional[int]) -> Ticket:
+        claim = _claim.get()
+        if level is None:
+            level = claim.level if claim is not None else current_priority()
+        ticket = [level, next(self._seq)]
+        heapq.heappush(self._queue, ticket)
+        self.max_depth = max(self.max_depth, len(self._queue))
+        if claim is not None:
+            claim._add(self, ticket)
+        return ticket
+
+    def promote(self, ticket: Ticket, level: int) -> None:
+        """Move a still-queued ticket up to a more urgent class (keeps its place within the class)."""
+        with self._cond:
+            if level < ticket[0] and any(t is ticket for t in self._queue):
+                ticket[0] = level
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def _drop(self, ticket: Ticket) -> None:
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def _poll(self, ticket: Ticket, now: float) -> float:
+        """Grant the slot (0.0) if ticket is first in line and a token is ready, else seconds to wait."""
+        rate = self._effective_rate()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._queue[0] is not ticket:
+            return max(1.0 / rate, 0.01)
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / rate
+        self._tokens -= 1.0
+        heapq.heappop(self._queue)
+        self.granted += 1
+        self._cond.notify_all()
+        return 0.0
+
+    def acquire(self, level: Optional[int] = None) -> float:
+        """Block the calling thread until it may send; returns seconds waited."""
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(level)
+            try:
+                while True:
+                    wait = self._poll(ticket, time.monotonic())
+                    if wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+            except BaseException:
+                self._drop(ticket)
+                raise
+            waited = time.monotonic() - start
+            self.waited += waited
+        return waited
+
+    async def aacquire(self, level: Optional[int] = None) -> float:
+        """acquire() for coroutines: waits with asyncio.sleep, never blocking the loop."""
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(level)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._poll(ticket, time.monotonic())
+                if wait == 0.0:
+                    break
+                await asyncio.sleep(wait)
+        except BaseException:
+            with self._cond:
+                self._drop(ticket)
+            raise
+        waited = time.monotonic() - start
+        with self._cond:
+            self.waited += waited
+        return waited
+
+    def observe(self, status: int, retry_after: Optional[float] = None) -> None:
+        """Feed every response status back: 429 slows everyone down, successes recover the rate."""
+        if not self.enabled:
+            return
+        with self._cond:
+            if status == 429:
+                self.throttled += 1
+                self._factor = max(MIN_FACTOR, self._factor / 2)
+                self._tokens = min(self._tokens, 0.0)
+                pause = retry_after if retry_after is not None else 1.0 / self._effective_rate()
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            elif status < 400 and self._factor < 1.0:
+                self._factor = min(1.0, self._factor + RECOVERY)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            depth = {name: 0 for name in _CLASS_NAMES.values()}
+            for level, _ in self._queue:
+                depth[_CLASS_NAMES.get(level, str(level))] = depth.get(_CLASS_NAMES.get(level, str(level)), 0) + 1
+            return {
+                "rate": self._effective_rate(),
+                "configured_rate": self.rate,
+                "queue_depth": len(self._queue),
+                **{f"queue_{k}": v for k, v in depth.items()},
+                "max_queue_depth": self.max_depth,
+                "granted": self.granted,
+                "throttled": self.throttled,
+                "waited_seconds": round(self.waited, 3),
+                "paused_for": max(0.0, round(self._paused_until - time.monotonic(), 3)),
+            }
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_limiter() -> RateLimiter:
+    """Process-wide limiter shared by the sync and async clients."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,116 @@
+# rollup.py
+"""
+Range queries over the store's monthly rollup index.
+
+store.py keeps `rollup` / `rollup_tags` tables with sums and counts per
+(month, category, payee, account[, tag]), rebuilt for a month whenever its
+transactions change. A [start, end] query is split into whole calendar
+months, answered from the rollups, plus the partial-month edges, scanned
+from raw rows, so cost tracks the number of months and groups rather than
+the number of transactions.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from store import TransactionStore
+
+GROUP_COLUMNS = ("month", "category_id", "category_name", "payee", "account_id")
+
+@dataclass
+class Totals:
+    total: float = 0.0
+    income: float = 0.0
+    expenses: float = 0.0
+    count: int = 0
+
+def split_range(start_date: str, end_date: str) -> Tuple[Optional[Tuple[str, str]], List[Tuple[str, str]]]:
+    """((first_full_month, last_full_month) or None, [partial-month edge ranges])."""
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if end < start:
+        return None, []
+    first = start if start.day == 1 else date(start.year + (start.month == 12), start.month % 12 + 1, 1)
+    next_day = end + timedelta(days=1)
+    last_end = end if next_day.day == 1 else end.replace(day=1) - timedelta(days=1)
+    if first > last_end:
+        return None, [(start_date, end_date)]
+    edges = []
+    if start < first:
+        edges.append((start_date, (first - timedelta(days=1)).isoformat()))
+    if last_end < end:
+        edges.append(((last_end + timedelta(days=1)).isoformat(), end_date))
+    return (first.strftime("%Y-%m"), last_end.strftime("%Y-%m")), edges
+
+def _filters(category_id: Optional[int], payee: Optional[str], include_transfers: bool) -> Tuple[List[str], List[Any]]:
+    # Same semantics as lunchmoney._matches
+    where: List[str] = []
+    params: List[Any] = []
+    if category_id is not None:
+        where.append("(t.category_id = ? OR t.category_group_id = ?)")
+        params += [int(category_id), int(category_id)]
+    if payee:
+        where.append("instr(lower(coalesce(t.payee, '')), lower(?)) > 0")
+        params.append(payee)
+    if not include_transfers:
+        where.append("t.is_transfer = 0")
+    return where, params
+
+def _select(cols: List[str], sums: str, table: str, where: List[str]) -> str:
+    sql = f"SELECT {', '.join(cols + [sums])} FROM {table} t WHERE {' AND '.join(where)}"
+    return sql + (f" GROUP BY {', '.join(cols)}" if cols else "")
+
+def range_totals(
+    store: TransactionStore,
+    start_date: str,
+    end_date: str,
+    group_by: Sequence[str] = (),
+    category_id: Optional[int] = None,
+    tag_ids: Optional[List[int]] = None,
+    payee: Optional[str] = None,
+    include_transfers: bool = True,
+) -> Dict[Tuple[Any, ...], Totals]:
+    """
+    Totals for [start_date, end_date] keyed by the group_by column values
+    (the empty tuple when group_by is empty). The range must already be
+    synced into the store.
+    """
+    bad = [c for c in group_by if c not in GROUP_COLUMNS]
+    if bad:
+        raise ValueError(f"Cannot group by {bad}; expected any of {GROUP_COLUMNS}")
+    where, params = _filters(category_id, payee, include_transfers)
+    tags = [int(x) for x in tag_ids or []]
+    full, edges = split_range(start_date, end_date)
+    if len(tags) > 1:
+        # A transaction can carry several of the tags; scan raw rows so it counts once
+        full, edges = None, [(start_date, end_date)]
+
+    queries: List[Tuple[str, List[Any]]] = []
+    if full is not None:
+        table = "rollup_tags" if tags else "rollup"
+        w = ["t.month BETWEEN ? AND ?"] + where + (["t.tag_id = ?"] if tags else [])
+        sums = "SUM(t.total), SUM(t.income), SUM(t.expenses), SUM(t.count)"
+        cols = [f"t.{c}" for c in group_by]
+        queries.append((_select(cols, sums, table, w), [*full, *params, *tags]))
+    for s, e in edges:
+        w = ["t.date BETWEEN ? AND ?"] + where
+        if tags:
+            w.append(f"EXISTS (SELECT 1 FROM transaction_tags g WHERE g.txn_id = t.id AND g.tag_id IN ({', '.join('?' * len(tags))}))")
+        sums = (
+            "SUM(t.amount), SUM(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END), "
+            "SUM(CASE WHEN t.amount < 0 THEN -t.amount ELSE 0 END), COUNT(*)"
+        )
+        cols = ["substr(t.date, 1, 7)" if c == "month" else f"t.{c}" for c in group_by]
+        queries.append((_select(cols, sums, "transactions", w), [s, e, *params, *tags]))
+
+    out: Dict[Tuple[Any, ...], Totals] = {}
+    n = len(group_by)
+    for sql, p in queries:
+        for row in store.query(sql, p):
+            if not row[n + 3]:
+                continue
+            acc = out.setdefault(tuple(row[:n]), Totals())
+            acc.total += row[n] or 0.0
+            acc.income += row[n + 1] or 0.0
+            acc.expenses += row[n + 2] or 0.0
+            acc.count += row[n + 3]
+    return out
@@ -0,0 +1,268 @@
+# router.py
+"""
+Rule-based intent router for common questions.
+
+route() maps phrasings like "spend by category in March" or "compare
+Jan–Mar vs last year" straight to a TOOLS call with resolved date args, so
+the model no longer spends a turn emitting the <tool_call>. It is
+deliberately conservative: if any word of the question is not understood
+(a payee, a tag, "groceries"...), it returns None and the normal LLM tool
+loop handles the question.
+
+render() turns the result of a routed call into a templated markdown reply,
+for LM_ROUTER=template, which skips the model entirely.
+"""
+import calendar
+import os
+import re
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# off | summarize (router picks the tool, model summarizes) | template (no model at all)
+ROUTER_MODE = os.getenv("LM_ROUTER", "summarize").lower()
+
+DateSpan = Tuple[date, date]
+
+_MONTHS = {m.lower(): i for i, m in enumerate(calendar.month_name) if m}
+_MONTHS.update({m.lower(): i for i, m in enumerate(calendar.month_abbr) if m})
+_MONTHS["sept"] = 9
+_MONTH_RE = "|".join(sorted(_MONTHS, key=len, reverse=True))
+_NUMBERS = {w: i for i, w in enumerate("zero one two three four five six seven eight nine ten eleven twelve".split())}
+
+# Words that carry no meaning for routing once intent and dates are found
+_FILLER = frozenset("""
+a an the and or of for to in on at by from with about over during per my me i we our us you your it its is are
+was were be been do does did have has had can could would should will please show tell give list get find see
+display what whats which who how much many where when total totals sum spend spent spending spendings expense
+expenses cost costs money purchases purchase so far up breakdown break down summary overview report look looking
+like all each every this that there their them versus vs compare compared comparison against same period
+""".split())
+
+# -----------------------------
+# Dates
+# -----------------------------
+
+def _month_end(y: int, m: int) -> date:
+    return date(y, m, calendar.monthrange(y, m)[1])
+
+def _add_months(d: date, k: int) -> date:
+    y, m = divmod(d.month - 1 + k, 12)
+    return date(d.year + y, m + 1, 1)
+
+def _recent_year(month: int, today: date) -> int:
+    # A bare month name means its latest occurrence that has started
+    return today.year if month <= today.month else today.year - 1
+
+def _year_of(token: Optional[str], today: date, fallback: int) -> int:
+    if not token:
+        return fallback
+    token = token.strip()
+    if token == "this year":
+        return today.year
+    if token == "last year":
+        return today.year - 1
+    return int(token)
+
+_YEAR = r"(?:\s*,?\s*(?P<{0}>\d{{4}}|this year|last year))?"
+
+def _date_rules(today: date) -> List[Tuple[re.Pattern, Callable[[re.Match], DateSpan]]]:
+    def month_range(m: re.Match) -> DateSpan:
+        a, b = _MONTHS[m["m1"]], _MONTHS[m["m2"]]
+        y2 = _year_of(m["y2"], today, _recent_year(b, today))
+        y1 = _year_of(m["y1"], today, y2 if a <= b else y2 - 1)
+        return date(y1, a, 1), _month_end(y2, b)
+
+    def one_month(m: re.Match) -> DateSpan:
+        mo = _MONTHS[m["m"]]
+        y = _year_of(m["y"], today, _recent_year(mo, today))
+        return date(y, mo, 1), _month_end(y, mo)
+
+    def quarter(m: re.Match) -> DateSpan:
+        q = int(m["q"])
+        y = _year_of(m["y"], today, today.year if 3 * q - 2 <= today.month else today.year - 1)
+        return date(y, 3 * q - 2, 1), _month_end(y, 3 * q)
+
+    def trailing(m: re.Match) -> DateSpan:
+        n = int(m["n"]) if m["n"].isdigit() else _NUMBERS[m["n"]]
+        unit = m["unit"]
+        if unit.startswith("day"):
+            return today - timedelta(days=n - 1), today
+        if unit.startswith("week"):
+            return today - timedelta(weeks=n) + timedelta(days=1), today
+        # Last N months: the N full months before this one plus the current month so far
+        return _add_months(today.replace(day=1), -n), today
+
+    week = today - timedelta(days=today.weekday())
+    last_month = _add_months(today.replace(day=1), -1)
+    month_alt = f"(?:{_MONTH_RE})"
+    return [
+        (re.compile(rf"\b(?:from\s+)?(?P<m1>{month_alt}){_YEAR.format('y1')}\s*(?:-|–|—|to|through|thru|until)\s*(?P<m2>{month_alt}){_YEAR.format('y2')}\b"), month_range),
+        (re.compile(rf"\bq(?P<q>[1-4]){_YEAR.format('y')}\b"), quarter),
+        (re.compile(r"\b(?P<y>\d{4})-(?P<mo>0[1-9]|1[0-2])\b"), lambda m: (date(int(m["y"]), int(m["mo"]), 1), _month_end(int(m["y"]), int(m["mo"])))),
+        (re.compile(rf"\b(?:in\s+|for\s+|during\s+)?(?P<m>{month_alt}){_YEAR.format('y')}\b"), one_month),
+        (re.compile(r"\b(?:year to date|ytd|so far this year|this year so far|this year)\b"), lambda m: (date(today.year, 1, 1), today)),
+        (re.compile(r"\blast year\b"), lambda m: (date(today.year - 1, 1, 1), date(today.year - 1, 12, 31))),
+        (re.compile(r"\b(?:month to date|mtd|this month so far|so far this month|this month)\b"), lambda m: (today.replace(day=1), today)),
+        (re.compile(r"\b(?:last|previous|prior) month\b"), lambda m: (last_month, _month_end(last_month.year, last_month.month))),
+        (re.compile(r"\bthis week\b"), lambda m: (week, today)),
+        (re.compile(r"\b(?:last|previous|prior) week\b"), lambda m: (week - timedelta(days=7), week - timedelta(days=1))),
+        (re.compile(r"\btoday\b"), lambda m: (today, today)),
+        (re.compile(r"\byesterday\b"), lambda m: (today - timedelta(days=1), today - timedelta(days=1))),
+        (re.compile(rf"\b(?:last|past|previous|prior)\s+(?P<n>\d+|{'|'.join(_NUMBERS)})\s+(?P<unit>days?|weeks?|months?)\b"), trailing),
+        (re.compile(r"\b(?:in\s+)?(?P<y>20\d{2})\b"), lambda m: (date(int(m["y"]), 1, 1), min(date(int(m["y"]), 12, 31), today))),
+    ]
+
+def parse_dates(text: str, today: Optional[date] = None) -> Tuple[Optional[DateSpan], str, bool]:
+    """
+    (span or None, text with the date phrase removed, ambiguous). Only one
+    date phrase is understood; a second one makes the result ambiguous.
+    """
+    today = today or date.today()
+    span: Optional[DateSpan] = None
+    for pattern, build in _date_rules(today):
+        m = pattern.search(text)
+        if not m:
+            continue
+        if span is not None:
+            return span, text, True
+        try:
+            span = build(m)
+        except (ValueError, KeyError):
+            return None, text, True
+        text = text[:m.start()] + " " + text[m.end():]
+    return span, text, False
+
+# -----------------------------
+# Intents
+# -----------------------------
+
+# (tool, pattern) in priority order; the matched phrase is removed before leftovers are checked
+_INTENTS: List[Tuple[str, re.Pattern]] = [
+    ("compare_yoy", re.compile(
+        r"\b(?:year over year|year-over-year|yoy|(?:vs\.?|versus|compared? (?:to|with)|against)\s+(?:the )?(?:same (?:period|time|months?) )?(?:last|previous|prior) year|(?:to|with) the same (?:period|time|months?) last year)\b"
+    )),
+    ("monthly_cashflow", re.compile(
+        r"\b(?:cash ?flow|income (?:vs\.?|versus|and|against) (?:expenses|spending)|net income|net savings|how much (?:did )?i save[d]?|savings)\b"
+    )),
+    ("month_over_month", re.compile(
+        r"\b(?:month over month|month-over-month|per month|by month|each month|every month|monthly (?:trends?|totals?|spending)"
+        r"|spending trends?|trends? (?:of|in|for|over)|(?:vs\.?|versus|compared? (?:to|with)) (?:the )?(?:last|previous|prior) month)\b"
+    )),
+    ("top_merchants", re.compile(
+        r"\b(?:top|biggest|largest|most expensive)\s+(?:(?P<n>\d+|" + "|".join(_NUMBERS) + r")\s+)?(?:merchants?|payees?|vendors?|stores?|shops?|places)\b"
+        r"|\bwhere (?:do|did) i (?:spend|shop)(?: the)? most\b"
+    )),
+    ("sum_by_category", re.compile(
+        r"\b(?:(?:by|per|for each|each|across) categor(?:y|ies)|categor(?:y|ies) breakdown|spending categories)\b"
+    )),
+]
+
+def _leftovers(text: str) -> List[str]:
+    return [w for w in re.findall(r"[a-z0-9']+", text) if w not in _FILLER]
+
+def _months_between(start: date, end: date) -> int:
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+def _args_for(tool: str, span: DateSpan, m: re.Match) -> Dict[str, Any]:
+    start, end = span
+    if tool in ("sum_by_category", "top_merchants"):
+        args: Dict[str, Any] = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+        if tool == "top_merchants" and m.groupdict().get("n"):
+            n = m["n"]
+            args["n"] = int(n) if n.isdigit() else _NUMBERS[n]
+        return args
+    if tool in ("month_over_month", "monthly_cashflow"):
+        return {"start_month": end.strftime("%Y-%m"), "months": _months_between(start, end)}
+    # compare_yoy: a single whole month goes by month, anything else by range
+    if start.day == 1 and end == _month_end(start.year, start.month):
+        return {"month": start.strftime("%Y-%m")}
+    return {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+def route(question: str, default_range: Tuple[str, str], today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    {"tool": ..., "args": {...}} for a question the rules fully understand,
+    else None. default_range is used when the question names no dates.
+    """
+    text = " " + question.lower().replace("’", "'") + " "
+    text = re.sub(r"[?!.,;:]+(\s|$)", r" \1", text)
+
+    for tool, pattern in _INTENTS:
+        m = pattern.search(text)
+        if m:
+            break
+    else:
+        return None
+    rest = text[:m.start()] + " " + text[m.end():]
+
+    span, rest, ambiguous = parse_dates(rest, today)
+    if ambiguous or _leftovers(rest):
+        return None
+    if span is None:
+        span = (date.fromisoformat(default_range[0]), date.fromisoformat(default_range[1]))
+    # Nothing to fetch past today
+    span = (span[0], min(span[1], today or date.today()))
+    if span[1] < span[0]:
+        return None
+    return {"tool": tool, "args": _args_for(tool, span, m)}
+
+# -----------------------------
+# Templated replies
+# -----------------------------
+
+def _money(x: Any) -> str:
+    return f"{float(x or 0):,.2f}"
+
+def _md_table(headers: List[str], rows: List[List[str]]) -> str:
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines += ["| " + " | ".join(r) + " |" for r in rows]
+    return "\n".join(lines)
+
+def _span_label(args: Dict[str, Any]) -> str:
+    return f"{args.get('start_date')} → {args.get('end_date')}"
+
+def render(tool_call: Dict[str, Any], result: Dict[str, Any], max_rows: int = 15) -> Optional[str]:
+    """Markdown reply for a routed tool result, or None if there is no template for it."""
+    if not isinstance(result, dict) or "error" in result:
+        return None
+    tool, args = tool_call.get("tool"), tool_call.get("args") or {}
+
+    if tool == "sum_by_category":
+        rows = result.get("by_category") or []
+        if not rows:
+            return f"No transactions between {_span_label(args)}."
+        body = _md_table(["Category", "Total"], [[r["category"], _money(r["total"])] for r in rows[:max_rows]])
+        more = f"\n\n…and {len(rows) - max_rows} more categories." if len(rows) > max_rows else ""
+        return f"**Spending by category, {_span_label(args)}**\n\n{body}{more}"
+
+    if tool == "top_merchants":
+        rows = result.get("top_merchants") or []
+        if not rows:
+            return f"No transactions between {_span_label(args)}."
+        body = _md_table(
+            ["Merchant", "Total", "Transactions"],
+            [[r["payee"], _money(r["total"]), str(r["tx_count"])] for r in rows[:max_rows]],
+        )
+        return f"**Top merchants, {_span_label(args)}**\n\n{body}"
+
+    if tool == "monthly_cashflow":
+        rows = result.get("cashflow") or []
+        body = _md_table(
+            ["Month", "Income", "Expenses", "Net"],
+            [[r["month"], _money(r["income"]), _money(r["expenses"]), _money(r["net"])] for r in rows],
+        )
+        return f"**Monthly cash flow**\n\n{body}"
+
+    if tool == "month_over_month":
+        rows = result.get("mom") or []
+        return "**Month over month**\n\n" + _md_table(["Month", "Total"], [[r["month"], _money(r["total"])] for r in rows])
+
+    if tool == "compare_yoy":
+        cur, prior = result.get("current") or {}, result.get("prior") or {}
+        pct = result.get("pct_change")
+        change = f" ({pct:+.1%})" if pct is not None else ""
+        return (
+            f"**{cur.get('start_date')} → {cur.get('end_date')}:** {_money(cur.get('total'))}\n\n"
+            f"**{prior.get('start_date')} → {prior.get('end_date')}:** {_money(prior.get('total'))}\n\n"
+            f"**Change:** {_money(result.get('delta'))}{change}"
+        )
+    return None
@@ -0,0 +1,249 @@
+"""
+fastapi>=0.115
+uvicorn>=0.30
+python-dotenv>=1.0
+httpx>=0.28
+
+Run:  uvicorn server:app --port 8000   (from poc/src)
+"""
+"""
+// Non-streaming; send only a prompt
+const res = await fetch("http://localhost:8000/chat", {
+  method: "POST",
+  headers: { "Content-Type": "application/json" },
+  body: JSON.stringify({ prompt: "What did I spend by category last month?" })
+});
+const data = await res.json();
+// data.reply -> final text
+// data.tool_used/tool_args/tool_result -> telemetry if a tool was used
+
+// Streaming (Server-Sent Events over POST)
+const res = await fetch("http://localhost:8000/chat/stream", { method: "POST", headers: {...}, body });
+// events: token {text} | tool_call {calls} | tool_result {tool, ok, ms} | done {reply, steps, guard_tripped} | error {message}
+"""
+
+# server.py
+# Async version of archive/server.py: every endpoint is a coroutine, Ollama is
+# streamed over a shared httpx.AsyncClient and tools run through
+# tools.arun_tools (lunchmoney_async), so one uvicorn worker serves many
+# concurrent chats instead of one per thread.
+import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+import lm
+import lunchmoney_async as alm
+from ratelimit import get_limiter
+from chat import default_dates, tool_loop
+from lm import astream_reply
+from prompts import SYSTEM_PROMPT
+from router import ROUTER_MODE, route
+from tools import arun_tool
+from tracing import traced
+
+Emit = Callable[[str, Dict[str, Any]], None]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Clients are per event loop; close them with the loop that owns them
+    await lm.aclose()
+    await alm.aclose()
+
+app = FastAPI(title="LM Chat API", version="0.3.0", lifespan=lifespan)
+
+# --- CORS for local web frontends ---
+ALLOWED_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000,http://localhost:5173").split(",")
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[o.strip() for o in ALLOWED_ORIGINS if o.strip()],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# ----- Types -----
+class Message(BaseModel):
+    role: str = Field(pattern="^(system|user|assistant)$")
+    content: str
+
+class ChatRequest(BaseModel):
+    prompt: Optional[str] = None
+    messages: Optional[List[Message]] = None
+    months_back_default: int = 3  # used if tool args omit dates
+
+class ChatResponse(BaseModel):
+    reply: Optional[str]  # None if guard tripped
+    tool_used: Optional[Any] = None     # tool name, or list of names for a batched step
+    tool_args: Optional[Any] = None
+    tool_result: Optional[Any] = None
+    guard_tripped: Optional[bool] = False
+    steps: int = 0  # how many tool steps executed
+
+# ----- Helpers -----
+def _prepare_messages(body: ChatRequest) -> List[Dict[str, str]]:
+    msgs: List[Dict[str, str]] = []
+    has_system = False
+    if body.messages:
+        for m in body.messages:
+            msgs.append({"role": m.role, "content": m.content})
+            if m.role == "system":
+                has_system = True
+    elif body.prompt:
+        msgs = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": body.prompt},
+        ]
+        has_system = True
+    else:
+        raise HTTPException(400, "Provide either 'prompt' or 'messages'")
+    if not has_system:
+        msgs.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
+    return msgs
+
+def _last_prompt(messages: List[Dict[str, str]]) -> Optional[str]:
+    if len(messages) >= 2 and messages[-1]["role"] == "user" and "<tool_result>" not in messages[-1]["content"]:
+        return messages[-1]["content"]
+    return None
+
+def _token_emitter(emit: Optional[Emit]) -> Optional[Callable[[str], None]]:
+    """on_text callback for astream_reply that emits only the new part of the visible text."""
+    if emit is None:
+        return None
+    sent = ""
+
+    def on_text(text: str) -> None:
+        nonlocal sent
+        if text.startswith(sent) and len(text) > len(sent):
+            emit("token", {"text": text[len(sent):]})
+            sent = text
+
+    return on_text
+
+async def _run_tools(batch: List[Dict[str, Any]], emit: Optional[Emit]) -> List[Dict[str, Any]]:
+    """arun_tools, plus a tool_result event with its own elapsed time as each call finishes."""
+    async def run(call: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        result = await arun_tool(call)
+        if emit is not None:
+            ok = not (isinstance(result, dict) and "error" in result)
+            emit("tool_result", {"tool": call.get("tool"), "ok": ok, "ms": round((time.perf_counter() - t0) * 1000, 1)})
+        return result
+
+    return list(await asyncio.gather(*(run(c) for c in batch)))
+
+def _tool_names(last_tool: Any) -> Any:
+    if isinstance(last_tool, list):
+        return [t.get("tool") for t in last_tool]
+    return last_tool.get("tool") if isinstance(last_tool, dict) else None
+
+# Drives chat.tool_loop (the loop app.py runs) with the async model stream and tool runner.
+# Returns (final_reply, last_tool, last_args, last_result, steps, guard_tripped); last_tool is the tool name(s).
+@traced("chat.turn")
+async def _achat_with_tools(messages: List[Dict[str, str]], months_back_default: int, max_steps: int = 2,
+    emit: Optional[Emit] = None,
+) -> Tuple[Optional[str], Any, Any, Any, int, bool]:
+    prompt = _last_prompt(messages)
+    routed = route(prompt, default_dates(months_back_default)) if prompt and ROUTER_MODE != "off" else None
+    loop = tool_loop(messages, months_back_default, max_steps, routed=routed, templated=ROUTER_MODE == "template")
+    on_text = _token_emitter(emit)
+    answer: Any = None
+    while True:
+        try:
+            kind, payload = loop.send(answer)
+        except StopIteration as done:
+            reply, steps, guard, last_tool, last_args, last_result = done.value
+            return reply, _tool_names(last_tool), last_args, last_result, steps, guard
+        try:
+            if kind == "model":
+                answer = await astream_reply(payload, on_text)
+            elif kind == "tools":
+                if emit is not None:
+                    emit("tool_call", {"calls": payload})
+                answer = await _run_tools(payload, emit)
+            else:
+                answer = on_text(payload) if on_text is not None else None
+        except Exception as e:
+            loop.throw(e)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+# ----- Endpoints -----
+@app.get("/health")
+async def health():
+    return {"ok": True}
+
+@app.get("/metrics")
+async def metrics():
+    # Lunch Money scheduler: effective rate, queue depth per priority class, 429s, time spent waiting
+    return {"lunchmoney_rate_limiter": get_limiter().stats()}
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(body: ChatRequest):
+    try:
+        msgs = _prepare_messages(body)
+        reply, tool_used, tool_args, tool_result, steps, guard = await _achat_with_tools(
+            messages=msgs,
+            months_back_default=body.months_back_default,
+            max_steps=2,
+        )
+        return ChatResponse(
+            reply=reply,
+            tool_used=tool_used,
+            tool_args=tool_args,
+            tool_result=tool_result,
+            guard_tripped=guard,
+            steps=steps,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Unhandled error: {e}")
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(body: ChatRequest):
+    msgs = _prepare_messages(body)
+    queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue()
+
+    async def run() -> None:
+        try:
+            reply, tool_used, _, _, steps, guard = await _achat_with_tools(
+                messages=msgs,
+                months_back_default=body.months_back_default,
+                max_steps=2,
+                emit=lambda event, data: queue.put_nowait((event, data)),
+            )
+            queue.put_nowait(("done", {"reply": reply, "tool_used": tool_used, "steps": steps, "guard_tripped": guard}))
+        except Exception as e:
+            queue.put_nowait(("error", {"message": str(e)}))
+
+    async def events() -> AsyncIterator[str]:
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event, data = await queue.get()
+                yield _sse(event, data)
+                if event in ("done", "error"):
+                    break
+        finally:
+            # Client went away (or we finished): don't keep generating for nobody
+            task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
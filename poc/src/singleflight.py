@@ -0,0 +1,98 @@
+# singleflight.py
+"""
+Request coalescing ("single-flight") for identical in-flight calls.
+
+While a call for a key is running, every other caller asking for the same
+key waits for it and gets the same result (or exception) instead of
+issuing its own request. Nothing is cached: once the call finishes, the
+next caller starts a fresh one. Shared results are the same object for all
+callers, so treat them as read-only.
+
+SingleFlight is for threads, AsyncSingleFlight for asyncio (one table per
+event loop, since futures are bound to their loop). The leader may attach a
+`tag` to its call; each joiner's `on_join(tag)` runs before it waits, e.g.
+to promote the leader's queued rate-limit slot for a more urgent joiner.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+def flight_key(path: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, ...]:
+    """(path, normalized params): None dropped (requests/httpx drop them too), keys sorted, values stringified."""
+    items = []
+    for k, v in sorted((params or {}).items()):
+        if v is None:
+            continue
+        items.append((k, tuple(str(x) for x in v) if isinstance(v, (list, tuple)) else str(v)))
+    return (path, tuple(items))
+
+class _Call:
+    __slots__ = ("done", "value", "error", "tag")
+
+    def __init__(self, tag: Any = None) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.tag = tag
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0    # calls actually executed
+        self.shared = 0   # callers that piggybacked on an in-flight call
+
+    def do(self, key: Hashable, fn: Callable[[], Any], tag: Any = None,
+           on_join: Optional[Callable[[Any], None]] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(tag)
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            if on_join is not None:
+                on_join(call.tag)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+class AsyncSingleFlight:
+    def __init__(self) -> None:
+        self._tables: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, Tuple[asyncio.Task, Any]]]" = weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], tag: Any = None,
+                 on_join: Optional[Callable[[Any], None]] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        table = self._tables.get(loop)
+        if table is None:
+            table = self._tables[loop] = {}
+        entry = table.get(key)
+        if entry is None:
+            # Run as its own task so a cancelled caller doesn't cancel the call for everyone else
+            task = loop.create_task(fn())
+            table[key] = (task, tag)
+            task.add_done_callback(lambda _t: table.pop(key, None))
+            self.calls += 1
+        else:
+            task, leader_tag = entry
+            self.shared += 1
+            if on_join is not None:
+                on_join(leader_tag)
+        return await asyncio.shield(task)
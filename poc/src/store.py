@@ -0,0 +1,390 @@
+# store.py
+"""
+Local on-disk transaction store (SQLite).
+
+lunchmoney.get_transactions reads from here instead of hitting the API on
+every tool call. Coverage is tracked per calendar day together with the time
+it was last synced (the sync watermark):
+  - days never synced are fetched from the API (in calendar-month chunks)
+  - days inside the trailing LM_STORE_REFRESH_DAYS window are re-synced once
+    their watermark is older than LM_STORE_TTL seconds, since recent
+    transactions are still being imported / edited / cleared
+  - older days are re-synced once their watermark is older than
+    LM_STORE_MAX_AGE seconds (late edits, recategorizations), or on demand
+    via expire()
+  - everything else is served locally
+The store belongs to one Lunch Money account (API base URL + token hash,
+see account_key()) and one LM_TXN_FIELDS selection; opened for another
+account, or with other fields, it starts empty.
+"""
+import asyncio
+import contextvars
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastjson import dumps, loads
+from txn import TXN_FIELDS
+
+STORE_ENABLED = os.getenv("LM_STORE", "1").lower() not in ("0", "false", "no", "off")
+STORE_PATH = os.getenv(
+    "LM_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lm_cache", "lunchmoney.sqlite3"),
+)
+REFRESH_DAYS = int(os.getenv("LM_STORE_REFRESH_DAYS", "30"))
+TTL_SECONDS = float(os.getenv("LM_STORE_TTL", "300"))
+MAX_AGE_SECONDS = float(os.getenv("LM_STORE_MAX_AGE", str(7 * 86400)))
+
+DateRange = Tuple[str, str]
+FetchRange = Callable[[str, str], List[Dict[str, Any]]]
+AsyncFetchRange = Callable[[str, str], Awaitable[List[Dict[str, Any]]]]
+
+# Bump when the layout changes; the store is a cache, so older files are rebuilt
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category_id INTEGER,
+    category_group_id INTEGER,
+    category_name TEXT,
+    payee TEXT,
+    account_id INTEGER,
+    is_transfer INTEGER NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_transactions_date ON transactions(date);
+CREATE TABLE IF NOT EXISTS transaction_tags (
+    txn_id INTEGER NOT NULL,
+    tag_id INTEGER NOT NULL,
+    PRIMARY KEY (txn_id, tag_id)
+);
+CREATE INDEX IF NOT EXISTS ix_transaction_tags_tag ON transaction_tags(tag_id);
+CREATE TABLE IF NOT EXISTS coverage (
+    day TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+-- Monthly rollups (see rollup.py), rebuilt per month whenever its rows change
+CREATE TABLE IF NOT EXISTS rollup (
+    month TEXT NOT NULL,
+    category_id INTEGER,
+    category_group_id INTEGER,
+    category_name TEXT,
+    payee TEXT,
+    account_id INTEGER,
+    is_transfer INTEGER NOT NULL,
+    total REAL NOT NULL,
+    income REAL NOT NULL,
+    expenses REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_rollup_month ON rollup(month);
+CREATE TABLE IF NOT EXISTS rollup_tags (
+    month TEXT NOT NULL,
+    tag_id INTEGER NOT NULL,
+    category_id INTEGER,
+    category_group_id INTEGER,
+    category_name TEXT,
+    payee TEXT,
+    account_id INTEGER,
+    is_transfer INTEGER NOT NULL,
+    total REAL NOT NULL,
+    income REAL NOT NULL,
+    expenses REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_rollup_tags_month ON rollup_tags(tag_id, month);
+"""
+
+_TABLES = ("transactions", "transaction_tags", "coverage", "meta", "rollup", "rollup_tags")
+
+_ROLLUP_SUMS = """
+    SUM(t.amount),
+    SUM(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END),
+    SUM(CASE WHEN t.amount < 0 THEN -t.amount ELSE 0 END),
+    COUNT(*)
+"""
+
+_REBUILD_ROLLUP = f"""
+INSERT INTO rollup
+SELECT ?, t.category_id, t.category_group_id, t.category_name, t.payee, t.account_id, t.is_transfer, {_ROLLUP_SUMS}
+FROM transactions t
+WHERE t.date BETWEEN ? AND ?
+GROUP BY t.category_id, t.category_group_id, t.category_name, t.payee, t.account_id, t.is_transfer
+"""
+
+_REBUILD_ROLLUP_TAGS = f"""
+INSERT INTO rollup_tags
+SELECT ?, g.tag_id, t.category_id, t.category_group_id, t.category_name, t.payee, t.account_id, t.is_transfer, {_ROLLUP_SUMS}
+FROM transactions t JOIN transaction_tags g ON g.txn_id = t.id
+WHERE t.date BETWEEN ? AND ?
+GROUP BY g.tag_id, t.category_id, t.category_group_id, t.category_name, t.payee, t.account_id, t.is_transfer
+"""
+
+def account_key(base_url: str, token: Optional[str]) -> str:
+    """Identifies a Lunch Money account: the API base URL plus a hash of the token (never the token itself)."""
+    digest = hashlib.sha256((token or "").encode()).hexdigest()[:16]
+    return f"{base_url.rstrip('/')}#{digest}"
+
+# Account of the process-wide store (same env vars as lunchmoney.py)
+ACCOUNT = account_key(os.getenv("LUNCHMONEY_BASE_URL", "https://dev.lunchmoney.app/v1"), os.getenv("LUNCHMONEY_TOKEN"))
+# Fields its rows carry (LM_TXN_FIELDS)
+FIELD_SET = "all" if TXN_FIELDS is None else ",".join(TXN_FIELDS)
+
+def is_transfer(t: Dict[str, Any]) -> bool:
+    # LM often flags transfers via category or payee; heuristic only
+    return bool(t.get("is_transfer") or (t.get("category_name") == "Transfers"))
+
+def _row(t: Dict[str, Any], default_date: str) -> Tuple[Any, ...]:
+    account = t.get("plaid_account_id") if t.get("plaid_account_id") is not None else t.get("asset_id")
+    return (
+        int(t["id"]),
+        t.get("date") or default_date,
+        float(t.get("amount") or 0),
+        t.get("category_id"),
+        t.get("category_group_id"),
+        t.get("category_name"),
+        t.get("payee"),
+        account,
+        int(is_transfer(t)),
+        dumps(t),
+    )
+
+# -----------------------------
+# Date helpers
+# -----------------------------
+
+def _days(start: date, end: date) -> Iterable[date]:
+    d = start
+    while d <= end:
+        yield d
+        d += timedelta(days=1)
+
+def _month_chunks(start: date, end: date) -> List[DateRange]:
+    """Split [start, end] on calendar-month boundaries."""
+    out: List[DateRange] = []
+    s = start
+    while s <= end:
+        nxt = date(s.year + (s.month == 12), s.month % 12 + 1, 1)
+        e = min(end, nxt - timedelta(days=1))
+        out.append((s.isoformat(), e.isoformat()))
+        s = nxt
+    return out
+
+def _runs(days: List[date]) -> List[Tuple[date, date]]:
+    """Collapse a sorted list of days into contiguous (start, end) runs."""
+    runs: List[Tuple[date, date]] = []
+    for d in days:
+        if runs and runs[-1][1] + timedelta(days=1) == d:
+            runs[-1] = (runs[-1][0], d)
+        else:
+            runs.append((d, d))
+    return runs
+
+# -----------------------------
+# Store
+# -----------------------------
+
+class TransactionStore:
+    def __init__(self, path: str = STORE_PATH, refresh_days: int = REFRESH_DAYS, ttl: float = TTL_SECONDS,
+        max_age: float = MAX_AGE_SECONDS, account: str = "", fields: str = "all",
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.refresh_days = refresh_days
+        self.ttl = ttl
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            for table in _TABLES:
+                self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        # Data synced for another account (base URL / token) must never be served, and rows
+        # decoded with fewer fields can't be served once more are asked for
+        source = {"account": account, "fields": fields}
+        if dict(self._conn.execute("SELECT key, value FROM meta WHERE key IN ('account', 'fields')")) != source:
+            self.clear()
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", source.items())
+
+    def missing_ranges(self, start_date: str, end_date: str, now: Optional[float] = None) -> List[DateRange]:
+        """Date ranges in [start_date, end_date] that must be (re)fetched from the API."""
+        now = time.time() if now is None else now
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        if end < start:
+            return []
+        volatile_from = date.today() - timedelta(days=self.refresh_days)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, synced_at FROM coverage WHERE day BETWEEN ? AND ?",
+                (start.isoformat(), end.isoformat()),
+            ).fetchall()
+        synced = {day: ts for day, ts in rows}
+
+        max_age = self.max_age or float("inf")  # 0: old days are only re-synced via expire()
+        stale: List[date] = []
+        for d in _days(start, end):
+            ts = synced.get(d.isoformat())
+            if ts is None or now - ts > (self.ttl if d >= volatile_from else max_age):
+                stale.append(d)
+
+        out: List[DateRange] = []
+        for s, e in _runs(stale):
+            out.extend(_month_chunks(s, e))
+        return out
+
+    def put_range(self, start_date: str, end_date: str, txns: List[Dict[str, Any]], now: Optional[float] = None) -> None:
+        """
+        Replace everything stored for [start_date, end_date] with txns, mark
+        those days synced and rebuild the rollups of every month touched.
+        """
+        now = time.time() if now is None else now
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        rows = [_row(t, start_date) for t in txns if t.get("id") is not None]
+        tags = [
+            (int(t["id"]), int(tag["id"]))
+            for t in txns if t.get("id") is not None
+            for tag in (t.get("tags") or []) if tag.get("id") is not None
+        ]
+        with self._lock, self._conn:
+            # Months whose rollups change: the range itself plus wherever re-dated rows used to live
+            months = {s[:7] for s, _ in _month_chunks(start, end)}
+            months.update(d[:7] for d in self._dates_of([r[0] for r in rows]))
+            before = set(self._conn.execute(
+                "SELECT id, payload FROM transactions WHERE date BETWEEN ? AND ?", (start_date, end_date),
+            ))
+            # Delete first so transactions removed/moved upstream don't linger locally
+            self._conn.execute(
+                "DELETE FROM transaction_tags WHERE txn_id IN (SELECT id FROM transactions WHERE date BETWEEN ? AND ?)",
+                (start_date, end_date),
+            )
+            self._conn.execute("DELETE FROM transactions WHERE date BETWEEN ? AND ?", (start_date, end_date))
+            self._conn.executemany("DELETE FROM transaction_tags WHERE txn_id = ?", [(r[0],) for r in rows])
+            self._conn.executemany(f"INSERT OR REPLACE INTO transactions VALUES ({', '.join('?' * 10)})", rows)
+            self._conn.executemany("INSERT OR IGNORE INTO transaction_tags (txn_id, tag_id) VALUES (?, ?)", tags)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO coverage (day, synced_at) VALUES (?, ?)",
+                [(d.isoformat(), now) for d in _days(start, end)],
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sync', ?)", (str(now),))
+            # Only bump the data version when a re-sync actually changed something
+            if before != {(r[0], r[-1]) for r in rows}:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('data_version', ?)", (str(now),))
+            for month in sorted(months):
+                self._rebuild_rollup(month)
+
+    def _dates_of(self, ids: List[int]) -> List[str]:
+        out: List[str] = []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            out.extend(d for (d,) in self._conn.execute(
+                f"SELECT DISTINCT date FROM transactions WHERE id IN ({', '.join('?' * len(chunk))})", chunk,
+            ))
+        return out
+
+    def _rebuild_rollup(self, month: str) -> None:
+        lo, hi = f"{month}-01", f"{month}-31"
+        self._conn.execute("DELETE FROM rollup WHERE month = ?", (month,))
+        self._conn.execute("DELETE FROM rollup_tags WHERE month = ?", (month,))
+        self._conn.execute(_REBUILD_ROLLUP, (month, lo, hi))
+        self._conn.execute(_REBUILD_ROLLUP_TAGS, (month, lo, hi))
+
+    def query(self, sql: str, params: Iterable[Any] = ()) -> List[Tuple[Any, ...]]:
+        """Read-only SQL against the store (used by rollup.py)."""
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    def read(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM transactions WHERE date BETWEEN ? AND ? ORDER BY date, id",
+                (start_date, end_date),
+            ).fetchall()
+        return [loads(p) for (p,) in rows]
+
+    def sync(self, start_date: str, end_date: str, fetch: FetchRange, workers: int = 1) -> int:
+        """
+        Fetch whatever [start_date, end_date] is missing; returns the number of
+        API ranges fetched. Up to `workers` ranges (month chunks) are fetched
+        at once, each in the caller's context. The lock is only held to read
+        coverage and to write each range, never during a fetch, so reads and
+        queries aren't stuck behind a slow sync.
+        """
+        ranges = self.missing_ranges(start_date, end_date)
+        if len(ranges) > 1 and workers > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, fetch, s, e) for s, e in ranges]
+                for (s, e), fut in zip(ranges, futures):
+                    self.put_range(s, e, fut.result())
+        else:
+            for s, e in ranges:
+                self.put_range(s, e, fetch(s, e))
+        return len(ranges)
+
+    async def async_sync(self, start_date: str, end_date: str, fetch: AsyncFetchRange, workers: int = 1) -> int:
+        """sync() for asyncio clients: same ranges, up to `workers` fetches in flight, store calls off the loop."""
+        ranges = await asyncio.to_thread(self.missing_ranges, start_date, end_date)
+        sem = asyncio.Semaphore(max(1, workers))
+
+        async def one(s: str, e: str) -> None:
+            async with sem:
+                txns = await fetch(s, e)
+            await asyncio.to_thread(self.put_range, s, e, txns)
+
+        await asyncio.gather(*(one(s, e) for s, e in ranges))
+        return len(ranges)
+
+    def expire(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> None:
+        """Force a re-sync of [start_date, end_date] (default: everything) on its next read; rows are kept until then."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM coverage WHERE day BETWEEN ? AND ?",
+                (start_date or "0000-01-01", end_date or "9999-12-31"),
+            )
+
+    def last_sync(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_sync'").fetchone()
+        return float(row[0]) if row else None
+
+    def data_version(self) -> str:
+        """Changes whenever stored transactions change (not on no-op re-syncs)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+        return row[0] if row else "0"
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            source = self._conn.execute("SELECT key, value FROM meta WHERE key IN ('account', 'fields')").fetchall()
+            for table in _TABLES:
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('data_version', ?)", (str(time.time()),))
+            self._conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", source)
+
+_store: Optional[TransactionStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> Optional[TransactionStore]:
+    """Process-wide store, or None when disabled via LM_STORE=0."""
+    global _store
+    if not STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = TransactionStore(account=ACCOUNT, fields=FIELD_SET)
+        return _store
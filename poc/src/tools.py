@@ -1,10 +1,22 @@
 # tools.py
 from __future__ import annotations
+import asyncio
+import contextvars
 import datetime as dt
-from dataclasses import dataclass
-from typing import Any, Dict, Callable, List
-
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Dict, Callable, List, Optional, Tuple
+
+import numpy as np
+
+import rollup
+from tracing import span
+from frame import TxnFrame, code_of, group_sum
+from txn import Transaction, to_dicts
 from lunchmoney import (
+    sync_transactions,
     get_transactions,
     search_transactions,
     get_single_transaction,
@@ -18,30 +30,115 @@ from lunchmoney import (
     get_plaid_accounts,
 )
 
+@lru_cache(maxsize=1)
+def _alm():
+    """lunchmoney_async (and httpx), imported on first async use; None if unavailable."""
+    try:
+        import lunchmoney_async
+        return lunchmoney_async
+    except Exception:
+        return None
+
+# Batched <tool_call>[...]</tool_call>: max calls honoured per turn, and how many run at once
+MAX_TOOL_CALLS = int(os.getenv("LM_MAX_TOOL_CALLS", "6"))
+TOOL_WORKERS = int(os.getenv("LM_TOOL_WORKERS", "4"))
+
 @dataclass
 class Tool:
     name: str
     func: Callable[..., Any]
     schema: Dict[str, Any]
+    # Optional asyncio executor (concurrent fetches via lunchmoney_async), used by arun_tool
+    afunc: Optional[Callable[..., Awaitable[Any]]] = None
+    # The (start_date, end_date) ranges of transactions a call reads, resolved the way func does
+    ranges: Optional[Callable[[Dict[str, Any]], List[Tuple[str, str]]]] = None
 
 # -----------------------------
 # Helpers (derived analytics)
 # -----------------------------
 
-def _sum_by_category_range(start_date: str, end_date: str, include_transfers: bool = True) -> List[Dict[str, Any]]:
-    txns = get_transactions(start_date, end_date)
-    out: Dict[str, float] = {}
-    for t in txns:
-        # Skip transfers if requested (LM often flags transfers via category or payee; heuristic only)
-        if not include_transfers and (t.get("is_transfer") or (t.get("category_name") == "Transfers")):
+@dataclass
+class _Bucket:
+    total: float = 0.0
+    income: float = 0.0
+    expenses: float = 0.0
+    count: int = 0
+    by_category: Dict[str, float] = field(default_factory=dict)
+
+def _transfer_mask(fr: TxnFrame) -> np.ndarray:
+    # LM often flags transfers via category or payee; heuristic only
+    return fr.is_transfer | (fr.category == code_of(fr.categories, "Transfers"))
+
+def _aggregate(txns: List[Transaction], months: Optional[List[str]] = None, include_transfers: bool = True) -> Dict[str, _Bucket]:
+    """
+    Vectorized pass over txns into income / expense / net / per-category
+    accumulators. With `months` (YYYY-MM labels, oldest first) there is one
+    bucket per calendar month and rows outside them are ignored; otherwise
+    everything lands in a single "*" bucket.
+    """
+    fr = TxnFrame(txns)
+    keys = months if months is not None else ["*"]
+    bucket = fr.month_index(months) if months is not None else np.zeros(len(fr), dtype=np.int64)
+    keep = bucket >= 0
+    if not include_transfers:
+        keep &= ~_transfer_mask(fr)
+    b, amt, cat = bucket[keep], fr.amount[keep], fr.category[keep]
+    nb, nc = len(keys), len(fr.categories)
+
+    total, count = group_sum(b, amt, nb)
+    income, _ = group_sum(b, np.where(amt > 0, amt, 0.0), nb)
+    expenses, _ = group_sum(b, np.where(amt < 0, -amt, 0.0), nb)
+    by_cat, by_cat_n = group_sum(b * nc + cat, amt, nb * nc)
+    by_cat, by_cat_n = by_cat.reshape(nb, nc), by_cat_n.reshape(nb, nc)
+
+    return {
+        k: _Bucket(
+            total=float(total[i]),
+            income=float(income[i]),
+            expenses=float(expenses[i]),
+            count=int(count[i]),
+            by_category={fr.categories[c]: float(by_cat[i, c]) for c in np.flatnonzero(by_cat_n[i])},
+        )
+        for i, k in enumerate(keys)
+    }
+
+def _rollup_buckets(store, start_date: str, end_date: str, months: Optional[List[str]] = None, include_transfers: bool = True) -> Dict[str, _Bucket]:
+    """Same buckets as _aggregate, answered from the store's monthly rollup index."""
+    totals = rollup.range_totals(store, start_date, end_date, group_by=("month", "category_name"), include_transfers=include_transfers)
+    buckets = {k: _Bucket() for k in (months if months is not None else ["*"])}
+    for (month, cat), t in totals.items():
+        b = buckets.get("*" if months is None else month)
+        if b is None:
             continue
-        cat = t.get("category_name") or "Uncategorized"
-        amt = float(t.get("amount") or 0)
-        out[cat] = out.get(cat, 0.0) + amt
+        b.total += t.total
+        b.income += t.income
+        b.expenses += t.expenses
+        b.count += t.count
+        cat = cat or "Uncategorized"
+        b.by_category[cat] = b.by_category.get(cat, 0.0) + t.total
+    return buckets
+
+def _buckets(start_date: str, end_date: str, months: Optional[List[str]] = None, include_transfers: bool = True) -> Dict[str, _Bucket]:
+    # Rollups when the local store is on, otherwise aggregate the fetched rows
+    store = sync_transactions(start_date, end_date)
+    if store is not None:
+        return _rollup_buckets(store, start_date, end_date, months, include_transfers)
+    return _aggregate(get_transactions(start_date, end_date), months, include_transfers)
+
+async def _abuckets(start_date: str, end_date: str, months: Optional[List[str]] = None, include_transfers: bool = True) -> Dict[str, _Bucket]:
+    store = await _alm().sync_transactions(start_date, end_date)
+    if store is not None:
+        return await asyncio.to_thread(_rollup_buckets, store, start_date, end_date, months, include_transfers)
+    return _aggregate(await _alm().get_transactions(start_date, end_date), months, include_transfers)
+
+def _category_rows(totals: Dict[str, float]) -> List[Dict[str, Any]]:
     # Sort by absolute spend desc
-    items = sorted(out.items(), key=lambda kv: abs(kv[1]), reverse=True)
+    items = sorted(totals.items(), key=lambda kv: abs(kv[1]), reverse=True)
     return [{"category": k, "total": v} for k, v in items]
 
+def _sum_by_category_range(start_date: str, end_date: str, include_transfers: bool = True) -> List[Dict[str, Any]]:
+    return _category_rows(_buckets(start_date, end_date, include_transfers=include_transfers)["*"].by_category)
+
 def _month_bounds(yyyymm: str) -> (str, str):
     y, m = map(int, yyyymm.split("-"))
     start = dt.date(y, m, 1)
@@ -51,15 +148,41 @@ def _month_bounds(yyyymm: str) -> (str, str):
         end = dt.date(y, m + 1, 1) - dt.timedelta(days=1)
     return start.isoformat(), end.isoformat()
 
+def _add_months(d: dt.date, k: int) -> dt.date:
+    y = d.year + (d.month - 1 + k) // 12
+    m = (d.month - 1 + k) % 12 + 1
+    return dt.date(y, m, 1)
+
+def _month_span(start_month: str, months: int) -> Tuple[List[str], str, str]:
+    """
+    The `months` calendar months ending at start_month, oldest first, plus the
+    (start_date, end_date) covering all of them for a single range fetch.
+    """
+    y, m = map(int, start_month.split("-"))
+    anchor = dt.date(y, m, 1)
+    firsts = [_add_months(anchor, -i) for i in range(max(1, months) - 1, -1, -1)]
+    end = _add_months(anchor, 1) - dt.timedelta(days=1)
+    return [d.strftime("%Y-%m") for d in firsts], firsts[0].isoformat(), end.isoformat()
+
+def _mom_rows(labels: List[str], buckets: Dict[str, _Bucket]) -> List[Dict[str, Any]]:
+    return [{"month": k, "total": buckets[k].total} for k in labels]
+
+def _cashflow_rows(labels: List[str], buckets: Dict[str, _Bucket]) -> List[Dict[str, Any]]:
+    out = []
+    for k in labels:
+        b = buckets[k]
+        out.append({"month": k, "income": b.income, "expenses": b.expenses, "net": b.income - b.expenses})
+    return out
+
 # -----------------------------
 # Public tool executors
 # -----------------------------
 
 def exec_get_transactions(args: Dict[str, Any]):
-    return {"transactions": get_transactions(**args)}
+    return {"transactions": to_dicts(get_transactions(**args))}
 
 def exec_search_transactions(args: Dict[str, Any]):
-    return {"transactions": search_transactions(**args)}
+    return {"transactions": to_dicts(search_transactions(**args))}
 
 def exec_get_single_transaction(args: Dict[str, Any]):
     return {"transaction": get_single_transaction(int(args["id"]))}
@@ -92,38 +215,31 @@ def exec_sum_by_category(args: Dict[str, Any]):
     return {"by_category": _sum_by_category_range(args["start_date"], args["end_date"], bool(args.get("include_transfers", True)))}
 
 def exec_month_over_month(args: Dict[str, Any]):
-    start_month = args["start_month"]  # YYYY-MM
-    months = int(args.get("months", 6))
-    y, m = map(int, start_month.split("-"))
-    anchor = dt.date(y, m, 1)
-    out = []
-    for i in range(months):
-        mm = (anchor - dt.timedelta(days=1)).replace(day=1) if i == 0 else (out[-1]["_month_end"] + dt.timedelta(days=1)).replace(day=1)
-        # Actually compute past months backward from start_month
-    out = []
-    for i in range(months):
-        target = (anchor.replace(day=15) - dt.timedelta(days=30 * i)).replace(day=1)
-        s = target.isoformat()
-        e = (target + dt.timedelta(days=40)).replace(day=1) - dt.timedelta(days=1)
-        txns = get_transactions(s, e.isoformat())
-        total = sum(float(t.get("amount") or 0) for t in txns)
-        out.append({"month": target.strftime("%Y-%m"), "total": total, "_month_end": e})
-    out.reverse()
-    for o in out:
-        o.pop("_month_end", None)
-    return {"mom": out}
+    labels, s, e = _month_span(args["start_month"], int(args.get("months", 6)))
+    return {"mom": _mom_rows(labels, _buckets(s, e, labels))}
 
 def exec_top_merchants(args: Dict[str, Any]):
+    store = sync_transactions(args["start_date"], args["end_date"])
+    if store is not None:
+        return _top_merchants_rollup(store, args)
+    return _top_merchants_frame(get_transactions(args["start_date"], args["end_date"]), args)
+
+def _top_merchants_rollup(store, args: Dict[str, Any]) -> Dict[str, Any]:
     n = int(args.get("n", 10))
-    txns = get_transactions(args["start_date"], args["end_date"])
     agg: Dict[str, Dict[str, Any]] = {}
-    for t in txns:
-        payee = t.get("payee") or "(no payee)"
-        amt = float(t.get("amount") or 0)
+    for (payee,), t in rollup.range_totals(store, args["start_date"], args["end_date"], group_by=("payee",)).items():
+        payee = payee or "(no payee)"
         a = agg.setdefault(payee, {"payee": payee, "total": 0.0, "tx_count": 0})
-        a["total"] += amt
-        a["tx_count"] += 1
-    items = sorted(agg.values(), key=lambda x: abs(x["total"]), reverse=True)[:n]
+        a["total"] += t.total
+        a["tx_count"] += t.count
+    return {"top_merchants": sorted(agg.values(), key=lambda x: abs(x["total"]), reverse=True)[:n]}
+
+def _top_merchants_frame(txns: List[Transaction], args: Dict[str, Any]) -> Dict[str, Any]:
+    n = int(args.get("n", 10))
+    fr = TxnFrame(txns)
+    sums, counts = group_sum(fr.payee, fr.amount, len(fr.payees))
+    order = np.argsort(-np.abs(sums), kind="stable")[:n]
+    items = [{"payee": fr.payees[i], "total": float(sums[i]), "tx_count": int(counts[i])} for i in order]
     return {"top_merchants": items}
 
 def exec_category_health(args: Dict[str, Any]):
@@ -132,25 +248,21 @@ def exec_category_health(args: Dict[str, Any]):
     - month: "YYYY-MM" (required)
     - category_id?: int
     """
-    month = args["month"]
-    cat_id = args.get("category_id")
-    start, end = _month_bounds(month)
+    start, end = _month_bounds(args["month"])
+    return _category_health_frame(get_budget_summary(month=args["month"]), get_transactions(start, end), args)
 
-    budget = get_budget_summary(month=month)
-    txns = get_transactions(start, end)
+def _category_health_frame(budget: Any, txns: List[Transaction], args: Dict[str, Any]) -> Dict[str, Any]:
+    cat_id = args.get("category_id")
+    fr = TxnFrame(txns)
 
     # Build spend per category
-    spend: Dict[int, float] = {}
-    names: Dict[int, str] = {}
-    for t in txns:
-        cid = t.get("category_id")
-        if cid is None: 
-            continue
-        cid = int(cid)
-        amt = float(t.get("amount") or 0)
-        spend[cid] = spend.get(cid, 0.0) + amt
-        if t.get("category_name"):
-            names[cid] = t["category_name"]
+    has_cat = fr.category_id >= 0
+    ids, inv = np.unique(fr.category_id[has_cat], return_inverse=True)
+    sums, _ = group_sum(inv, fr.amount[has_cat], len(ids))
+    spend: Dict[int, float] = dict(zip(ids.tolist(), sums.tolist()))
+    # Name from the last transaction seen for each category
+    last = len(inv) - 1 - np.unique(inv[::-1], return_index=True)[1]
+    names: Dict[int, str] = {int(ids[i]): fr.categories[c] for i, c in enumerate(fr.category[has_cat][last])}
 
     rows = []
     for row in budget.get("budgets", []) if isinstance(budget, dict) else []:
@@ -191,33 +303,26 @@ def exec_monthly_cashflow(args: Dict[str, Any]):
       - income = sum(amount > 0)
       - expenses = -sum(amount < 0)
     """
-    start_month = args["start_month"]  # YYYY-MM
-    months = int(args.get("months", 6))
-    y, m = map(int, start_month.split("-"))
-    anchor = dt.date(y, m, 1)
-    out = []
-    for i in range(months):
-        target = (anchor.replace(day=15) - dt.timedelta(days=30 * i)).replace(day=1)
-        s = target.isoformat()
-        e = (target + dt.timedelta(days=40)).replace(day=1) - dt.timedelta(days=1)
-        txns = get_transactions(s, e.isoformat())
-        income = sum(float(t.get("amount") or 0) for t in txns if float(t.get("amount") or 0) > 0)
-        expenses = -sum(float(t.get("amount") or 0) for t in txns if float(t.get("amount") or 0) < 0)
-        out.append({"month": target.strftime("%Y-%m"), "income": income, "expenses": expenses, "net": income - expenses})
-    out.reverse()
-    return {"cashflow": out}
+    labels, s, e = _month_span(args["start_month"], int(args.get("months", 6)))
+    return {"cashflow": _cashflow_rows(labels, _buckets(s, e, labels))}
 
 # ---- YoY helpers ----
 def _sum_range(start_date: str, end_date: str, category_id=None, tag_ids=None, payee=None) -> float:
+    store = sync_transactions(start_date, end_date)
+    if store is not None:
+        return _rollup_total(store, start_date, end_date, category_id, tag_ids, payee)
     txns = get_transactions(
         start_date=start_date,
         end_date=end_date,
         category_id=category_id,
         tag_ids=tag_ids,
         payee=payee,
-        limit=500,
     )
-    return sum(float(t.get("amount") or 0) for t in txns)
+    return sum(t.amount for t in txns)
+
+def _rollup_total(store, start_date: str, end_date: str, category_id=None, tag_ids=None, payee=None) -> float:
+    totals = rollup.range_totals(store, start_date, end_date, category_id=category_id, tag_ids=tag_ids, payee=payee)
+    return totals.get((), rollup.Totals()).total
 
 def _shift_year(d: dt.date, years: int = 1) -> dt.date:
     try:
@@ -246,11 +351,20 @@ def exec_compare_yoy(args: Dict[str, Any]):
         "pct_change": (delta / abs(total_prior)) if prior != 0 else None
       }
     """
+    periods = _yoy_periods(args)
+    if periods is None:
+        return {"error": "Provide either month=YYYY-MM or start_date & end_date"}
+    filters = (args.get("category_id"), args.get("tag_ids"), args.get("payee"))
+
+    # Both periods at once, each in the caller's context (rate-limit priority class)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="yoy") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _sum_range, s, e, *filters) for s, e in periods]
+        cur_total, prev_total = (f.result() for f in futures)
+    return _yoy_result(periods, cur_total, prev_total)
+
+def _yoy_periods(args: Dict[str, Any]) -> Optional[Tuple[Tuple[str, str], Tuple[str, str]]]:
+    """((start, end), (prior_start, prior_end)) for compare_yoy, or None if args are incomplete."""
     month = args.get("month")
-    category_id = args.get("category_id")
-    tag_ids = args.get("tag_ids")
-    payee = args.get("payee")
-
     if month:
         y, m = map(int, month.split("-"))
         start = dt.date(y, m, 1)
@@ -258,29 +372,115 @@ def exec_compare_yoy(args: Dict[str, Any]):
             end = dt.date(y + 1, 1, 1) - dt.timedelta(days=1)
         else:
             end = dt.date(y, m + 1, 1) - dt.timedelta(days=1)
-        prev_start = _shift_year(start, 1)
-        prev_end = _shift_year(end, 1)
     else:
         if "start_date" not in args or "end_date" not in args:
-            return {"error": "Provide either month=YYYY-MM or start_date & end_date"}
+            return None
         start = dt.date.fromisoformat(args["start_date"])
         end = dt.date.fromisoformat(args["end_date"])
-        prev_start = _shift_year(start, 1)
-        prev_end = _shift_year(end, 1)
-
-    cur_total = _sum_range(start.isoformat(), end.isoformat(), category_id, tag_ids, payee)
-    prev_total = _sum_range(prev_start.isoformat(), prev_end.isoformat(), category_id, tag_ids, payee)
+    prev_start = _shift_year(start, 1)
+    prev_end = _shift_year(end, 1)
+    return (start.isoformat(), end.isoformat()), (prev_start.isoformat(), prev_end.isoformat())
 
+def _yoy_result(periods, cur_total: float, prev_total: float) -> Dict[str, Any]:
+    (start, end), (prev_start, prev_end) = periods
     delta = cur_total - prev_total
     pct = (delta / abs(prev_total)) if prev_total not in (0, 0.0) else None
 
     return {
-        "current": {"start_date": start.isoformat(), "end_date": end.isoformat(), "total": cur_total},
-        "prior": {"start_date": prev_start.isoformat(), "end_date": prev_end.isoformat(), "total": prev_total},
+        "current": {"start_date": start, "end_date": end, "total": cur_total},
+        "prior": {"start_date": prev_start, "end_date": prev_end, "total": prev_total},
         "delta": delta,
         "pct_change": pct,
     }
 
+# ---- Date ranges read (answer_cache checks they are still synced) ----
+def _date_range(args: Dict[str, Any]) -> List[Tuple[str, str]]:
+    if args.get("start_date") and args.get("end_date"):
+        return [(args["start_date"], args["end_date"])]
+    return []
+
+def _month_span_range(args: Dict[str, Any]) -> List[Tuple[str, str]]:
+    if not args.get("start_month"):
+        return []
+    _, s, e = _month_span(args["start_month"], int(args.get("months", 6)))
+    return [(s, e)]
+
+def _yoy_ranges(args: Dict[str, Any]) -> List[Tuple[str, str]]:
+    return list(_yoy_periods(args) or ())
+
+def tool_ranges(tool_call: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Transaction date ranges a tool call reads ([] for reference data or unknown tools)."""
+    tool = TOOLS.get(tool_call.get("tool"))
+    if tool is None or tool.ranges is None:
+        return []
+    try:
+        return tool.ranges(tool_call.get("args") or {})
+    except (KeyError, TypeError, ValueError):
+        return []
+
+# -----------------------------
+# Async executors (concurrent fetches)
+# -----------------------------
+
+async def aexec_get_transactions(args: Dict[str, Any]):
+    return {"transactions": to_dicts(await _alm().get_transactions(**args))}
+
+async def aexec_search_transactions(args: Dict[str, Any]):
+    return {"transactions": to_dicts(await _alm().search_transactions(**args))}
+
+async def aexec_get_single_transaction(args: Dict[str, Any]):
+    return {"transaction": await _alm().get_single_transaction(int(args["id"]))}
+
+async def aexec_get_transaction_group(args: Dict[str, Any]):
+    return await _alm().get_transaction_group(int(args["transaction_id"]))
+
+async def aexec_get_categories(args: Dict[str, Any]):
+    return {"categories": await _alm().get_categories()}
+
+async def aexec_get_category(args: Dict[str, Any]):
+    return {"category": await _alm().get_category(int(args["category_id"]))}
+
+async def aexec_get_tags(args: Dict[str, Any]):
+    return {"tags": await _alm().get_tags()}
+
+async def aexec_get_plaid_accounts(args: Dict[str, Any]):
+    return {"plaid_accounts": await _alm().get_plaid_accounts()}
+
+async def aexec_sum_by_category(args: Dict[str, Any]):
+    buckets = await _abuckets(args["start_date"], args["end_date"], include_transfers=bool(args.get("include_transfers", True)))
+    return {"by_category": _category_rows(buckets["*"].by_category)}
+
+async def aexec_top_merchants(args: Dict[str, Any]):
+    store = await _alm().sync_transactions(args["start_date"], args["end_date"])
+    if store is not None:
+        return await asyncio.to_thread(_top_merchants_rollup, store, args)
+    return _top_merchants_frame(await _alm().get_transactions(args["start_date"], args["end_date"]), args)
+
+async def aexec_month_over_month(args: Dict[str, Any]):
+    # One range sync; the store fills uncovered months concurrently
+    labels, s, e = _month_span(args["start_month"], int(args.get("months", 6)))
+    return {"mom": _mom_rows(labels, await _abuckets(s, e, labels))}
+
+async def aexec_monthly_cashflow(args: Dict[str, Any]):
+    labels, s, e = _month_span(args["start_month"], int(args.get("months", 6)))
+    return {"cashflow": _cashflow_rows(labels, await _abuckets(s, e, labels))}
+
+async def aexec_compare_yoy(args: Dict[str, Any]):
+    periods = _yoy_periods(args)
+    if periods is None:
+        return {"error": "Provide either month=YYYY-MM or start_date & end_date"}
+    filters = dict(category_id=args.get("category_id"), tag_ids=args.get("tag_ids"), payee=args.get("payee"))
+    stores = await asyncio.gather(*(_alm().sync_transactions(s, e) for s, e in periods))
+    if stores[0] is not None:
+        cur, prev = [await asyncio.to_thread(_rollup_total, stores[0], s, e, **filters) for s, e in periods]
+        return _yoy_result(periods, cur, prev)
+    cur, prev = await asyncio.gather(*(_alm().get_transactions(s, e, **filters) for s, e in periods))
+    return _yoy_result(
+        periods,
+        sum(t.amount for t in cur),
+        sum(t.amount for t in prev),
+    )
+
 # -----------------------------
 # Registry
 # -----------------------------
@@ -301,21 +501,21 @@ TOOLS: Dict[str, Tool] = {
             "amount_min": "float?",
             "amount_max": "float?",
             "is_pending": "bool?",
-            "limit": "int? (default 500)"
+            "limit": "int? (default: all)"
         }
-    }),
+    }, afunc=aexec_get_transactions, ranges=_date_range),
     "search_transactions": Tool("search_transactions", exec_search_transactions, {
         "tool": "search_transactions",
         "args": "same as get_transactions"
-    }),
+    }, afunc=aexec_search_transactions, ranges=_date_range),
     "get_single_transaction": Tool("get_single_transaction", exec_get_single_transaction, {
         "tool": "get_single_transaction",
         "args": {"id": "int"}
-    }),
+    }, afunc=aexec_get_single_transaction),
     "get_transaction_group": Tool("get_transaction_group", exec_get_transaction_group, {
         "tool": "get_transaction_group",
         "args": {"transaction_id": "int"}
-    }),
+    }, afunc=aexec_get_transaction_group),
 
     # NOTE: I don't use these features, so I've commented them out for now.
     ## Recurring & Budgets
@@ -329,25 +529,29 @@ TOOLS: Dict[str, Tool] = {
     # }),
 
     # Reference data
-    "get_categories": Tool("get_categories", exec_get_categories, {"tool": "get_categories", "args": {}}),
-    "get_category": Tool("get_category", exec_get_category, {"tool": "get_category", "args": {"category_id": "int"}}),
-    "get_tags": Tool("get_tags", exec_get_tags, {"tool": "get_tags", "args": {}}),
+    "get_categories": Tool("get_categories", exec_get_categories, {"tool": "get_categories", "args": {}}, afunc=aexec_get_categories),
+    "get_category": Tool("get_category", exec_get_category, {"tool": "get_category", "args": {"category_id": "int"}}, afunc=aexec_get_category),
+    "get_tags": Tool("get_tags", exec_get_tags, {"tool": "get_tags", "args": {}}, afunc=aexec_get_tags),
     # "get_assets": Tool("get_assets", exec_get_assets, {"tool": "get_assets", "args": {}}),
-    "get_plaid_accounts": Tool("get_plaid_accounts", exec_get_plaid_accounts, {"tool": "get_plaid_accounts", "args": {}}),
+    "get_plaid_accounts": Tool("get_plaid_accounts", exec_get_plaid_accounts, {"tool": "get_plaid_accounts", "args": {}}, afunc=aexec_get_plaid_accounts),
 
     # Derived analytics (read-only)
     "sum_by_category": Tool("sum_by_category", exec_sum_by_category, {
         "tool": "sum_by_category",
         "args": {"start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD", "include_transfers": "bool? (default true)"}
-    }),
+    }, afunc=aexec_sum_by_category, ranges=_date_range),
     "month_over_month": Tool("month_over_month", exec_month_over_month, {
         "tool": "month_over_month",
         "args": {"start_month": "YYYY-MM", "months": "int (default 6)"}
-    }),
+    }, afunc=aexec_month_over_month, ranges=_month_span_range),
     "top_merchants": Tool("top_merchants", exec_top_merchants, {
         "tool": "top_merchants",
         "args": {"start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD", "n": "int? (default 10)"}
-    }),
+    }, afunc=aexec_top_merchants, ranges=_date_range),
+    "monthly_cashflow": Tool("monthly_cashflow", exec_monthly_cashflow, {
+        "tool": "monthly_cashflow",
+        "args": {"start_month": "YYYY-MM", "months": "int (default 6)"}
+    }, afunc=aexec_monthly_cashflow, ranges=_month_span_range),
     # "category_health": Tool("category_health", exec_category_health, {
     #     "tool": "category_health",
     #     "args": {"month": "YYYY-MM", "category_id": "int?"}
@@ -368,6 +572,8 @@ TOOLS: Dict[str, Tool] = {
                 "payee": "string?",
             },
         },
+        afunc=aexec_compare_yoy,
+        ranges=_yoy_ranges,
     ),
 }
 
@@ -376,8 +582,39 @@ def run_tool(tool_call: Dict[str, Any]) -> Dict[str, Any]:
     args = tool_call.get("args", {}) or {}
     if name not in TOOLS:
         return {"error": f"Unknown tool: {name}"}
-    try:
-        return TOOLS[name].func(args)
-    except Exception as e:
-        return {"error": str(e)}
-
+    tool = TOOLS[name]
+    with span("tool.run", tool=name) as sp:
+        try:
+            return tool.func(args)
+        except Exception as e:
+            sp.set(error=str(e)[:200])
+            return {"error": str(e)}
+
+async def arun_tool(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """run_tool for asyncio callers; tools without an async executor run in a worker thread."""
+    name = tool_call.get("tool")
+    args = tool_call.get("args", {}) or {}
+    if name not in TOOLS:
+        return {"error": f"Unknown tool: {name}"}
+    tool = TOOLS[name]
+    with span("tool.run", tool=name) as sp:
+        try:
+            if tool.afunc is not None and _alm() is not None:
+                sp.set(mode="async")
+                return await tool.afunc(args)
+            return await asyncio.to_thread(tool.func, args)
+        except Exception as e:
+            sp.set(error=str(e)[:200])
+            return {"error": str(e)}
+
+def run_tools(tool_calls: List[Dict[str, Any]], workers: int = TOOL_WORKERS) -> List[Dict[str, Any]]:
+    """run_tool over a batch in a thread pool; results come back in call order."""
+    if len(tool_calls) <= 1 or workers <= 1:
+        return [run_tool(c) for c in tool_calls]
+    with ThreadPoolExecutor(max_workers=min(workers, len(tool_calls)), thread_name_prefix="tool") as pool:
+        # Run each call in a copy of the caller's context (rate-limit priority class)
+        futures = [pool.submit(contextvars.copy_context().run, run_tool, c) for c in tool_calls]
+        return [f.result() for f in futures]
+
+async def arun_tools(tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return list(await asyncio.gather(*(arun_tool(c) for c in tool_calls)))
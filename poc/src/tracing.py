@@ -0,0 +1,244 @@
+# tracing.py
+"""
+Lightweight span tracing for a chat turn: where did the time go (model,
+Lunch Money HTTP, tool aggregation, compaction)?
+
+    with span("lunchmoney.get", path=path) as s:
+        ...
+        s.set(http_status=r.status_code)
+
+Spans nest through a context variable, so they follow asyncio tasks and
+threads started with contextvars.copy_context() (run_tools, the page pool).
+Field names follow OpenTelemetry (32/16 hex trace/span ids, *_unix_nano
+times, attributes), and finished spans go to the LM_TRACE exporter:
+  off      nothing exported (default)
+  console  one JSON line per span on stderr
+  json     JSON lines appended to LM_TRACE_PATH
+  otel     mirrored to the opentelemetry API, if installed (configure the
+           SDK / exporter as usual, e.g. with opentelemetry-instrument)
+
+collect() gathers the spans of one turn for an in-app breakdown
+(breakdown() / format_breakdown()), whatever the exporter. With no exporter
+and no collector, span() is a no-op.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+TRACE_MODE = os.getenv("LM_TRACE", "off").lower()
+TRACE_PATH = os.getenv(
+    "LM_TRACE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lm_cache", "traces.jsonl"),
+)
+
+_otel_tracer = None
+if TRACE_MODE == "otel":
+    try:
+        from opentelemetry import trace as _otel_trace
+        _otel_tracer = _otel_trace.get_tracer("lm-expense-chatbot")
+    except Exception:
+        _otel_tracer = None
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    _otel: Any = field(default=None, repr=False)
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, key: str, amount: float = 1) -> None:
+        """Accumulate a counter attribute (bytes, hits, ...)."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "description": self.error} if self.error else {"code": "OK"},
+        }
+
+class _NoopSpan:
+    """Returned when nobody is listening; accepts and drops everything."""
+    attributes: Dict[str, Any] = {}
+
+    def set(self, **attributes: Any) -> "_NoopSpan":
+        return self
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+_NOOP = _NoopSpan()
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("lm_span", default=None)
+_collector: contextvars.ContextVar[Optional[List[Span]]] = contextvars.ContextVar("lm_span_collector", default=None)
+
+# -----------------------------
+# Exporters
+# -----------------------------
+
+_export_lock = threading.Lock()
+
+def _export(s: Span) -> None:
+    if TRACE_MODE == "console":
+        line = json.dumps(s.to_dict(), default=str)
+        with _export_lock:
+            sys.stderr.write(line + "\n")
+    elif TRACE_MODE == "json":
+        line = json.dumps(s.to_dict(), default=str)
+        with _export_lock:
+            os.makedirs(os.path.dirname(TRACE_PATH) or ".", exist_ok=True)
+            with open(TRACE_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    elif s._otel is not None:
+        s._otel.set_attributes({k: v for k, v in s.attributes.items() if isinstance(v, (str, bool, int, float))})
+        if s.error:
+            s._otel.set_status(_otel_trace.Status(_otel_trace.StatusCode.ERROR, s.error))
+        s._otel.end(end_time=s.end_ns)
+
+def _exporting() -> bool:
+    return TRACE_MODE in ("console", "json") or _otel_tracer is not None
+
+# -----------------------------
+# API
+# -----------------------------
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Time the block as a child of the current span; exceptions mark it as failed and propagate."""
+    collected = _collector.get()
+    if collected is None and not _exporting():
+        yield _NOOP
+        return
+    parent = _current.get()
+    s = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+    if _otel_tracer is not None:
+        ctx = _otel_trace.set_span_in_context(parent._otel) if parent is not None and parent._otel is not None else None
+        s._otel = _otel_tracer.start_span(name, context=ctx, start_time=s.start_ns)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _current.reset(token)
+        s.end_ns = time.time_ns()
+        if collected is not None:
+            collected.append(s)  # list.append is atomic; threads of one turn share the list
+        _export(s)
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of span() for a whole function (or coroutine function)."""
+    def wrap(fn: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def ainner(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return ainner
+
+        @functools.wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def current_span() -> Any:
+    """The innermost open span (a no-op stand-in outside of any span)."""
+    return _current.get() or _NOOP
+
+@contextmanager
+def collect() -> Iterator[List[Span]]:
+    """Record every span finished inside the block (including worker threads that copied the context)."""
+    spans: List[Span] = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+# -----------------------------
+# Breakdown
+# -----------------------------
+
+def breakdown(spans: List[Span]) -> List[Dict[str, Any]]:
+    """
+    Spans in tree order (parents first, siblings by start time) with their
+    depth, total ms and self ms (total minus time covered by children).
+    """
+    ids = {s.span_id for s in spans}
+    children: Dict[Optional[str], List[Span]] = {}
+    for s in spans:
+        children.setdefault(s.parent_id if s.parent_id in ids else None, []).append(s)
+    rows: List[Dict[str, Any]] = []
+
+    def walk(parent: Optional[str], depth: int) -> None:
+        for s in sorted(children.get(parent, []), key=lambda c: c.start_ns):
+            kids = children.get(s.span_id, [])
+            rows.append({
+                "span": s.name,
+                "depth": depth,
+                "ms": round(s.ms, 1),
+                "self_ms": round(max(0.0, s.ms - _covered_ms(kids)), 1),
+                "attributes": s.attributes,
+                "error": s.error,
+            })
+            walk(s.span_id, depth + 1)
+
+    walk(None, 0)
+    return rows
+
+def _covered_ms(spans: List[Span]) -> float:
+    """Wall time covered by (possibly overlapping, e.g. concurrent) spans."""
+    total, end = 0, 0
+    for s in sorted(spans, key=lambda c: c.start_ns):
+        s_end = s.end_ns or s.start_ns
+        if s_end <= end:
+            continue
+        total += s_end - max(s.start_ns, end)
+        end = s_end
+    return total / 1e6
+
+def format_breakdown(spans: List[Span]) -> str:
+    """breakdown() as an indented text table."""
+    lines = [f"{'span':<44} {'ms':>9} {'self':>9}  attributes"]
+    for row in breakdown(spans):
+        name = "  " * row["depth"] + row["span"]
+        attrs = " ".join(f"{k}={v}" for k, v in row["attributes"].items())
+        if row["error"]:
+            attrs = f"ERROR {row['error']} {attrs}"
+        lines.append(f"{name:<44} {row['ms']:>9.1f} {row['self_ms']:>9.1f}  {attrs}")
+    return "\n".join(lines)
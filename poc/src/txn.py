@@ -0,0 +1,159 @@
+# txn.py
+"""
+Compact in-memory transaction record.
+
+API rows are dicts of ~30 keys, most of which the tools never read, with the
+amount as a string. lunchmoney.get_transactions parses each row once into a
+Transaction:
+  - the fields analytics and filters use live in __slots__: amount as a
+    float, date as its ISO string plus the epoch day (int), payee / category /
+    status strings interned, tags as shared tuples
+  - every other field is kept in a tuple (`_rest`), short strings interned
+  - the key order is a shared tuple, so to_dict() rebuilds the original dict
+    (amount back in the API's "0.0000" string form)
+Interned / shared values are read-only; to_dict() returns fresh copies.
+
+LM_TXN_FIELDS can drop fields at decode time (TXN_FIELDS); rows then only
+carry those keys, here and in the store.
+"""
+import os
+import sys
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_EPOCH = date(1970, 1, 1)
+
+# Fields that get a slot (everything else goes to _rest)
+FIELDS = (
+    "id", "date", "amount", "payee", "category_id", "category_name", "category_group_id",
+    "status", "is_pending", "is_income", "exclude_from_totals", "is_transfer", "tags",
+    "plaid_account_id", "asset_id", "group_id", "parent_id",
+)
+_FIELD_SET = frozenset(FIELDS)
+
+def _txn_fields(value: str) -> Optional[Tuple[str, ...]]:
+    """LM_TXN_FIELDS: all (default), core (FIELDS, what the tools read) or a comma list; id and date are always kept."""
+    value = value.strip().lower()
+    if value in ("", "all"):
+        return None
+    fields = FIELDS if value == "core" else tuple(f.strip() for f in value.split(",") if f.strip())
+    return tuple(dict.fromkeys(("id", "date") + fields))
+
+# Fields decoded from /transactions rows (None: every field)
+TXN_FIELDS = _txn_fields(os.getenv("LM_TXN_FIELDS", "all"))
+# Strings up to this length (names, currencies, flags) are interned; longer ones are mostly unique
+_INTERN_MAX = 40
+# _raw_amount when the original amount is the canonical "0.0000" string of `amount`
+_CANONICAL = object()
+
+# Shared values; bounded by the number of distinct dates / key layouts / tag sets / ids
+_days: Dict[str, Optional[int]] = {}
+_layouts: Dict[Tuple[str, ...], Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+_tag_sets: Dict[Tuple[Any, ...], Tuple[Dict[str, Any], ...]] = {}
+_ints: Dict[int, int] = {}
+
+def _epoch_day(s: str) -> Optional[int]:
+    day = _days.get(s)
+    if day is None and s not in _days:
+        try:
+            day = (date.fromisoformat(s[:10]) - _EPOCH).days
+        except ValueError:
+            day = None
+        _days[s] = day
+    return day
+
+def _layout(raw: Dict[str, Any]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """(all keys, non-slot keys), shared by every row with the same keys in the same order."""
+    keys = tuple(raw)
+    layout = _layouts.get(keys)
+    if layout is None:
+        layout = _layouts.setdefault(keys, (keys, tuple(k for k in keys if k not in _FIELD_SET)))
+    return layout
+
+def _tags(raw: Any) -> Optional[Tuple[Dict[str, Any], ...]]:
+    if raw is None:
+        return None
+    if not raw:
+        return ()
+    try:
+        key = tuple(tuple(t.items()) for t in raw)
+        shared = _tag_sets.get(key)
+        if shared is None:
+            shared = _tag_sets.setdefault(key, tuple(dict(t) for t in raw))
+        return shared
+    except (AttributeError, TypeError):
+        # Unhashable / unexpected tag shapes: keep a private copy
+        return tuple(raw)
+
+class Transaction:
+    __slots__ = FIELDS + ("day", "_raw_amount", "_keys", "_rest_keys", "_rest")
+
+    def __init__(self, raw: Dict[str, Any]):
+        # Hot path (every row of every get_transactions): helpers are inlined
+        get, intern, ints = raw.get, sys.intern, _ints.setdefault
+        self._keys, self._rest_keys = _layout(raw)
+        self._rest = tuple([
+            intern(v) if type(v) is str and len(v) <= _INTERN_MAX else v
+            for v in map(raw.__getitem__, self._rest_keys)
+        ])
+
+        self.id = get("id")
+        d = get("date")
+        if type(d) is str:
+            self.date, self.day = intern(d), _epoch_day(d)
+        else:
+            self.date, self.day = d, None
+        a = get("amount")
+        self.amount = float(a or 0)
+        self._raw_amount = _CANONICAL if type(a) is str and a == f"{self.amount:.4f}" else a
+        v = get("payee")
+        self.payee = intern(v) if type(v) is str else v
+        v = get("category_name")
+        self.category_name = intern(v) if type(v) is str else v
+        v = get("status")
+        self.status = intern(v) if type(v) is str else v
+        v = get("category_id")
+        self.category_id = ints(v, v) if type(v) is int else v
+        v = get("category_group_id")
+        self.category_group_id = ints(v, v) if type(v) is int else v
+        v = get("plaid_account_id")
+        self.plaid_account_id = ints(v, v) if type(v) is int else v
+        v = get("asset_id")
+        self.asset_id = ints(v, v) if type(v) is int else v
+        self.group_id = get("group_id")
+        self.parent_id = get("parent_id")
+        self.is_pending = get("is_pending")
+        self.is_income = get("is_income")
+        self.exclude_from_totals = get("exclude_from_totals")
+        self.is_transfer = get("is_transfer")
+        t = get("tags")
+        self.tags = () if t == [] else _tags(t)
+
+    def _value(self, key: str) -> Any:
+        if key == "amount":
+            return f"{self.amount:.4f}" if self._raw_amount is _CANONICAL else self._raw_amount
+        if key == "tags":
+            return None if self.tags is None else [dict(t) for t in self.tags]
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style read of any original field (amount as a float)."""
+        if key not in self._keys:
+            return default
+        if key in _FIELD_SET:
+            return self.amount if key == "amount" else self._value(key)
+        return self._rest[self._rest_keys.index(key)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The row as the API returned it (same keys, order and values)."""
+        rest = dict(zip(self._rest_keys, self._rest))
+        return {k: rest[k] if k in rest else self._value(k) for k in self._keys}
+
+    def __repr__(self) -> str:
+        return f"Transaction(id={self.id!r}, date={self.date!r}, amount={self.amount!r}, payee={self.payee!r})"
+
+def parse_transactions(rows: Iterable[Dict[str, Any]]) -> List[Transaction]:
+    return [Transaction(r) for r in rows]
+
+def to_dicts(txns: Iterable[Transaction]) -> List[Dict[str, Any]]:
+    return [t.to_dict() for t in txns]
@@ -0,0 +1,95 @@
+# warmup.py
+"""
+Background warmup so the first question costs the same as any other.
+
+Started once per process when the app loads, the warmup:
+  - model:        loads the Ollama model (kept resident via keep_alive) and
+                  evaluates the system prompt, so its prefix is cached
+  - reference:    fetches categories / tags / accounts into the response cache
+  - transactions: syncs the default date window into the local store
+The three steps run concurrently in daemon threads; Lunch Money requests
+go out in the rate limiter's BACKGROUND class, so a question asked
+meanwhile still goes first.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import lm
+from lunchmoney import get_categories, get_plaid_accounts, get_tags, sync_transactions
+from ratelimit import BACKGROUND, priority
+
+WARMUP_ENABLED = os.getenv("LM_WARMUP", "1").lower() not in ("0", "false", "no", "off")
+
+@dataclass
+class Step:
+    name: str
+    state: str = "pending"    # pending | running | done | error
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "error")
+
+@dataclass
+class Warmup:
+    steps: Dict[str, Step] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _ranges: set = field(default_factory=set, repr=False)
+
+    def _run(self, name: str, fn: Callable[[], None]) -> None:
+        step = self.steps[name]
+        step.state = "running"
+        t0 = time.perf_counter()
+        try:
+            with priority(BACKGROUND):
+                fn()
+            step.state = "done"
+        except Exception as e:
+            step.state, step.error = "error", str(e)[:200]
+        finally:
+            step.seconds = time.perf_counter() - t0
+
+    def _start(self, name: str, fn: Callable[[], None]) -> None:
+        self.steps[name] = Step(name)
+        threading.Thread(target=self._run, args=(name, fn), name=f"warmup-{name}", daemon=True).start()
+
+    def start(self, system_prompt: str, default_range: Tuple[str, str]) -> "Warmup":
+        """Idempotent: each step runs once per process, the prefetch once per date range."""
+        with self._lock:
+            if "model" not in self.steps:
+                self._start("model", lambda: lm.preload([{"role": "system", "content": system_prompt}]))
+            if "reference" not in self.steps:
+                self._start("reference", _fetch_reference)
+            if default_range not in self._ranges:
+                self._ranges.add(default_range)
+                self._start("transactions", lambda: sync_transactions(*default_range))
+        return self
+
+    @property
+    def ready(self) -> bool:
+        return all(s.finished for s in self.steps.values())
+
+    def status(self) -> List[Step]:
+        return list(self.steps.values())
+
+def _fetch_reference() -> None:
+    get_categories()
+    get_tags()
+    get_plaid_accounts()
+
+_warmup: Optional[Warmup] = None
+_warmup_lock = threading.Lock()
+
+def start_warmup(system_prompt: str, default_range: Tuple[str, str]) -> Optional[Warmup]:
+    """Process-wide warmup (started on first call), or None when disabled via LM_WARMUP=0."""
+    global _warmup
+    if not WARMUP_ENABLED:
+        return None
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = Warmup()
+    return _warmup.start(system_prompt, default_range)
@@ -0,0 +1,18 @@
+# conftest.py
+"""
+The app's modules read their configuration at import, so the on-disk store
+and response cache go to a throwaway directory (and rate limiting is off)
+before any test module imports them. src/ and bench/ are on sys.path via
+[tool.pytest.ini_options] in pyproject.toml.
+"""
+import os
+import tempfile
+
+_STATE = tempfile.mkdtemp(prefix="lm-tests-")
+os.environ.update({
+    "LM_STORE_PATH": os.path.join(_STATE, "lunchmoney.sqlite3"),
+    "LM_CACHE_PATH": os.path.join(_STATE, "responses.sqlite3"),
+    "LM_RATE_LIMIT": "0",
+    "LM_TRACE": "off",
+    "LM_TXN_FIELDS": "all",
+})
@@ -0,0 +1,117 @@
+# test_parser.py
+import asyncio
+import json
+
+import pytest
+
+import lm
+from fakes import FakeOllama
+from lm import TOOL_CLOSE, TOOL_OPEN, ToolCallParser, _close_tool_call, extract_tool_calls, visible_text
+
+CALL = {"tool": "sum_by_category", "args": {"start_date": "2024-03-01", "end_date": "2024-03-31"}}
+BATCH = [{"tool": "get_tags", "args": {}}, {"tool": "top_merchants", "args": {"start_date": "2024-01-01", "end_date": "2024-01-31", "n": 5}}]
+TRICKY = {"tool": "search_transactions", "args": {"payee": 'a}b]{[ "c\\ <tool_call>', "note": "}}]]"}}
+
+def _reply(call, prefix="Let me check. ", suffix=TOOL_CLOSE + " trailing"):
+    return prefix + TOOL_OPEN + json.dumps(call) + suffix
+
+def _feed(pieces):
+    p = ToolCallParser()
+    for piece in pieces:
+        p.feed(piece)
+    return p
+
+@pytest.mark.parametrize("call", [CALL, BATCH, TRICKY], ids=["call", "batch", "strings"])
+def test_split_at_every_offset(call):
+    text = _reply(call)
+    for i in range(len(text) + 1):
+        p = _feed([text[:i], text[i:]])
+        assert p.done and not p.plain, i
+        assert p.call == call, i
+        assert text[:p.end].endswith(json.dumps(call)), i
+
+@pytest.mark.parametrize("call", [CALL, BATCH, TRICKY], ids=["call", "batch", "strings"])
+def test_one_character_at_a_time(call):
+    text = _reply(call)
+    p = ToolCallParser()
+    for i, ch in enumerate(text):
+        p.feed(ch)
+        # done exactly when the JSON value closes, not before
+        assert p.done == (i + 1 >= p.end > 0), i
+    assert p.call == call
+
+def test_calls_lists_a_batch_and_skips_non_objects():
+    assert _feed([_reply(BATCH)]).calls == BATCH
+    assert _feed([_reply(CALL)]).calls == [CALL]
+    assert _feed([_reply([CALL, "x", 3])]).calls == [CALL]
+
+def test_whitespace_before_the_json():
+    p = _feed(["ok <tool_call>", "\n  ", json.dumps(CALL)])
+    assert p.done and p.call == CALL
+
+@pytest.mark.parametrize("text", [
+    "Wrap calls in <tool_call> tags, like <tool_call> this </tool_call>.",
+    "<tool_call>{not json}</tool_call>",
+    "<tool_call>[1, 2,]</tool_call>",
+], ids=["prose", "bad-object", "bad-array"])
+def test_plain_text_fallback(text):
+    for i in range(len(text) + 1):
+        p = _feed([text[:i], text[i:]])
+        assert p.plain and not p.done, i
+        assert p.call is None and p.calls == [], i
+        assert not p.complete, i
+    assert extract_tool_calls(text) == []
+    assert _close_tool_call(text) == text
+
+def test_complete_on_close_tag_of_an_unfinished_call():
+    p = _feed(['<tool_call>{"tool": "get_tags", "args": ', TOOL_CLOSE])
+    assert not p.done and not p.plain
+    assert p.complete
+
+def test_no_tag_is_not_a_call():
+    p = _feed(["Your March spending was ", "$1,200 across 40 transactions."])
+    assert not p.done and not p.plain and not p.complete
+
+def test_close_tool_call_cuts_after_the_json():
+    assert _close_tool_call(_reply(CALL, suffix=" and more")) == "Let me check. " + TOOL_OPEN + json.dumps(CALL) + TOOL_CLOSE
+    assert extract_tool_calls(_reply(BATCH)) == BATCH
+
+def test_visible_text_hides_partial_tags():
+    assert visible_text("Sure <tool_call>{") == "Sure "
+    for k in range(1, len(TOOL_OPEN)):
+        assert visible_text("Sure " + TOOL_OPEN[:k]) == "Sure "
+    assert visible_text("a < b") == "a < b"
+
+# -----------------------------
+# stream_reply / astream_reply over FakeOllama
+# -----------------------------
+
+PLAIN = "Models wrap calls as <tool_call> text </tool_call>; this reply just mentions them."
+SCRIPT = {"plain": PLAIN, "call": _reply(CALL), "broken": 'ok <tool_call>{"tool": ' + TOOL_CLOSE + " rest"}
+
+@pytest.fixture(scope="module")
+def ollama():
+    with FakeOllama(SCRIPT, chars_per_token=1) as fake:
+        yield fake
+
+@pytest.fixture
+def streams(ollama, monkeypatch):
+    monkeypatch.setattr(lm, "OLLAMA_URL", ollama.url)
+    lm.ollama_client.cache_clear()
+    yield [
+        lambda msgs, on_text: lm.stream_reply(msgs, on_text=on_text),
+        lambda msgs, on_text: asyncio.run(lm.astream_reply(msgs, on_text=on_text)),
+    ]
+    lm.ollama_client.cache_clear()
+
+@pytest.mark.parametrize("question,content,shown", [
+    ("plain", PLAIN, PLAIN),
+    ("call", "Let me check. " + TOOL_OPEN + json.dumps(CALL) + TOOL_CLOSE, "Let me check. "),
+    ("broken", 'ok <tool_call>{"tool": ' + TOOL_CLOSE, "ok "),
+], ids=["plain", "call", "broken"])
+def test_stream_reply(streams, question, content, shown):
+    for stream in streams:
+        seen = []
+        reply = stream([{"role": "user", "content": question}], seen.append)
+        assert reply == {"role": "assistant", "content": content}
+        assert seen[-1] == shown
@@ -0,0 +1,91 @@
+# test_rollup.py
+import datetime as dt
+from collections import defaultdict
+
+import pytest
+
+import rollup
+from ledger import synthetic_ledger
+from store import TransactionStore, is_transfer
+
+END = dt.date(2024, 6, 30)
+DAYS = 366
+START = (END - dt.timedelta(days=DAYS - 1)).isoformat()
+
+# Whole months, partial edges on one or both sides, within one month, across a year end, leap February
+RANGES = [
+    ("2023-07-15", "2024-02-10"),
+    ("2023-12-01", "2024-01-31"),
+    ("2024-03-05", "2024-03-20"),
+    ("2024-02-01", "2024-02-29"),
+    ("2023-11-30", "2023-12-01"),
+    ("2024-04-01", "2024-06-15"),
+    ("2023-08-31", "2024-05-01"),
+    (START, END.isoformat()),
+]
+
+@pytest.fixture(scope="module")
+def ledger():
+    return synthetic_ledger(3000, DAYS, END, seed=2)["transactions"]
+
+@pytest.fixture(scope="module")
+def store(ledger, tmp_path_factory):
+    s = TransactionStore(str(tmp_path_factory.mktemp("rollup") / "store.sqlite3"), account="test", fields="all")
+    s.put_range(START, END.isoformat(), ledger)
+    return s
+
+def _scan(rows, start, end, key=lambda t: (), keep=lambda t: True):
+    """range_totals the slow way: one pass over the raw rows."""
+    out = defaultdict(rollup.Totals)
+    for t in rows:
+        if start <= t["date"] <= end and keep(t):
+            a, acc = float(t["amount"]), out[key(t)]
+            acc.total += a
+            acc.income += max(a, 0.0)
+            acc.expenses += max(-a, 0.0)
+            acc.count += 1
+    return dict(out)
+
+def _assert_same(got, want):
+    assert got.keys() == want.keys()
+    for k, w in want.items():
+        g = got[k]
+        assert g.count == w.count, k
+        assert (g.total, g.income, g.expenses) == pytest.approx((w.total, w.income, w.expenses), abs=1e-6), k
+
+@pytest.mark.parametrize("start,end", RANGES)
+def test_range_totals_match_a_raw_scan(store, ledger, start, end):
+    _assert_same(rollup.range_totals(store, start, end), _scan(ledger, start, end))
+
+@pytest.mark.parametrize("start,end", RANGES)
+def test_grouped_by_month_and_category(store, ledger, start, end):
+    got = rollup.range_totals(store, start, end, group_by=("month", "category_name"))
+    _assert_same(got, _scan(ledger, start, end, key=lambda t: (t["date"][:7], t["category_name"])))
+
+@pytest.mark.parametrize("start,end", RANGES[:4])
+def test_filters_match_a_raw_scan(store, ledger, start, end):
+    _assert_same(
+        rollup.range_totals(store, start, end, category_id=100),  # group id: Groceries, Restaurants, Coffee
+        _scan(ledger, start, end, keep=lambda t: 100 in (t["category_id"], t["category_group_id"])),
+    )
+    _assert_same(
+        rollup.range_totals(store, start, end, payee="bar"),
+        _scan(ledger, start, end, keep=lambda t: "bar" in (t["payee"] or "").lower()),
+    )
+    _assert_same(
+        rollup.range_totals(store, start, end, include_transfers=False),
+        _scan(ledger, start, end, keep=lambda t: not is_transfer(t)),
+    )
+    tags = [1, 2]
+    _assert_same(
+        rollup.range_totals(store, start, end, tag_ids=tags),
+        _scan(ledger, start, end, keep=lambda t: any(g["id"] in tags for g in t["tags"] or [])),
+    )
+
+def test_split_range_edges():
+    assert rollup.split_range("2024-01-01", "2024-03-31") == (("2024-01", "2024-03"), [])
+    assert rollup.split_range("2024-01-15", "2024-03-10") == (
+        ("2024-02", "2024-02"), [("2024-01-15", "2024-01-31"), ("2024-03-01", "2024-03-10")],
+    )
+    assert rollup.split_range("2024-02-03", "2024-02-20") == (None, [("2024-02-03", "2024-02-20")])
+    assert rollup.split_range("2024-02-20", "2024-02-03") == (None, [])
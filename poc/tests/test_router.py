@@ -0,0 +1,49 @@
+# test_router.py
+from datetime import date
+
+import pytest
+
+from router import parse_dates, route
+
+TODAY = date(2025, 5, 15)
+DEFAULT = ("2025-02-15", "2025-05-15")
+
+@pytest.mark.parametrize("question,tool,args", [
+    ("Spend by category in March", "sum_by_category", {"start_date": "2025-03-01", "end_date": "2025-03-31"}),
+    ("what did I spend per category last month?", "sum_by_category", {"start_date": "2025-04-01", "end_date": "2025-04-30"}),
+    ("spending by category", "sum_by_category", {"start_date": "2025-02-15", "end_date": "2025-05-15"}),
+    ("category breakdown for December", "sum_by_category", {"start_date": "2024-12-01", "end_date": "2024-12-31"}),
+    ("spending by category in 2025-01", "sum_by_category", {"start_date": "2025-01-01", "end_date": "2025-01-31"}),
+    ("top 5 merchants last month", "top_merchants", {"start_date": "2025-04-01", "end_date": "2025-04-30", "n": 5}),
+    ("Top three payees this year", "top_merchants", {"start_date": "2025-01-01", "end_date": "2025-05-15", "n": 3}),
+    ("where did I spend the most in the last 30 days?", "top_merchants", {"start_date": "2025-04-16", "end_date": "2025-05-15"}),
+    ("month over month spending for the last 3 months", "month_over_month", {"start_month": "2025-05", "months": 4}),
+    ("spending trends from January to March", "month_over_month", {"start_month": "2025-03", "months": 3}),
+    ("cash flow in Q1", "monthly_cashflow", {"start_month": "2025-03", "months": 3}),
+    ("How much did I save last year?", "monthly_cashflow", {"start_month": "2024-12", "months": 12}),
+    ("compare March vs last year", "compare_yoy", {"month": "2025-03"}),
+    ("Jan–Mar year over year", "compare_yoy", {"start_date": "2025-01-01", "end_date": "2025-03-31"}),
+    ("this month compared to the same period last year", "compare_yoy", {"start_date": "2025-05-01", "end_date": "2025-05-15"}),
+])
+def test_routes(question, tool, args):
+    assert route(question, DEFAULT, today=TODAY) == {"tool": tool, "args": args}
+
+@pytest.mark.parametrize("question", [
+    "how much did I spend on groceries by category last month",  # a category word the rules don't know
+    "top merchants at Costco",                                     # a payee
+    "what's my checking balance?",                                 # no intent
+    "spending by category in March and April",                     # a second, unparsed month
+    "by category last month and this month",                       # two date phrases
+    "spending by category in 2030",                                # nothing before today
+    "top merchants tagged vacation",                               # a tag
+    "hello",
+], ids=["category", "payee", "no-intent", "two-months", "two-dates", "future", "tag", "greeting"])
+def test_declines(question):
+    assert route(question, DEFAULT, today=TODAY) is None
+
+def test_date_phrases():
+    assert parse_dates(" q4 2024 ", TODAY)[0] == (date(2024, 10, 1), date(2024, 12, 31))
+    assert parse_dates(" nov - feb ", TODAY)[0] == (date(2024, 11, 1), date(2025, 2, 28))
+    assert parse_dates(" last week ", TODAY)[0] == (date(2025, 5, 5), date(2025, 5, 11))
+    assert parse_dates(" june ", TODAY)[0] == (date(2024, 6, 1), date(2024, 6, 30))
+    assert parse_dates(" march and yesterday ", TODAY)[2]  # ambiguous
@@ -0,0 +1,80 @@
+# test_store.py
+import datetime as dt
+
+import pytest
+
+import lunchmoney
+from fakes import FakeLunchMoney
+from ledger import synthetic_ledger
+from store import TransactionStore
+
+END = dt.date(2024, 6, 30)
+DAYS = 120
+START = (END - dt.timedelta(days=DAYS - 1)).isoformat()
+
+@pytest.fixture(scope="module")
+def ledger():
+    return synthetic_ledger(1200, DAYS, END, seed=1)
+
+@pytest.fixture
+def api(ledger, monkeypatch):
+    with FakeLunchMoney(ledger) as fake:
+        monkeypatch.setattr(lunchmoney, "BASE", fake.base_url)
+        monkeypatch.setattr(lunchmoney, "TOKEN", "test")
+        yield fake
+
+@pytest.fixture
+def store(tmp_path):
+    return TransactionStore(str(tmp_path / "store.sqlite3"), account="test", fields="all")
+
+def _fetch(start_date, end_date):
+    return lunchmoney._fetch_transactions({"start_date": start_date, "end_date": end_date})
+
+def _ids(rows):
+    return sorted(r["id"] for r in rows)
+
+def test_sync_fetches_each_missing_month_once(api, store, ledger):
+    fetched = store.sync(START, END.isoformat(), _fetch, workers=4)
+    assert fetched == 4  # Mar 3 - Jun 30: one range per calendar month
+    assert store.missing_ranges(START, END.isoformat()) == []
+    assert _ids(store.read(START, END.isoformat())) == _ids(ledger["transactions"])
+
+    before = api.snapshot()["requests"].get("/transactions", 0)
+    assert store.sync(START, END.isoformat(), _fetch, workers=4) == 0
+    assert api.snapshot()["requests"].get("/transactions", 0) == before
+
+def test_sync_only_fetches_the_uncovered_part(api, store):
+    store.sync("2024-04-10", "2024-05-20", _fetch)
+    assert store.missing_ranges(START, END.isoformat()) == [
+        ("2024-03-03", "2024-03-31"), ("2024-04-01", "2024-04-09"),
+        ("2024-05-21", "2024-05-31"), ("2024-06-01", "2024-06-30"),
+    ]
+    assert store.sync(START, END.isoformat(), _fetch) == 4
+
+def test_expire_forces_a_resync(api, store):
+    store.sync(START, END.isoformat(), _fetch)
+    store.expire("2024-06-01", "2024-06-30")
+    assert store.missing_ranges(START, END.isoformat()) == [("2024-06-01", "2024-06-30")]
+
+def test_get_transactions_reads_through_the_store(api, store, ledger, monkeypatch):
+    monkeypatch.setattr(lunchmoney, "get_store", lambda: store)
+    rows = [t for t in ledger["transactions"] if "2024-04-15" <= t["date"] <= "2024-05-15"]
+    got = lunchmoney.get_transactions("2024-04-15", "2024-05-15")
+    assert sorted((t.to_dict() for t in got), key=lambda t: t["id"]) == sorted(rows, key=lambda t: t["id"])
+    assert [t.id for t in lunchmoney.get_transactions("2024-04-15", "2024-05-15", limit=10)] == [t.id for t in got[:10]]
+
+@pytest.mark.parametrize("source", [{"account": "other"}, {"fields": "id,date,amount"}])
+def test_rebuilds_when_account_or_fields_change(tmp_path, ledger, source):
+    path = str(tmp_path / "store.sqlite3")
+    store = TransactionStore(path, account="test", fields="all")
+    store.put_range(START, END.isoformat(), ledger["transactions"])
+
+    same = TransactionStore(path, account="test", fields="all")
+    assert same.missing_ranges(START, END.isoformat()) == []
+    assert len(same.read(START, END.isoformat())) == len(ledger["transactions"])
+    version = same.data_version()
+
+    changed = TransactionStore(path, **{"account": "test", "fields": "all", **source})
+    assert changed.read(START, END.isoformat()) == []
+    assert changed.missing_ranges(START, END.isoformat())[0][0] == START
+    assert changed.data_version() != version
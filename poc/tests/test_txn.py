@@ -0,0 +1,58 @@
+# test_txn.py
+import datetime as dt
+import json
+
+import pytest
+
+from ledger import synthetic_ledger
+from txn import FIELDS, Transaction, _txn_fields, parse_transactions, to_dicts
+
+@pytest.fixture(scope="module")
+def rows():
+    return synthetic_ledger(2000, 400, dt.date(2024, 6, 30), seed=3)["transactions"]
+
+def test_to_dict_round_trips_ledger_rows(rows):
+    txns = parse_transactions(rows)
+    out = to_dicts(txns)
+    assert out == rows
+    assert all(list(a) == list(b) for a, b in zip(out, rows))  # key order too
+
+def test_round_trip_through_json(rows):
+    body = json.dumps({"transactions": rows})
+    out = to_dicts(parse_transactions(json.loads(body)["transactions"]))
+    assert json.dumps({"transactions": out}) == body
+
+def test_slots_are_parsed(rows):
+    for row, t in zip(rows, parse_transactions(rows)):
+        assert t.amount == float(row["amount"])
+        assert t.day == (dt.date.fromisoformat(row["date"]) - dt.date(1970, 1, 1)).days
+        assert t.get("amount") == t.amount
+        assert t.get("currency") == row["currency"]
+        assert t.get("no_such_field", "x") == "x"
+        assert t.tags == tuple(row["tags"])
+
+@pytest.mark.parametrize("amount", ["12.5", "-0.10", "1e3", 12.5, 0, None, ""])
+def test_non_canonical_amounts_are_kept(amount):
+    row = {"id": 1, "date": "2024-01-02", "amount": amount, "payee": "X"}
+    assert Transaction(row).to_dict() == row
+
+def test_partial_and_extra_fields():
+    rows = [
+        {"id": 1, "date": "2024-01-02"},
+        {"date": "2024-01-03", "id": 2, "amount": "-3.0000", "tags": None, "custom": {"a": [1, 2]}},
+        {"id": 3, "date": None, "amount": "1.0000", "tags": [{"id": 1, "name": "gift"}], "plaid_account_id": 11},
+    ]
+    assert to_dicts(parse_transactions(rows)) == rows
+
+def test_to_dict_returns_fresh_tags():
+    row = {"id": 1, "date": "2024-01-02", "amount": "1.0000", "tags": [{"id": 1, "name": "gift"}]}
+    t = Transaction(row)
+    first = t.to_dict()
+    first["tags"][0]["name"] = "changed"
+    first["tags"].append({"id": 2})
+    assert t.to_dict() == row
+
+def test_txn_fields_setting():
+    assert _txn_fields("all") is None and _txn_fields("") is None
+    assert _txn_fields("core") == FIELDS
+    assert _txn_fields("amount, payee,date") == ("id", "date", "amount", "payee")